@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.jobs import job_manager
+from app.core.metrics import Counter, Gauge, registry
+from app.core.scheduler import cpu_scheduler
+from app.core.workspace import workspace_manager
+
+
+# Só os endpoints de processamento passam pela admissão; status de jobs,
+# health, métricas e documentação respondem sempre
+_PROCESSING_PATH = "/api/process/"
+
+admission_rejected = registry.register(Counter(
+    "bonett_admission_rejected_total",
+    "Requisições de processamento recusadas pela admissão, por motivo",
+    ("reason",)))
+admission_inflight = registry.register(Gauge(
+    "bonett_admission_inflight",
+    "Requisições de processamento admitidas e em andamento"))
+
+
+class Rejection:
+    """Motivo da recusa, status HTTP e segundos sugeridos em Retry-After"""
+    __slots__ = ("status", "reason", "message", "retry_after")
+
+    def __init__(self, status: int, reason: str, message: str, retry_after: int):
+        self.status = status
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Decide se uma nova requisição de processamento entra agora ou é recusada.
+
+    A carga é medida pelos próprios módulos: requisições admitidas em
+    andamento, jobs assíncronos pendentes, reservas de núcleos aguardando
+    no escalonador e espaço no SCRATCH_DIR. Fila cheia responde 429 (o
+    cliente deve tentar de novo mais tarde); falta de espaço em disco
+    responde 503. Retry-After estima quando a fila terá andado, a partir da
+    duração média das últimas requisições.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None, min_free_bytes: int = 512 * 1024 * 1024,
+                 retry_after: float = 10.0, max_retry_after: int = 300):
+        self.slots = cpu_scheduler.parallelism()
+        # Além dos encodes simultâneos, quantos podem esperar na fila
+        self.max_queue = max_queue if max_queue is not None else max(4, 2 * self.slots)
+        self.min_free_bytes = min_free_bytes
+        self.max_retry_after = max_retry_after
+        self._average_seconds = retry_after
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Tuple[int, int]:
+        """(trabalho pendente, reservas de núcleos aguardando)"""
+        with self._lock:
+            inflight = self._inflight
+        waiting = cpu_scheduler.stats()["waiting_reservations"]
+        return inflight + job_manager.backlog(), waiting
+
+    def _retry_after(self, excess: int) -> int:
+        """Segundos até `excess` trabalhos liberarem vaga, pela duração média observada"""
+        with self._lock:
+            average = self._average_seconds
+        seconds = math.ceil(average * max(1, excess) / self.slots)
+        return max(1, min(self.max_retry_after, seconds))
+
+    def check(self) -> Optional[Rejection]:
+        """Recusa com status e motivo, ou None se há capacidade"""
+        scratch = workspace_manager.stats()
+        free = scratch["disk_free_bytes"]
+        if free is not None and free < self.min_free_bytes:
+            return Rejection(
+                503, "scratch_full",
+                f"Pouco espaço livre no diretório de trabalho ({free} bytes)",
+                self._retry_after(scratch["active_workspaces"] or 1))
+        if scratch["waiting_workspaces"] >= self.max_queue:
+            return Rejection(
+                503, "scratch_budget",
+                "Orçamento do diretório de trabalho esgotado",
+                self._retry_after(scratch["waiting_workspaces"]))
+
+        pending, waiting = self._load()
+        capacity = self.slots + self.max_queue
+        if pending >= capacity:
+            return Rejection(
+                429, "queue_full",
+                f"Fila de processamento cheia ({pending} pendentes, limite {capacity})",
+                self._retry_after(pending - capacity + 1))
+        if waiting >= self.max_queue:
+            return Rejection(
+                429, "encode_slots",
+                f"Todos os slots de encode ocupados ({waiting} aguardando núcleos)",
+                self._retry_after(waiting - self.max_queue + 1))
+        return None
+
+    def admit(self) -> Optional[Rejection]:
+        """Verifica e, se couber, já conta a requisição como em andamento"""
+        rejection = self.check()
+        if rejection is not None:
+            admission_rejected.inc(rejection.reason)
+            return rejection
+        with self._lock:
+            self._inflight += 1
+        admission_inflight.inc()
+        return None
+
+    def release(self, seconds: Optional[float] = None) -> None:
+        """Fim de uma requisição admitida; `seconds` alimenta a média usada no Retry-After"""
+        with self._lock:
+            self._inflight -= 1
+            if seconds is not None:
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+        admission_inflight.dec()
+
+    def stats(self) -> dict:
+        pending, waiting = self._load()
+        with self._lock:
+            average = self._average_seconds
+            inflight = self._inflight
+        return {
+            "slots": self.slots,
+            "max_queue": self.max_queue,
+            "capacity": self.slots + self.max_queue,
+            "inflight_requests": inflight,
+            "pending": pending,
+            "waiting_reservations": waiting,
+            "min_free_bytes": self.min_free_bytes,
+            "average_request_seconds": round(average, 3),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que aplica o AdmissionController aos POSTs de
+    /api/process/ antes de o endpoint iniciar qualquer ffmpeg.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or _PROCESSING_PATH not in scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self.controller.admit()
+        if rejection is not None:
+            await _reject(rejection, send)
+            return
+
+        started = time.monotonic()
+        response = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 202 só enfileira o job e erros não medem o processamento
+            status = response["status"]
+            self.controller.release(
+                time.monotonic() - started if status < 300 and status != 202 else None)
+
+
+async def _reject(rejection: Rejection, send) -> None:
+    body = json.dumps({
+        "detail": rejection.message,
+        "reason": rejection.reason,
+        "retry_after": rejection.retry_after,
+    }).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+_dependencies: Dict[str, Optional[str]] = {}
+_dependencies_lock = threading.Lock()
+
+
+def check_dependencies() -> Dict[str, Optional[str]]:
+    """
+    Versão de ffmpeg e ffprobe (None se ausentes), verificada uma única vez
+    por processo: os binários não mudam com o container em execução.
+    """
+    with _dependencies_lock:
+        if not _dependencies:
+            for binary in ("ffmpeg", "ffprobe"):
+                _dependencies[binary] = _binary_version(binary)
+        return dict(_dependencies)
+
+
+def _binary_version(binary: str) -> Optional[str]:
+    if shutil.which(binary) is None:
+        return None
+    try:
+        result = subprocess.run([binary, "-version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout.splitlines()[0]
+
+
+def readiness() -> Tuple[bool, dict]:
+    """Pronto para receber processamento: dependências presentes, scratch acessível e capacidade livre"""
+    dependencies = check_dependencies()
+    scratch_ok = os.path.isdir(workspace_manager.root) and os.access(workspace_manager.root, os.W_OK)
+    rejection = admission_controller.check()
+
+    checks = {
+        "ffmpeg": dependencies["ffmpeg"] is not None,
+        "ffprobe": dependencies["ffprobe"] is not None,
+        "scratch_dir": scratch_ok,
+        "capacity": rejection is None,
+    }
+    body = {
+        "status": "ready" if all(checks.values()) else "not_ready",
+        "checks": checks,
+        "dependencies": dependencies,
+        "admission": admission_controller.stats(),
+    }
+    if rejection is not None:
+        body["reason"] = rejection.reason
+        body["message"] = rejection.message
+        body["retry_after"] = rejection.retry_after
+    return all(checks.values()), body
+
+
+admission_controller = AdmissionController(
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "0")) or None,
+    min_free_bytes=int(os.getenv("ADMISSION_MIN_FREE_BYTES", str(512 * 1024 * 1024))),
+    retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "10")),
+    max_retry_after=int(os.getenv("ADMISSION_MAX_RETRY_AFTER", "300"))
+)
@@ -0,0 +1,32 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+# Pool dedicado às chamadas bloqueantes dos endpoints async (ffmpeg, cv2, I/O).
+# Mantém o event loop livre para /health e demais requisições enquanto os
+# serviços processam. Criado na primeira chamada.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("BLOCKING_WORKERS", "32")),
+                    thread_name_prefix="blocking"
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa uma função bloqueante no pool dedicado sem travar o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs))
@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional
+
+
+# Perfis de codificação H.264/AAC compartilhados pelos serviços.
+#   preset/crf/tune: libx264 (tune None = sem -tune)
+#   gop: quadros entre keyframes (None = padrão do encoder, 250)
+#   audio_bitrate: AAC
+#   cores: orçamento pedido ao cpu_scheduler (0 = padrão por job); o draft usa
+#          um núcleo para várias pré-visualizações rodarem lado a lado
+ENCODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Pré-visualização: o mais rápido possível, arquivo maior e qualidade menor
+    "draft": {"preset": "ultrafast", "crf": 28, "tune": "fastdecode", "gop": 60, "audio_bitrate": "96k", "cores": 1},
+    # Configuração histórica do vídeo cíclico e do corte recodificado
+    "fast": {"preset": "fast", "crf": 23, "tune": None, "gop": None, "audio_bitrate": "128k", "cores": 0},
+    # Configuração histórica da marca d'água e do banner (o banner mantém AAC a 128k)
+    "standard": {"preset": "medium", "crf": 23, "tune": None, "gop": None, "audio_bitrate": "192k", "cores": 0},
+    # Arquivo/master: mais lento, menor perda e GOP longo para compactar melhor
+    "archive": {"preset": "slow", "crf": 18, "tune": None, "gop": 300, "audio_bitrate": "256k", "cores": 0},
+}
+
+DEFAULT_PROFILE = "standard"
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    """Perfil registrado com esse nome; ValueError se não existir"""
+    profile = ENCODING_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(
+            f"Perfil de codificação inválido: {name}. Use um de {', '.join(ENCODING_PROFILES)}")
+    return profile
+
+
+def video_args(name: str, pix_fmt: str = "yuv420p") -> List[str]:
+    """Opções de saída do ffmpeg para o vídeo (libx264) do perfil"""
+    profile = get_profile(name)
+    args = ['-c:v', 'libx264', '-preset', profile["preset"], '-crf', str(profile["crf"])]
+    if profile["tune"]:
+        args.extend(['-tune', profile["tune"]])
+    if profile["gop"]:
+        args.extend(['-g', str(profile["gop"])])
+    if pix_fmt:
+        args.extend(['-pix_fmt', pix_fmt])
+    return args
+
+
+def audio_args(name: str) -> List[str]:
+    """Opções de saída do ffmpeg para o áudio (AAC) do perfil"""
+    return ['-c:a', 'aac', '-b:a', get_profile(name)["audio_bitrate"]]
+
+
+def output_kwargs(name: str, pix_fmt: str = "yuv420p", audio_bitrate: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Mesmas opções no formato de argumentos nomeados de ffmpeg.output
+    (ffmpeg-python); audio_bitrate substitui o bitrate AAC do perfil.
+    """
+    profile = get_profile(name)
+    kwargs = {
+        "vcodec": "libx264",
+        "preset": profile["preset"],
+        "crf": profile["crf"],
+        "acodec": "aac",
+        "audio_bitrate": audio_bitrate or profile["audio_bitrate"],
+    }
+    if profile["tune"]:
+        kwargs["tune"] = profile["tune"]
+    if profile["gop"]:
+        kwargs["g"] = profile["gop"]
+    if pix_fmt:
+        kwargs["pix_fmt"] = pix_fmt
+    return kwargs
+
+
+def profile_cores(name: str) -> int:
+    """Orçamento de núcleos do perfil para run_ffmpeg(cores=...)"""
+    return get_profile(name)["cores"]
@@ -0,0 +1,175 @@
+import subprocess
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+from app.core.metrics import track_ffmpeg
+from app.core.scheduler import cpu_scheduler
+
+
+# Callback de progresso usado pelos serviços: (mensagem, progresso 0..1).
+# O runner também envia as estatísticas do ffmpeg como argumentos nomeados
+# (fps, speed, out_time), então callbacks que queiram recebê-las devem
+# aceitar **stats.
+ProgressCallback = Callable[..., None]
+
+
+def parse_time(value) -> float:
+    """Converte '01:02:03.5', '62.5' ou 62.5 em segundos"""
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    seconds = 0.0
+    for part in str(value).strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    value = value.strip().rstrip('x')
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _output_index(cmd: List[str]) -> int:
+    """Posição do arquivo de saída (ignora -y/-n que o ffmpeg-python põe no final)"""
+    index = len(cmd) - 1
+    while index > 0 and cmd[index] in ('-y', '-n'):
+        index -= 1
+    return index
+
+
+def with_thread_args(cmd: List[str], cores: int) -> List[str]:
+    """Insere no comando os parâmetros de threads do orçamento de núcleos"""
+    global_args, output_args = cpu_scheduler.ffmpeg_thread_args(cores)
+    index = _output_index(cmd)
+    return [cmd[0]] + global_args + list(cmd[1:index]) + output_args + list(cmd[index:])
+
+
+def run_ffmpeg(
+    cmd: List[str],
+    duration: Optional[float] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    stage: str = "Processando",
+    start: float = 0.0,
+    end: float = 1.0,
+    check: bool = True,
+    cores: Optional[int] = None,
+    service: str = "other",
+    step: str = "encode"
+) -> subprocess.CompletedProcess:
+    """
+    Executa o ffmpeg com `-progress pipe:1` e repassa o andamento real da codificação.
+
+    O percentual é calculado a partir de out_time e da duração esperada da
+    saída e mapeado no intervalo [start, end] do progresso total da tarefa.
+
+    Args:
+        cmd: Comando ffmpeg completo (cmd[0] deve ser o executável)
+        duration: Duração esperada da saída em segundos (para o percentual)
+        progress_callback: Recebe (mensagem, progresso, fps=, speed=, out_time=)
+        stage: Descrição da etapa usada na mensagem
+        start, end: Faixa do progresso total ocupada por esta execução
+        check: Se True, lança RuntimeError quando o ffmpeg falha
+        cores: Orçamento de núcleos reservado no cpu_scheduler durante a
+            execução (0 = padrão por job). None executa sem reserva.
+        service, step: Rótulos das métricas do processo (ex.: 'banner', 'segment');
+            a espera pela reserva de núcleos não entra na duração
+
+    Returns:
+        subprocess.CompletedProcess com returncode e stderr
+    """
+    if cores is None:
+        with track_ffmpeg(service, step) as run:
+            result = _run_ffmpeg(cmd, duration, progress_callback, stage, start, end, check)
+            run.ok = result.returncode == 0
+        return result
+
+    with cpu_scheduler.reserve(cores) as granted:
+        with track_ffmpeg(service, step) as run:
+            result = _run_ffmpeg(
+                with_thread_args(cmd, granted), duration, progress_callback, stage, start, end, check)
+            run.ok = result.returncode == 0
+        return result
+
+
+def _run_ffmpeg(
+    cmd: List[str],
+    duration: Optional[float],
+    progress_callback: Optional[ProgressCallback],
+    stage: str,
+    start: float,
+    end: float,
+    check: bool
+) -> subprocess.CompletedProcess:
+    full_cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+
+    process = subprocess.Popen(
+        full_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        bufsize=1
+    )
+
+    # stderr é drenado em paralelo para o pipe não encher e travar o ffmpeg
+    stderr_tail = deque(maxlen=200)
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    values = {}
+    out_time = 0.0
+    for line in process.stdout:
+        key, _, value = line.strip().partition('=')
+        if not key:
+            continue
+        values[key] = value
+
+        if key != 'progress' or progress_callback is None:
+            continue
+
+        # out_time vem como N/A em alguns blocos (ex.: no final); mantém o último valor
+        out_time_us = _parse_float(
+            values.get('out_time_us') or values.get('out_time_ms'))
+        if out_time_us is not None and out_time_us > 0:
+            out_time = out_time_us / 1_000_000
+        fps = _parse_float(values.get('fps'))
+        speed = _parse_float(values.get('speed'))
+
+        if value == 'end':
+            fraction = 1.0
+        elif duration:
+            fraction = min(1.0, out_time / duration)
+        else:
+            fraction = 0.0
+
+        details = []
+        if fps is not None:
+            details.append(f"fps={fps:g}")
+        if speed is not None:
+            details.append(f"speed={speed:g}x")
+        message = f"{stage}: {fraction * 100:.0f}%"
+        if details:
+            message += f" ({', '.join(details)})"
+
+        progress_callback(
+            message,
+            start + (end - start) * fraction,
+            fps=fps,
+            speed=speed,
+            out_time=round(out_time, 3)
+        )
+
+    returncode = process.wait()
+    stderr_thread.join()
+    stderr = ''.join(stderr_tail)
+
+    if check and returncode != 0:
+        raise RuntimeError(
+            f"FFmpeg falhou com código {returncode}: {stderr[-2000:]}")
+
+    return subprocess.CompletedProcess(full_cmd, returncode, '', stderr)
@@ -0,0 +1,389 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from app.core.process_owner import owner_alive, owner_id
+
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_PROCESSING = "processing"
+JOB_STATUS_COMPLETED = "completed"
+JOB_STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = {JOB_STATUS_COMPLETED, JOB_STATUS_FAILED}
+
+
+class JobRegistry:
+    """
+    Registro de jobs em memória com limite de tamanho e expiração por TTL.
+
+    Jobs em andamento nunca são removidos. Jobs finalizados expiram após
+    `ttl_seconds` ou, quando o registro passa de `max_jobs`, os finalizados
+    mais antigos são descartados primeiro.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_jobs: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, **fields) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": JOB_STATUS_QUEUED,
+            "message": "Aguardando processamento",
+            "progress": 0.0,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": datetime.now().isoformat(),
+        }
+        job.update(fields)
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_locked()
+            return dict(job)
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = datetime.now().isoformat()
+            if job["status"] in FINISHED_STATUSES and job_id not in self._finished_at:
+                self._finished_at[job_id] = time.monotonic()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict_locked()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict_locked()
+            return [
+                dict(job) for job in self._jobs.values()
+                if (kind is None or job["kind"] == kind)
+                and (status is None or job["status"] == status)
+            ]
+
+    def count(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            if status is None:
+                return len(self._jobs)
+            return sum(1 for job in self._jobs.values() if job["status"] == status)
+
+    def _evict_locked(self) -> None:
+        now = time.monotonic()
+
+        expired = [
+            job_id for job_id, finished in self._finished_at.items()
+            if now - finished >= self.ttl_seconds
+        ]
+        for job_id in expired:
+            self._remove_locked(job_id)
+
+        # _finished_at preserva a ordem de finalização: remove os mais antigos
+        overflow = len(self._jobs) - self.max_jobs
+        if overflow > 0:
+            for job_id in list(self._finished_at)[:overflow]:
+                self._remove_locked(job_id)
+
+    def _remove_locked(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+        self._finished_at.pop(job_id, None)
+
+    def recover(self) -> int:
+        """Nada a recuperar: o registro em memória morre junto com o processo"""
+        return 0
+
+
+class SqliteJobRegistry:
+    """
+    Registro de jobs em SQLite (modo WAL) compartilhado pelos workers.
+
+    Mesma interface e mesmas regras de expiração do JobRegistry, mas o
+    estado, o progresso e o resultado ficam em um arquivo local: qualquer
+    worker uvicorn/gunicorn responde à consulta de um job criado por outro.
+    Cada job guarda o PID (e o instante de início) do processo que o
+    executa; recover() marca como falhos os jobs de processos que morreram.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 3600, max_jobs: int = 500):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._owner = owner_id(os.getpid())
+        self._db_ready = False
+        self._lock = threading.Lock()
+        # Uma conexão por thread, reaproveitada: o SSE consulta o registro a cada 0,5 s
+        self._local = threading.local()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexão da thread atual com transação; nunca chame a partir do event loop"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # Escritas pequenas e frequentes (progresso): sem fsync a cada commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        try:
+            if not self._db_ready:
+                with self._lock:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS jobs ("
+                        " id TEXT PRIMARY KEY,"
+                        " kind TEXT NOT NULL,"
+                        " status TEXT NOT NULL,"
+                        " owner TEXT NOT NULL,"
+                        " data TEXT NOT NULL,"
+                        " finished_at REAL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+                    self._db_ready = True
+            with conn:
+                yield conn
+        except sqlite3.Error:
+            # Conexão em estado inválido: a próxima chamada abre outra
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def create(self, kind: str, **fields) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": JOB_STATUS_QUEUED,
+            "message": "Aguardando processamento",
+            "progress": 0.0,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": datetime.now().isoformat(),
+        }
+        job.update(fields)
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, owner, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, job["status"], self._owner, json.dumps(job, default=str)))
+            self._evict(conn)
+        return job
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._connect() as conn:
+            # Leitura e escrita na mesma transação de escrita: outro worker não intercala
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data, finished_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            job = json.loads(row[0])
+            job.update(fields)
+            job["updated_at"] = datetime.now().isoformat()
+            finished_at = row[1]
+            if job["status"] in FINISHED_STATUSES and finished_at is None:
+                finished_at = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, finished_at = ? WHERE id = ?",
+                (job["status"], json.dumps(job, default=str), finished_at, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, finished_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query, params = "SELECT data, finished_at FROM jobs WHERE 1 = 1", []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY rowid", params).fetchall()
+        return [json.loads(data) for data, finished_at in rows if not self._expired(finished_at)]
+
+    def count(self, status: Optional[str] = None) -> int:
+        with self._connect() as conn:
+            if status is None:
+                return conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def recover(self) -> int:
+        """Marca como falhos os jobs pendentes cujo processo dono não existe mais; retorna quantos"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?)",
+                (JOB_STATUS_QUEUED, JOB_STATUS_PROCESSING)).fetchall()
+
+        orphans = []
+        for job_id, owner in rows:
+            pid, _, started = owner.partition(" ")
+            if owner != self._owner and not (pid.isdigit() and owner_alive(int(pid), started)):
+                orphans.append(job_id)
+
+        for job_id in orphans:
+            self.update(
+                job_id,
+                status=JOB_STATUS_FAILED,
+                message="Erro: o worker que executava o job foi encerrado",
+                finished_at=datetime.now().isoformat()
+            )
+        if orphans:
+            print(f"Jobs: {len(orphans)} job(s) de workers encerrados marcados como falhos")
+        return len(orphans)
+
+    def _expired(self, finished_at: Optional[float]) -> bool:
+        return finished_at is not None and time.time() - finished_at >= self.ttl_seconds
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at <= ?",
+            (time.time() - self.ttl_seconds,))
+        overflow = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - self.max_jobs
+        if overflow > 0:
+            # Remove os finalizados mais antigos; jobs em andamento nunca saem
+            conn.execute(
+                "DELETE FROM jobs WHERE id IN ("
+                " SELECT id FROM jobs WHERE finished_at IS NOT NULL"
+                " ORDER BY finished_at LIMIT ?)", (overflow,))
+
+
+class JobManager:
+    """
+    Executa jobs longos em um pool de workers de tamanho fixo e registra
+    status e progresso no JobRegistry.
+
+    A função executada recebe `progress_callback` como argumento nomeado. Se
+    retornar um dict com `success=False`, o job é marcado como falho.
+    """
+
+    def __init__(self, registry: Union[JobRegistry, SqliteJobRegistry], max_workers: int = 2):
+        self.registry = registry
+        self.max_workers = max_workers
+        # Criado no primeiro submit(): a maioria dos jobs roda com run_sync/run
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._backlog = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, job_fields: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """Registra o job e agenda sua execução, retornando imediatamente."""
+        job = self.registry.create(kind, **(job_fields or {}))
+        with self._lock:
+            self._backlog += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="job-worker")
+        future = self._executor.submit(self._run, job["id"], func, args, kwargs)
+        future.add_done_callback(self._release)
+        return job
+
+    def backlog(self) -> int:
+        """Jobs enviados com submit() que ainda não terminaram (na fila ou executando)"""
+        with self._lock:
+            return self._backlog
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._backlog -= 1
+
+    def run_sync(self, kind: str, func: Callable[..., Any], *args, job_fields: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """Registra o job e o executa na thread atual, retornando o resultado."""
+        job = self.registry.create(kind, **(job_fields or {}))
+        return self.run(job["id"], func, *args, **kwargs)
+
+    def run(self, job_id: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Executa na thread atual um job já registrado, relançando exceções."""
+        return self._run(job_id, func, args, kwargs, reraise=True)
+
+    def progress_callback(self, job_id: str) -> Callable[..., None]:
+        """Callback (mensagem, progresso, **stats) que atualiza o job no registro"""
+        def update(message: str, progress: float, **stats) -> None:
+            fields = {"message": message, "progress": progress}
+            if stats:
+                fields["stats"] = stats
+            self.registry.update(job_id, **fields)
+        return update
+
+    def _run(self, job_id: str, func: Callable[..., Any], args, kwargs, reraise: bool = False) -> Any:
+        self.registry.update(
+            job_id,
+            status=JOB_STATUS_PROCESSING,
+            message="Processando",
+            started_at=datetime.now().isoformat()
+        )
+
+        try:
+            result = func(
+                *args, progress_callback=self.progress_callback(job_id), **kwargs)
+        except Exception as e:
+            self.registry.update(
+                job_id,
+                status=JOB_STATUS_FAILED,
+                message=f"Erro: {str(e)}",
+                finished_at=datetime.now().isoformat()
+            )
+            if reraise:
+                raise
+            return None
+
+        success = not (isinstance(result, dict) and result.get("success") is False)
+        fields = {
+            "status": JOB_STATUS_COMPLETED if success else JOB_STATUS_FAILED,
+            "finished_at": datetime.now().isoformat(),
+        }
+        if success:
+            fields["progress"] = 1.0
+        if isinstance(result, dict):
+            fields["message"] = result.get("message", "")
+            fields["output_path"] = result.get("output_path")
+            fields["result"] = result
+        elif isinstance(result, str):
+            fields["message"] = "Processamento concluído"
+            fields["output_path"] = result
+        self.registry.update(job_id, **fields)
+        return result
+
+
+# Com vários workers, todos precisam apontar para o mesmo arquivo.
+# JOB_STORE_DB vazio mantém os jobs em memória (um único processo).
+_job_store_db = os.getenv(
+    "JOB_STORE_DB",
+    os.path.join(tempfile.gettempdir(), "bonett_jobs.sqlite3")
+)
+_job_ttl = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+_job_max_history = int(os.getenv("JOB_MAX_HISTORY", "500"))
+
+if _job_store_db:
+    job_registry = SqliteJobRegistry(_job_store_db, ttl_seconds=_job_ttl, max_jobs=_job_max_history)
+else:
+    job_registry = JobRegistry(ttl_seconds=_job_ttl, max_jobs=_job_max_history)
+
+job_manager = JobManager(
+    job_registry,
+    max_workers=int(os.getenv("JOB_WORKERS", "2"))
+)
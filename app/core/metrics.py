@@ -0,0 +1,462 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core.process_owner import owner_alive, process_start
+
+
+# Métricas no formato texto do Prometheus (0.0.4), sem dependência externa.
+# Registrar custa um lock e uma busca em dict por amostra; os valores que já
+# existem em outros módulos (caches, filas, scratch) são lidos só no scrape.
+
+Sample = Tuple[str, Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+_FFMPEG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Valor que só cresce (rótulos na ordem de labelnames; o nome termina em _total)"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self._labels(labels), value) for labels, value in items]
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self._labels(labels), value) for labels, value in items]
+
+
+class Histogram(_Metric):
+    """Distribuição em buckets cumulativos com _sum e _count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = _LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> [contagem por bucket (não cumulativa) + overflow, soma]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        samples = []
+        for labels, counts, total in items:
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", base, total))
+            samples.append((f"{self.name}_count", base, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Métricas registradas e coletores chamados a cada scrape.
+
+    Com vários workers uvicorn, cada requisição a /metrics cai em um worker
+    diferente. Em modo multiprocesso (enable_multiprocess) cada worker grava
+    periodicamente um snapshot das suas métricas em um diretório
+    compartilhado, e o scrape devolve as de todos os workers vivos, cada
+    amostra com o rótulo worker="<pid>". Os coletores `shared` leem estado
+    que já é comum a todos (store de jobs, caches em disco) e saem uma vez,
+    sem o rótulo.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._shared_collectors: List[Callable[[], Iterable[Family]]] = []
+        self._store_dir: Optional[str] = None
+        self._snapshot_name = ""
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]], shared: bool = False) -> None:
+        """
+        collector() -> [(nome, tipo, descrição, [(nome da amostra, rótulos, valor)])]
+
+        shared=True para valores iguais em todos os workers (lidos de um store comum).
+        """
+        (self._shared_collectors if shared else self._collectors).append(collector)
+
+    def enable_multiprocess(self, directory: str, interval: float = 5.0) -> None:
+        """
+        Publica as métricas deste worker em `directory` a cada `interval`
+        segundos (e a cada scrape), para que qualquer worker responda pelos outros.
+        """
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        self._store_dir = directory
+        self._snapshot_name = f"{pid}-{process_start(pid)}.json"
+        thread = threading.Thread(
+            target=self._publish_loop, args=(interval,), name="metrics-publisher", daemon=True)
+        thread.start()
+
+    def render(self) -> str:
+        families = self._local_families()
+        if self._store_dir is not None:
+            self._publish(families)
+            families = self._worker_families(families)
+        families.extend(self._collect(self._shared_collectors))
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _local_families(self) -> List[Family]:
+        families = [(m.name, m.kind, m.documentation, m.samples()) for m in self._metrics]
+        families.extend(self._collect(self._collectors))
+        return families
+
+    @staticmethod
+    def _collect(collectors: List[Callable[[], Iterable[Family]]]) -> List[Family]:
+        families = []
+        for collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                # Um coletor com problema não derruba o scrape inteiro
+                print(f"Erro no coletor de métricas {collector.__name__}: {str(e)}")
+        return families
+
+    def _publish_loop(self, interval: float) -> None:
+        while True:
+            self._publish(self._local_families())
+            time.sleep(interval)
+
+    def _publish(self, families: List[Family]) -> None:
+        """Grava o snapshot deste worker com rename atômico: leitores nunca veem um JSON parcial"""
+        path = os.path.join(self._store_dir, self._snapshot_name)
+        partial = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(partial, "w") as f:
+                json.dump(families, f, separators=(",", ":"))
+            os.replace(partial, path)
+        except OSError as e:
+            print(f"Aviso: não foi possível publicar as métricas do worker: {e}")
+
+    def _worker_families(self, local: List[Family]) -> List[Family]:
+        """
+        Junta as famílias de todos os workers vivos (as deste já atualizadas),
+        com o rótulo worker. Snapshots de workers mortos são removidos.
+        """
+        snapshots = []
+        try:
+            names = sorted(os.listdir(self._store_dir))
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            pid, _, started = name[:-len(".json")].partition("-")
+            if name == self._snapshot_name:
+                snapshots.append((pid, local))
+                continue
+            path = os.path.join(self._store_dir, name)
+            if not (pid.isdigit() and owner_alive(int(pid), started)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+        merged: Dict[str, Family] = {}
+        for pid, families in snapshots:
+            for name, kind, documentation, samples in families:
+                family = merged.setdefault(name, (name, kind, documentation, []))
+                family[3].extend(
+                    (sample_name, {**labels, "worker": pid}, value)
+                    for sample_name, labels, value in samples)
+        return list(merged.values())
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "bonett_http_request_duration_seconds",
+    "Duração das requisições HTTP por router, método e status",
+    ("router", "method", "status")))
+http_requests_in_progress = registry.register(Gauge(
+    "bonett_http_requests_in_progress",
+    "Requisições HTTP em andamento"))
+ffmpeg_processes = registry.register(Counter(
+    "bonett_ffmpeg_processes_total",
+    "Processos ffmpeg/ffprobe finalizados por serviço, etapa e resultado",
+    ("service", "step", "status")))
+ffmpeg_running = registry.register(Gauge(
+    "bonett_ffmpeg_processes_running",
+    "Processos ffmpeg/ffprobe em execução por serviço e etapa",
+    ("service", "step")))
+ffmpeg_duration = registry.register(Histogram(
+    "bonett_ffmpeg_duration_seconds",
+    "Duração dos processos ffmpeg/ffprobe por serviço e etapa",
+    ("service", "step"),
+    buckets=_FFMPEG_BUCKETS))
+
+
+class FfmpegRun:
+    """Resultado de um processo acompanhado por track_ffmpeg"""
+    __slots__ = ("ok",)
+
+    def __init__(self):
+        self.ok = True
+
+
+@contextmanager
+def track_ffmpeg(service: str, step: str) -> Iterator[FfmpegRun]:
+    """
+    Conta e cronometra um processo ffmpeg/ffprobe. Exceções marcam o
+    processo como erro; para returncode != 0 sem exceção, defina run.ok = False.
+    """
+    run = FfmpegRun()
+    ffmpeg_running.inc(service, step)
+    started = time.perf_counter()
+    try:
+        yield run
+    except BaseException:
+        run.ok = False
+        raise
+    finally:
+        ffmpeg_running.dec(service, step)
+        ffmpeg_duration.observe(time.perf_counter() - started, service, step)
+        ffmpeg_processes.inc(service, step, "ok" if run.ok else "error")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição até o fim da resposta.
+
+    O router vem do módulo do endpoint (app.routers.banner_router -> banner),
+    o que mantém a cardinalidade fixa. Streams SSE ficam de fora do
+    histograma: duram o tempo que o cliente ficar conectado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response = {"status": "500", "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = str(message["status"])
+                for key, value in message.get("headers", ()):
+                    if key.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        response["stream"] = True
+            await send(message)
+
+        # O router só é conhecido depois do roteamento, então o gauge não tem rótulo
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            if not response["stream"]:
+                http_request_duration.observe(
+                    time.perf_counter() - started,
+                    _router_name(scope.get("endpoint")), scope["method"], response["status"])
+
+
+def _router_name(endpoint: Optional[Callable]) -> str:
+    if endpoint is None:
+        return "unmatched"
+    module = getattr(endpoint, "__module__", "") or ""
+    if module.startswith("app.routers."):
+        return module.rsplit(".", 1)[1].replace("_router", "")
+    return "app"
+
+
+def _queue_depth(executor) -> int:
+    """Tarefas aguardando worker (ThreadPoolExecutor) ou pendentes (ProcessPoolExecutor)"""
+    if executor is None:
+        return 0
+    work_queue = getattr(executor, "_work_queue", None)
+    if work_queue is not None and hasattr(work_queue, "qsize"):
+        return work_queue.qsize()
+    return len(getattr(executor, "_pending_work_items", ()))
+
+
+def _collect_runtime() -> List[Family]:
+    """Filas, núcleos, caches e scratch deste processo, lidos dos próprios módulos no scrape"""
+    # Importados aqui: esses módulos usam o ffmpeg_runner, que importa este módulo
+    from app.core import blocking
+    from app.core.jobs import job_manager
+    from app.core.scheduler import cpu_scheduler
+    from app.core.workspace import workspace_manager
+    from app.services.overlay_asset_cache import OverlayAssetCache
+    from app.services.probe_service import ProbeService
+    from app.services.result_cache import ResultCache
+
+    # O chroma key (cv2/numpy) só é importado no primeiro uso; o scrape não o carrega
+    green_screen = sys.modules.get("app.services.green_screen_service")
+
+    scheduler = cpu_scheduler.stats()
+    scratch = workspace_manager.stats()
+    probe = ProbeService.stats()
+    overlay = OverlayAssetCache.stats()
+    result = ResultCache.stats()
+
+    queues = {
+        "cpu_scheduler": _queue_depth(cpu_scheduler._executor),
+        "blocking": _queue_depth(blocking._executor),
+        "jobs": _queue_depth(job_manager._executor),
+        "green_screen_pool": _queue_depth(green_screen and green_screen.GreenScreenService._process_pool),
+    }
+    caches = {
+        "probe": (probe["memory_hits"] + probe["disk_hits"], probe["misses"]),
+        "overlay": (overlay["hits"], overlay["misses"]),
+        "result": (result["hits"], result["misses"]),
+    }
+
+    def ratio(hits: int, misses: int) -> float:
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    return [
+        ("bonett_executor_queue_depth", "gauge", "Tarefas aguardando em cada executor",
+         [("bonett_executor_queue_depth", {"executor": name}, depth) for name, depth in queues.items()]),
+        ("bonett_cpu_cores", "gauge", "Núcleos do escalonador de CPU",
+         [("bonett_cpu_cores", {"state": "total"}, scheduler["total_cores"]),
+          ("bonett_cpu_cores", {"state": "in_use"}, scheduler["cores_in_use"])]),
+        ("bonett_cpu_reservations", "gauge", "Reservas de núcleos ativas e aguardando",
+         [("bonett_cpu_reservations", {"state": "active"}, scheduler["active_reservations"]),
+          ("bonett_cpu_reservations", {"state": "waiting"}, scheduler["waiting_reservations"])]),
+        ("bonett_cache_hits_total", "counter", "Acertos por cache",
+         [("bonett_cache_hits_total", {"cache": name}, hits) for name, (hits, _) in caches.items()]),
+        ("bonett_cache_misses_total", "counter", "Falhas por cache",
+         [("bonett_cache_misses_total", {"cache": name}, misses) for name, (_, misses) in caches.items()]),
+        ("bonett_cache_hit_ratio", "gauge", "Acertos / consultas desde o início do processo",
+         [("bonett_cache_hit_ratio", {"cache": name}, ratio(*counts)) for name, counts in caches.items()]),
+        ("bonett_cache_evictions_total", "counter", "Entradas descartadas por limite de tamanho",
+         [("bonett_cache_evictions_total", {"cache": "overlay"}, overlay["evictions"]),
+          ("bonett_cache_evictions_total", {"cache": "result"}, result["evictions"])]),
+        ("bonett_result_cache_seconds_saved_total", "counter", "Tempo de processamento evitado por acertos do cache de resultados",
+         [("bonett_result_cache_seconds_saved_total", {}, result["seconds_saved"])]),
+        ("bonett_scratch_bytes", "gauge", "Orçamento, reservas e espaço livre do SCRATCH_DIR",
+         [("bonett_scratch_bytes", {"state": "budget"}, scratch["budget_bytes"]),
+          ("bonett_scratch_bytes", {"state": "reserved"}, scratch["reserved_bytes"]),
+          ("bonett_scratch_bytes", {"state": "free"}, scratch["disk_free_bytes"] or 0)]),
+        ("bonett_scratch_workspaces", "gauge", "Diretórios de trabalho ativos e jobs aguardando espaço",
+         [("bonett_scratch_workspaces", {"state": "active"}, scratch["active_workspaces"]),
+          ("bonett_scratch_workspaces", {"state": "waiting"}, scratch["waiting_workspaces"])]),
+        ("bonett_scratch_wait_seconds_total", "counter", "Tempo total de espera por espaço no scratch",
+         [("bonett_scratch_wait_seconds_total", {}, scratch["wait_seconds"])]),
+    ]
+
+
+def _collect_shared() -> List[Family]:
+    """Jobs e bytes dos caches em disco: iguais em todos os workers"""
+    from app.core.jobs import job_registry, JOB_STATUS_QUEUED, JOB_STATUS_PROCESSING
+    from app.services.overlay_asset_cache import OverlayAssetCache
+    from app.services.result_cache import ResultCache
+
+    return [
+        ("bonett_jobs", "gauge", "Jobs no registro por status",
+         [("bonett_jobs", {"status": status}, job_registry.count(status))
+          for status in (JOB_STATUS_QUEUED, JOB_STATUS_PROCESSING)]),
+        ("bonett_cache_bytes", "gauge", "Bytes em disco por cache",
+         [("bonett_cache_bytes", {"cache": "overlay"}, OverlayAssetCache.stats()["bytes"]),
+          ("bonett_cache_bytes", {"cache": "result"}, ResultCache.stats()["bytes"])]),
+    ]
+
+
+registry.register_collector(_collect_runtime)
+registry.register_collector(_collect_shared, shared=True)
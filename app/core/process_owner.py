@@ -0,0 +1,29 @@
+import os
+
+
+def process_start(pid: int) -> str:
+    """Instante de início do processo (campo 22 de /proc/<pid>/stat) ou '' fora do Linux"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return ""
+    # O nome do processo (campo 2) pode ter espaços: conta a partir do último ')'
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def owner_id(pid: int) -> str:
+    """Identificador "<pid> <início>" de um processo, gravado como dono de um recurso"""
+    return f"{pid} {process_start(pid)}"
+
+
+def owner_alive(pid: int, started: str) -> bool:
+    """O processo ainda existe e é o mesmo (PIDs são reaproveitados, inclusive o 1 em containers)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    current = process_start(pid)
+    return not (started and current) or current == started
@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """Limite de CPU do cgroup (v2: cpu.max, v1: cfs_quota/cfs_period) ou None"""
+    cpu_max = _read_file("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    for base in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        quota = _read_file(os.path.join(base, "cpu.cfs_quota_us"))
+        period = _read_file(os.path.join(base, "cpu.cfs_period_us"))
+        if quota and period and int(quota) > 0 and int(period) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def detect_cpu_limit() -> Tuple[int, str]:
+    """
+    Núcleos realmente disponíveis para o processo e a origem do valor.
+
+    Considera, nesta ordem de prioridade: a variável CPU_LIMIT, a cota do
+    cgroup (Docker/Kubernetes) e a afinidade do processo. os.cpu_count()
+    sozinho reporta os núcleos do host e ignora a cota do container.
+    """
+    env_limit = os.getenv("CPU_LIMIT")
+    if env_limit:
+        return max(1, int(float(env_limit))), "env"
+
+    try:
+        cores, source = len(os.sched_getaffinity(0)), "affinity"
+    except AttributeError:
+        cores, source = os.cpu_count() or 1, "cpu_count"
+
+    quota = _cgroup_cpu_limit()
+    if quota is not None and quota < cores:
+        # Arredonda para baixo: uma cota de 1.5 CPU não comporta 2 encodes cheios
+        cores, source = max(1, math.floor(quota)), "cgroup"
+
+    return cores, source
+
+
+def worker_processes() -> int:
+    """
+    Workers uvicorn/gunicorn do container (WEB_CONCURRENCY, a mesma variável
+    que o uvicorn usa como padrão de --workers). Cada worker tem seu próprio
+    escalonador e orçamento de scratch, então os limites são divididos entre eles.
+    """
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1") or 1))
+
+
+class CpuScheduler:
+    """
+    Distribui orçamentos de núcleos entre os processos ffmpeg da aplicação.
+
+    Cada execução reserva `cores` núcleos antes de iniciar e recebe os
+    parâmetros -threads/-filter_threads correspondentes; reservas que não
+    cabem no orçamento aguardam em ordem de chegada. O executor compartilhado
+    substitui os pools que cada serviço mantinha.
+    """
+
+    def __init__(self, total_cores: int, source: str = "manual", job_cores: Optional[int] = None, max_workers: Optional[int] = None):
+        self.total_cores = max(1, total_cores)
+        self.source = source
+        # Por padrão cada ffmpeg recebe metade dos núcleos: dois encodes simultâneos
+        self.job_cores = max(1, min(job_cores or self.total_cores // 2, self.total_cores))
+        self.max_workers = max_workers or max(4, self.total_cores * 2)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cores_in_use = 0
+        self._active = 0
+        self._waiting: "deque[object]" = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Executor compartilhado, criado no primeiro uso"""
+        if self._executor is None:
+            with self._condition:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="cpu-scheduler")
+        return self._executor
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """Executa a função no executor compartilhado"""
+        return self.executor.submit(func, *args, **kwargs)
+
+    def clamp(self, cores: Optional[int] = None) -> int:
+        """Orçamento efetivo: padrão por job, limitado ao total disponível"""
+        return max(1, min(cores or self.job_cores, self.total_cores))
+
+    @contextmanager
+    def reserve(self, cores: Optional[int] = None) -> Iterator[int]:
+        """Bloqueia até haver `cores` núcleos livres e os reserva durante o bloco"""
+        cores = self.clamp(cores)
+        ticket = object()
+
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while (self._waiting[0] is not ticket
+                       or self._cores_in_use + cores > self.total_cores):
+                    self._condition.wait()
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+                raise
+            self._waiting.popleft()
+            self._cores_in_use += cores
+            self._active += 1
+            self._condition.notify_all()
+
+        try:
+            yield cores
+        finally:
+            with self._condition:
+                self._cores_in_use -= cores
+                self._active -= 1
+                self._condition.notify_all()
+
+    def parallelism(self, cores_per_task: int = 1) -> int:
+        """Quantas tarefas de `cores_per_task` núcleos cabem ao mesmo tempo"""
+        return max(1, self.total_cores // self.clamp(cores_per_task))
+
+    @staticmethod
+    def ffmpeg_thread_args(cores: int) -> Tuple[List[str], List[str]]:
+        """
+        Parâmetros de threads do ffmpeg para um orçamento de núcleos.
+
+        Returns:
+            (opções globais, opções de saída): os filtros são globais e vão
+            logo após o executável; -threads do encoder vai antes da saída.
+        """
+        return (
+            ['-filter_threads', str(cores), '-filter_complex_threads', str(cores)],
+            ['-threads', str(cores)]
+        )
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "total_cores": self.total_cores,
+                "source": self.source,
+                "job_cores": self.job_cores,
+                "cores_in_use": self._cores_in_use,
+                "utilization": round(self._cores_in_use / self.total_cores, 4),
+                "active_reservations": self._active,
+                "waiting_reservations": len(self._waiting),
+            }
+
+
+_total_cores, _source = detect_cpu_limit()
+_workers = worker_processes()
+if _workers > 1:
+    _total_cores, _source = max(1, _total_cores // _workers), f"{_source}/{_workers} workers"
+
+cpu_scheduler = CpuScheduler(
+    _total_cores,
+    source=_source,
+    job_cores=int(os.getenv("FFMPEG_JOB_CORES", "0")) or None,
+    max_workers=int(os.getenv("SCHEDULER_WORKERS", "0")) or None
+)
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from app.core.process_owner import owner_alive, owner_id
+from app.core.scheduler import worker_processes
+
+
+_OWNER_FILE = ".owner"
+# Diretórios sem dono registrado só são varridos depois disso (criação em andamento)
+_UNOWNED_GRACE_SECONDS = 60
+
+
+class WorkspaceManager:
+    """
+    Diretórios de trabalho por job dentro de SCRATCH_DIR (tmpfs, RAM disk ou
+    NVMe local) com orçamento global de espaço.
+
+    Cada job reserva uma estimativa de bytes antes de receber o diretório;
+    reservas que não cabem no orçamento aguardam em ordem de chegada em vez
+    de falhar com ENOSPC no meio do ffmpeg. Um job maior que o orçamento
+    inteiro roda sozinho. Cada diretório guarda o PID (e o instante de início)
+    do processo dono, e sweep() remove os que ficaram de processos mortos.
+    """
+
+    def __init__(self, root: str, budget_bytes: int, source: str = "manual"):
+        self.root = root
+        self.budget_bytes = max(1, budget_bytes)
+        self.source = source
+        self._pid = os.getpid()
+        self._owner = owner_id(self._pid)
+        self._reserved = 0
+        self._active = 0
+        self._waiting: "deque[object]" = deque()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._stats = {"workspaces": 0, "waits": 0, "wait_seconds": 0.0, "swept": 0}
+
+    @contextmanager
+    def workspace(self, prefix: str = "job", reserve_bytes: int = 0) -> Iterator[str]:
+        """
+        Diretório exclusivo do job, removido com todo o conteúdo ao sair do bloco.
+
+        Bloqueia até `reserve_bytes` caber no orçamento e mantém a reserva
+        durante o bloco. Um workspace aberto dentro de outro na mesma thread
+        (pipeline encadeado chamando os serviços) não espera: o job externo
+        já foi admitido e esperar por ele mesmo travaria.
+        """
+        need = max(0, int(reserve_bytes))
+        nested = getattr(self._local, "depth", 0) > 0
+        ticket = object()
+        started = time.perf_counter()
+        waited = False
+
+        with self._condition:
+            if not nested:
+                self._waiting.append(ticket)
+                try:
+                    while (self._waiting[0] is not ticket
+                           or (self._reserved and self._reserved + need > self.budget_bytes)):
+                        waited = True
+                        self._condition.wait()
+                except BaseException:
+                    self._waiting.remove(ticket)
+                    self._condition.notify_all()
+                    raise
+                self._waiting.popleft()
+            self._reserved += need
+            self._active += 1
+            self._stats["workspaces"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.perf_counter() - started
+            self._condition.notify_all()
+
+        path = os.path.join(self.root, f"{prefix}_{uuid.uuid4().hex[:12]}")
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            os.makedirs(path)
+            with open(os.path.join(path, _OWNER_FILE), "w") as f:
+                f.write(self._owner)
+            yield path
+        finally:
+            self._local.depth -= 1
+            shutil.rmtree(path, ignore_errors=True)
+            with self._condition:
+                self._reserved -= need
+                self._active -= 1
+                self._condition.notify_all()
+
+    @staticmethod
+    def estimate(*paths: Optional[str], factor: float = 1.0) -> int:
+        """Reserva proporcional ao tamanho dos arquivos (ausentes contam zero)"""
+        total = 0
+        for path in paths:
+            if path and os.path.isfile(path):
+                total += os.path.getsize(path)
+        return int(total * factor)
+
+    def sweep(self) -> int:
+        """Remove diretórios de processos que não existem mais; retorna quantos"""
+        if not os.path.isdir(self.root):
+            return 0
+
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or os.path.islink(path):
+                continue
+            try:
+                with open(os.path.join(path, _OWNER_FILE)) as f:
+                    owner = f.read().strip()
+                pid, _, started = owner.partition(" ")
+                # O mesmo PID com outro instante de início é um processo antigo (reinício do container)
+                orphan = owner != self._owner and not (
+                    int(pid) != self._pid and owner_alive(int(pid), started))
+            except (OSError, ValueError):
+                try:
+                    orphan = time.time() - os.path.getmtime(path) > _UNOWNED_GRACE_SECONDS
+                except OSError:
+                    continue
+            if orphan:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+
+        if removed:
+            print(f"Workspace: {removed} diretório(s) órfão(s) removido(s) de {self.root}")
+        with self._condition:
+            self._stats["swept"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                "root": self.root,
+                "budget_bytes": self.budget_bytes,
+                "source": self.source,
+                "reserved_bytes": self._reserved,
+                "active_workspaces": self._active,
+                "waiting_workspaces": len(self._waiting),
+            })
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        try:
+            usage = shutil.disk_usage(self.root)
+            stats["disk_free_bytes"] = usage.free
+        except OSError:
+            stats["disk_free_bytes"] = None
+        return stats
+
+
+def detect_scratch_budget(root: str) -> Tuple[int, str]:
+    """
+    Orçamento de SCRATCH_MAX_BYTES ou, sem a variável, 90% do espaço livre
+    em SCRATCH_DIR na inicialização.
+    """
+    env_budget = os.getenv("SCRATCH_MAX_BYTES")
+    if env_budget:
+        return int(env_budget), "env"
+    os.makedirs(root, exist_ok=True)
+    return int(shutil.disk_usage(root).free * 0.9), "disk"
+
+
+_scratch_dir = os.getenv(
+    "SCRATCH_DIR",
+    os.path.join(tempfile.gettempdir(), "bonett_scratch")
+)
+_budget, _budget_source = detect_scratch_budget(_scratch_dir)
+_workers = worker_processes()
+if _workers > 1:
+    # Os workers compartilham o SCRATCH_DIR: cada um reserva dentro da sua fração
+    _budget, _budget_source = _budget // _workers, f"{_budget_source}/{_workers} workers"
+
+workspace_manager = WorkspaceManager(_scratch_dir, _budget, source=_budget_source)
@@ -1,9 +1,20 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse
+import os
+import tempfile
 from datetime import datetime
-from app.routers import banner_router, cut_router, video_processing_router, watermark_router, green_screen_router, audio_router
+from app.core.admission import AdmissionMiddleware, check_dependencies, readiness
+from app.core.blocking import run_blocking
+from app.core.encoding_profiles import ENCODING_PROFILES
+from app.core.jobs import job_registry
+from app.core.metrics import MetricsMiddleware, registry as metrics_registry
+from app.core.scheduler import cpu_scheduler, worker_processes
+from app.core.workspace import workspace_manager
+from app.services.overlay_asset_cache import OverlayAssetCache
+from app.services.probe_service import ProbeService
+from app.services.result_cache import ResultCache
+from app.routers import banner_router, cut_router, video_processing_router, watermark_router, green_screen_router, audio_router, jobs_router, pipeline_router
 
 app = FastAPI(
     title="Bonett Studio Flow API",
@@ -20,6 +31,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Adicionado antes: o MetricsMiddleware fica por fora e também conta as recusas
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+async def sweep_scratch():
+    """Remove diretórios de trabalho deixados por processos que morreram no meio de um job"""
+    workspace_manager.sweep()
+
+
+@app.on_event("startup")
+async def trim_result_cache():
+    """Libera espaço das entradas do cache cujas saídas foram apagadas enquanto a API estava parada"""
+    await run_blocking(ResultCache.trim)
+
+
+@app.on_event("startup")
+async def verify_dependencies():
+    """Verifica ffmpeg/ffprobe uma vez na inicialização; /health/ready reutiliza o resultado"""
+    dependencies = await run_blocking(check_dependencies)
+    for binary, version in dependencies.items():
+        if version is None:
+            print(f"Aviso: {binary} não encontrado no PATH")
+
+
+@app.on_event("startup")
+async def share_metrics():
+    """Com vários workers, publica as métricas de cada um para que qualquer worker responda /metrics por todos"""
+    metrics_dir = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "bonett_metrics"))
+    if worker_processes() > 1 and metrics_dir:
+        await run_blocking(
+            metrics_registry.enable_multiprocess,
+            metrics_dir, float(os.getenv("METRICS_PUBLISH_SECONDS", "5")))
+
+
+@app.on_event("startup")
+async def recover_jobs():
+    """Marca como falhos os jobs que ficaram pendentes em workers encerrados"""
+    if worker_processes() > 1 and not os.getenv("JOB_STORE_DB", "x"):
+        print("Aviso: JOB_STORE_DB vazio com vários workers; cada worker só enxerga os próprios jobs")
+    await run_blocking(job_registry.recover)
 
 
 app.include_router(banner_router.router, prefix="/api/v1")
@@ -28,6 +81,8 @@ app.include_router(watermark_router.router, prefix="/api/v1")
 app.include_router(video_processing_router.router, prefix="/api/v1")
 app.include_router(green_screen_router.router, prefix="/api/v1")
 app.include_router(audio_router.router, prefix="/api/v1")
+app.include_router(jobs_router.router, prefix="/api/v1")
+app.include_router(pipeline_router.router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -47,7 +102,9 @@ async def root():
             "watermark_endpoints": "/api/v1/watermark/*",
             "video_processing_endpoints": "/api/v1/video/*",
             "green_screen_endpoints": "/api/v1/green-screen/*",
-            "audio_endpoints": "/api/v1/audio/*"
+            "audio_endpoints": "/api/v1/audio/*",
+            "job_endpoints": "/api/v1/jobs/*",
+            "pipeline_endpoints": "/api/v1/pipeline/*"
         },
         "features": [
             "Adição de Banner em Vídeos",
@@ -55,7 +112,8 @@ async def root():
             "Aplicação de Marca D'água",
             "Processamento Geral de Vídeos",
             "Remoção de Fundo Verde (Chroma Key)",
-            "Processamento e Mixagem de Áudio"
+            "Processamento e Mixagem de Áudio",
+            "Pipeline com Codificação Única (corte, banner, marca d'água e áudio)"
         ],
         "supported_formats": {
             "video": [".mp4"],
@@ -70,35 +128,107 @@ async def root():
 @app.get("/health")
 async def health_check():
     """
-    Endpoint de verificação de saúde geral da API de processamento de vídeo
+    Saúde geral: o resultado real de /health/ready (dependências, diretório de
+    trabalho e capacidade). Responde 503 só quando falta ffmpeg/ffprobe ou o
+    diretório de trabalho; réplica saturada continua "healthy".
     """
-    return {
-        "status": "healthy",
-        "message": "Video Processing API funcionando corretamente",
+    ready, body = readiness()
+    checks = body["checks"]
+    healthy = checks["ffmpeg"] and checks["ffprobe"] and checks["scratch_dir"]
+    content = {
+        "status": "healthy" if healthy else "unhealthy",
+        "ready": ready,
         "timestamp": datetime.now().isoformat(),
-        "services": {
-            "banner_service": "healthy",
-            "cut_service": "healthy",
-            "watermark_service": "healthy",
-            "video_processing_service": "healthy",
-            "green_screen_service": "healthy",
-            "audio_service": "healthy"
-        },
-        "dependencies": {
-            "ffmpeg": "required - check installation",
-            "temp_directory": "accessible",
-            "thread_pool": "active"
-        },
+        **{key: value for key, value in body.items() if key != "status"},
         "endpoints_status": {
-            "banner": "/api/v1/banner/health",
-            "cut": "/api/v1/cut/health",
-            "watermark": "/api/v1/watermark/health",
-            "video_processing": "/api/v1/video/health",
-            "green_screen": "/api/v1/green-screen/health",
-            "audio": "/api/v1/audio/health"
+            "live": "/health/live",
+            "ready": "/health/ready"
         },
         "version": "1.0.0"
     }
+    if healthy:
+        return content
+    return JSONResponse(status_code=503, content=content)
+
+
+@app.get("/health/live")
+async def liveness():
+    """
+    Liveness: o processo está de pé e o event loop responde
+    """
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: ffmpeg/ffprobe presentes, diretório de trabalho acessível e capacidade
+    para novos processamentos. Responde 503 (com Retry-After) quando a réplica está saturada.
+    """
+    ready, body = readiness()
+    if ready:
+        return body
+    headers = {"Retry-After": str(body["retry_after"])} if "retry_after" in body else None
+    return JSONResponse(status_code=503, content=body, headers=headers)
+
+
+@app.get("/cache/probe")
+async def probe_cache_stats():
+    """
+    Estatísticas do cache de metadados de mídia (ffprobe) compartilhado pelos serviços
+    """
+    return await run_blocking(ProbeService.stats)
+
+
+@app.get("/cache/overlays")
+async def overlay_cache_stats():
+    """
+    Estatísticas do cache de overlays pré-processados (marca d'água e faixas de banner)
+    """
+    return await run_blocking(OverlayAssetCache.stats)
+
+
+@app.get("/cache/results")
+async def result_cache_stats():
+    """
+    Estatísticas do cache de resultados (saídas reaproveitadas em requisições repetidas)
+    """
+    return await run_blocking(ResultCache.stats)
+
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    """
+    Núcleos disponíveis (cgroup/afinidade) e utilização atual do escalonador de CPU dos processos ffmpeg
+    """
+    return cpu_scheduler.stats()
+
+
+@app.get("/scratch")
+async def scratch_stats():
+    """
+    Diretório de trabalho (SCRATCH_DIR), orçamento de espaço e reservas dos jobs em andamento
+    """
+    return workspace_manager.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas no formato do Prometheus: latência por router, processos ffmpeg por serviço
+    e etapa, filas dos executores, caches e scratch
+    """
+    # O coletor lê os jobs no SQLite: fora do event loop
+    return PlainTextResponse(
+        await run_blocking(metrics_registry.render), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/encoding-profiles")
+async def encoding_profiles():
+    """
+    Perfis de codificação disponíveis (campo encoding_profile das requisições)
+    """
+    return ENCODING_PROFILES
 
 
 @app.exception_handler(Exception)
@@ -117,10 +247,16 @@ async def global_exception_handler(request, exc):
 
 
 if __name__ == "__main__":
+    import uvicorn
+
+    # RELOAD=1 para desenvolvimento (um único processo). Sem ele, sobe
+    # WEB_CONCURRENCY workers que compartilham os jobs pelo JOB_STORE_DB.
+    reload = os.getenv("RELOAD") == "1"
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8080,
-        reload=True,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8080")),
+        reload=reload,
+        workers=None if reload else worker_processes(),
         log_level="info"
     )
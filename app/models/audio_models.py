@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 
 class MixAudioRequest(BaseModel):
@@ -6,3 +7,17 @@ class MixAudioRequest(BaseModel):
     audio_path: str
     replace_original: bool = True
     reduce_original_volume: bool = False
+    encoding_profile: str = "fast"  # draft | fast | standard | archive
+
+
+class BatchMixVideo(BaseModel):
+    video_path: str
+    output_path: Optional[str] = None  # sem output_path vale replace_original
+
+
+class MixAudioBatchRequest(BaseModel):
+    audio_path: str
+    videos: List[BatchMixVideo]
+    replace_original: bool = True
+    reduce_original_volume: bool = False
+    encoding_profile: str = "fast"  # draft | fast | standard | archive
@@ -8,3 +8,4 @@ class AddBannerRequest(BaseModel):
     position: str = "top"
     banner_scale: float = 1.0
     padding: int = 0
+    encoding_profile: str = "standard"  # draft | fast | standard | archive
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 
 class CutVideoRequest(BaseModel):
@@ -6,3 +7,19 @@ class CutVideoRequest(BaseModel):
     output_path: str
     start_time: str
     end_time: str
+    mode: str = "copy"  # copy | smart | reencode
+    encoding_profile: str = "fast"  # draft | fast | standard | archive (modo reencode)
+
+
+class CutRange(BaseModel):
+    start_time: str
+    end_time: str
+    output_path: str
+
+
+class BatchCutVideoRequest(BaseModel):
+    input_path: str
+    ranges: List[CutRange]
+    mode: str = "copy"  # copy | smart | reencode
+    encoding_profile: str = "fast"  # draft | fast | standard | archive (modo reencode)
+
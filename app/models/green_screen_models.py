@@ -1,8 +1,26 @@
 from pydantic import BaseModel
-from typing import Tuple
+from typing import List, Tuple
 
 
 class RemoveGreenScreenRequest(BaseModel):
     image_path: str
     lower_bound: Tuple[int, int, int] = (40, 100, 20)
     upper_bound: Tuple[int, int, int] = (80, 255, 255)
+    engine: str = "hard"  # hard | soft
+
+
+class RemoveGreenScreenVideoRequest(BaseModel):
+    video_path: str
+    output_path: str
+    output_format: str = "prores"  # prores | vp9 | png
+    lower_bound: Tuple[int, int, int] = (40, 100, 20)
+    upper_bound: Tuple[int, int, int] = (80, 255, 255)
+    engine: str = "hard"  # hard | soft
+    batch_frames: int = 16
+
+
+class RemoveGreenScreenBatchRequest(BaseModel):
+    image_paths: List[str]
+    lower_bound: Tuple[int, int, int] = (40, 100, 20)
+    upper_bound: Tuple[int, int, int] = (80, 255, 255)
+    engine: str = "hard"  # hard | soft
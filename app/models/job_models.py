@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    message: str
+    progress: float
+    stats: Optional[Dict[str, Any]] = None
+    video_path: Optional[str] = None
+    output_path: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    updated_at: Optional[str] = None
@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class PipelineOperation(BaseModel):
+    type: str  # cut | banner | watermark | audio
+    # cut
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    mode: Optional[str] = None  # reencode (fundido) | copy | smart (encadeados)
+    # banner
+    image_path: Optional[str] = None
+    position: Optional[str] = None
+    banner_scale: Optional[float] = None
+    padding: Optional[int] = None
+    # watermark
+    watermark_path: Optional[str] = None
+    opacity: Optional[float] = None
+    scale: Optional[float] = None
+    # audio
+    audio_path: Optional[str] = None
+    reduce_original_volume: Optional[bool] = None
+
+
+class PipelineRequest(BaseModel):
+    input_path: str
+    output_path: str
+    operations: List[PipelineOperation]
+    encoding_profile: str = "standard"  # draft | fast | standard | archive
@@ -8,9 +8,30 @@ from typing import List, Dict, Any, Optional
 class VideoProcessingRequest(BaseModel):
     video_path: str
     output_path: str
+    engine: str = "filtergraph"
+    max_parallel_segments: Optional[int] = None
+    encoding_profile: str = "fast"  # draft | fast | standard | archive
 
 
 class VideoProcessingResponse(BaseModel):
     success: bool
     message: str
     output_path: Optional[str] = None
+
+
+class VideoProcessingJobSubmitted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class VideoProcessingJob(BaseModel):
+    id: str
+    status: str
+    message: str
+    progress: float
+    video_path: Optional[str] = None
+    output_path: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
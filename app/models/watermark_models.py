@@ -7,3 +7,4 @@ class AddWatermarkRequest(BaseModel):
     output_path: str
     opacity: float = 0.5
     scale: float = 0.5
+    encoding_profile: str = "standard"  # draft | fast | standard | archive
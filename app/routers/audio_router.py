@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 import os
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
 from app.services.audio_service import AudioService
-from app.models.audio_models import MixAudioRequest
+from app.models.audio_models import MixAudioBatchRequest, MixAudioRequest
 
 router = APIRouter(
     prefix="/audio",
@@ -16,16 +18,60 @@ async def mix_audio_async(request: MixAudioRequest):
     """
     Endpoint para mesclar áudio MP3 com vídeo usando threads.
     Aguarda a conclusão do processamento antes de retornar.
+    O progresso pode ser acompanhado em /jobs/{job_id}/events.
     """
+    job = await run_blocking(job_registry.create, "audio", video_path=request.video_path)
     try:
-        # Este método vai utilizar threads, mas ainda vai aguardar a conclusão
-        result = AudioService.mix_audio_with_video_threaded(
+        # Processa fora do event loop, registrando o andamento no job
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            AudioService.mix_audio_with_video,
             video_path=request.video_path,
             audio_path=request.audio_path,
             replace_original=request.replace_original,
-            reduce_original_volume=request.reduce_original_volume
+            reduce_original_volume=request.reduce_original_volume,
+            encoding_profile=request.encoding_profile
         )
-        return {"status": "success", "message": "Processamento concluído com sucesso", "output_path": result}
+        return {"status": "success", "message": "Processamento concluído com sucesso", "output_path": result, "job_id": job["id"]}
     except Exception as e:
         print(f"Erro no endpoint mix-audio-async: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/process/mix-audio-batch")
+async def mix_audio_batch(request: MixAudioBatchRequest):
+    """
+    Endpoint para mesclar a mesma trilha em vários vídeos.
+    A trilha é decodificada uma única vez e os vídeos são mixados em paralelo.
+    Retorna o resultado de cada vídeo e o tempo economizado estimado; o
+    progresso pode ser acompanhado em /jobs/{job_id}/events.
+    """
+    job = await run_blocking(job_registry.create, "audio", audio_path=request.audio_path)
+    try:
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            AudioService.mix_audio_batch,
+            audio_path=request.audio_path,
+            videos=[
+                {"video_path": video.video_path, "output_path": video.output_path}
+                for video in request.videos
+            ],
+            replace_original=request.replace_original,
+            reduce_original_volume=request.reduce_original_volume,
+            encoding_profile=request.encoding_profile
+        )
+        status = "success" if all(item["success"] for item in result["results"]) else "partial"
+        return {
+            "status": status,
+            "results": result["results"],
+            "decode_seconds": result["decode_seconds"],
+            "elapsed_seconds": result["elapsed_seconds"],
+            "estimated_individual_seconds": result["estimated_individual_seconds"],
+            "time_saved_seconds": result["time_saved_seconds"],
+            "job_id": job["id"]
+        }
+    except Exception as e:
+        print(f"Erro no endpoint mix-audio-batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
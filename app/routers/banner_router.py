@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 import os
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
 from app.services.banner_service import BannerService
+from app.services.result_cache import ResultCache
 from app.models.banner_models import AddBannerRequest
 
 router = APIRouter(
@@ -13,16 +16,31 @@ router = APIRouter(
 
 @router.post("/api/process/add-banner")
 async def add_banner(request: AddBannerRequest):
-    """Endpoint para adicionar banner ao vídeo"""
+    """Endpoint para adicionar banner ao vídeo. O progresso pode ser acompanhado em /jobs/{job_id}/events"""
+    job = await run_blocking(
+        job_registry.create, "banner", video_path=request.video_path, output_path=request.output_path)
     try:
-        result = BannerService.add_banner(
+        timings = {}
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            ResultCache.cached_call,
+            "banner",
+            BannerService.CACHE_VERSION,
+            [request.video_path, request.image_path],
+            request.output_path,
+            BannerService.cache_params(
+                request.position, request.banner_scale, request.padding, request.encoding_profile),
+            BannerService.add_banner,
             video_path=request.video_path,
             image_path=request.image_path,
             output_path=request.output_path,
             position=request.position,
             banner_scale=request.banner_scale,
-            padding=request.padding
+            padding=request.padding,
+            timings=timings,
+            encoding_profile=request.encoding_profile
         )
-        return {"status": "success", "output_path": result}
+        return {"status": "success", "output_path": result, "timings": timings, "job_id": job["id"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form
 from fastapi.responses import JSONResponse
-from app.models.cut_models import CutVideoRequest
+from app.models.cut_models import BatchCutVideoRequest, CutVideoRequest
 from app.services.cut_service import CutService
+from app.services.result_cache import ResultCache
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
 
 
 router = APIRouter(
@@ -13,14 +16,64 @@ router = APIRouter(
 
 @router.post("/api/process/cut-video")
 async def cut_video(request: CutVideoRequest):
-    """Endpoint para corte de vídeo"""
+    """
+    Endpoint para corte de vídeo. O progresso pode ser acompanhado em /jobs/{job_id}/events
+
+    No modo copy (padrão) o início encaixa no keyframe anterior a start_time:
+    a saída pode começar até um GOP antes e ficar mais longa que o pedido.
+    Para corte preciso no quadro use mode="smart".
+    """
+    job = await run_blocking(
+        job_registry.create, "cut", video_path=request.input_path, output_path=request.output_path)
     try:
-        result = CutService.cut_video(
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            ResultCache.cached_call,
+            "cut",
+            CutService.CACHE_VERSION,
+            [request.input_path],
+            request.output_path,
+            CutService.cache_params(
+                request.start_time, request.end_time, request.mode, request.encoding_profile),
+            CutService.cut_video,
             input_path=request.input_path,
             output_path=request.output_path,
             start_time=request.start_time,
-            end_time=request.end_time
+            end_time=request.end_time,
+            mode=request.mode,
+            encoding_profile=request.encoding_profile
+        )
+        return {"status": "success", "output_path": result, "job_id": job["id"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/process/cut-video-batch")
+async def cut_video_batch(request: BatchCutVideoRequest):
+    """
+    Endpoint para vários cortes do mesmo vídeo em um único ffmpeg (cada trecho com busca própria).
+    Retorna o resultado de cada trecho; o progresso pode ser acompanhado em /jobs/{job_id}/events
+    """
+    job = await run_blocking(job_registry.create, "cut", video_path=request.input_path)
+    try:
+        results = await run_blocking(
+            job_manager.run,
+            job["id"],
+            CutService.cut_video_batch,
+            input_path=request.input_path,
+            ranges=[
+                {
+                    "start_time": cut_range.start_time,
+                    "end_time": cut_range.end_time,
+                    "output_path": cut_range.output_path
+                }
+                for cut_range in request.ranges
+            ],
+            mode=request.mode,
+            encoding_profile=request.encoding_profile
         )
-        return {"status": "success", "output_path": result}
+        status = "success" if all(item["success"] for item in results) else "partial"
+        return {"status": status, "results": results, "job_id": job["id"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.services.green_screen_service import GreenScreenService
-from app.models.green_screen_models import RemoveGreenScreenRequest
+from fastapi.responses import Response, StreamingResponse
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
+from app.models.green_screen_models import (
+    RemoveGreenScreenBatchRequest,
+    RemoveGreenScreenRequest,
+    RemoveGreenScreenVideoRequest
+)
+import asyncio
 import os
-import tempfile
-import cv2
+import zipfile
 
 router = APIRouter(
     prefix="/green_screen",
@@ -13,25 +18,139 @@ router = APIRouter(
 )
 
 
+def _service():
+    """
+    GreenScreenService importado no primeiro uso: cv2 e numpy respondem pela maior
+    parte do tempo de importação da aplicação e workers que nunca fazem chroma key
+    não precisam deles. Chamado no pool bloqueante para não travar o event loop.
+    """
+    from app.services.green_screen_service import GreenScreenService
+    return GreenScreenService
+
+
+def _remove_and_encode(request: RemoveGreenScreenRequest) -> bytes:
+    """Remove o fundo verde e codifica o resultado em PNG na memória"""
+    GreenScreenService = _service()
+    result = GreenScreenService.remove_green_screen(
+        image_path=request.image_path,
+        lower_bound=request.lower_bound,
+        upper_bound=request.upper_bound,
+        engine=request.engine
+    )
+    return GreenScreenService.encode_png(result)
+
+
+class _ZipStream:
+    """Destino não posicionável para o zipfile: acumula os bytes escritos até serem enviados"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _entry_name(index: int, image_path: str) -> str:
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return f"{index:03d}_{name}.png"
+
+
 @router.post("/api/process/remove-green-screen")
 async def remove_green_screen(request: RemoveGreenScreenRequest):
-    """Endpoint para remoção de fundo verde"""
+    """Endpoint para remoção de fundo verde (PNG gerado em memória, sem arquivo temporário)"""
     try:
-        result = GreenScreenService.remove_green_screen(
-            image_path=request.image_path,
-            lower_bound=request.lower_bound,
-            upper_bound=request.upper_bound
+        content = await run_blocking(_remove_and_encode, request)
+
+        return Response(
+            content=content,
+            media_type="image/png",
+            headers={"Content-Disposition": 'attachment; filename="output.png"'}
         )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Salvar temporariamente para retornar
-        temp_dir = tempfile.mkdtemp()
-        output_path = os.path.join(temp_dir, "output.png")
-        cv2.imwrite(output_path, result)
 
-        return FileResponse(
-            output_path,
-            media_type="image/png",
-            filename="output.png"
+@router.post("/api/process/remove-green-screen-batch")
+async def remove_green_screen_batch(request: RemoveGreenScreenBatchRequest):
+    """
+    Endpoint para remoção de fundo verde em várias imagens.
+
+    As imagens são processadas em paralelo no pool de processos e o ZIP é
+    enviado em streaming: cada PNG entra no arquivo assim que fica pronto.
+    Falhas viram uma entrada .error.txt com a mensagem.
+    """
+    if not request.image_paths:
+        raise HTTPException(status_code=400, detail="Nenhuma imagem informada")
+
+    GreenScreenService = await run_blocking(_service)
+    try:
+        futures = GreenScreenService.submit_batch(
+            request.image_paths, request.lower_bound, request.upper_bound, request.engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def keyed(index: int):
+        try:
+            return index, await asyncio.wrap_future(futures[index]), None
+        except Exception as e:
+            return index, None, str(e)
+
+    async def zip_chunks():
+        stream = _ZipStream()
+        try:
+            with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+                for next_done in asyncio.as_completed([keyed(i) for i in range(len(futures))]):
+                    index, content, error = await next_done
+                    name = _entry_name(index, request.image_paths[index])
+                    if error is None:
+                        archive.writestr(name, content)
+                    else:
+                        archive.writestr(f"{name}.error.txt", error)
+                    yield stream.pop()
+            yield stream.pop()
+        finally:
+            # Cliente desconectou ou terminou: descarta o que ainda não começou
+            for future in futures:
+                future.cancel()
+
+    return StreamingResponse(
+        zip_chunks(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="green_screen.zip"'}
+    )
+
+
+@router.post("/api/process/remove-green-screen-video")
+async def remove_green_screen_video(request: RemoveGreenScreenVideoRequest):
+    """
+    Endpoint para remoção de fundo verde em vídeo (ProRes 4444, VP9 com alpha ou sequência PNG).
+    O progresso pode ser acompanhado em /jobs/{job_id}/events
+    """
+    GreenScreenService = await run_blocking(_service)
+    job = await run_blocking(
+        job_registry.create, "green_screen", video_path=request.video_path, output_path=request.output_path)
+    try:
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            GreenScreenService.remove_green_screen_video,
+            video_path=request.video_path,
+            output_path=request.output_path,
+            lower_bound=request.lower_bound,
+            upper_bound=request.upper_bound,
+            output_format=request.output_format,
+            batch_frames=request.batch_frames,
+            engine=request.engine
         )
+        return {"status": "success", "output_path": result, "job_id": job["id"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.blocking import run_blocking
+from app.core.jobs import FINISHED_STATUSES, job_registry
+from app.models.job_models import Job
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Intervalo de leitura do registro e de envio de comentários keep-alive (s)
+POLL_INTERVAL = 0.5
+KEEPALIVE_INTERVAL = 15.0
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, default=str)}\n\n"
+
+
+async def _job_events(request: Request, job_id: str):
+    """Envia o job sempre que ele muda e encerra quando ele termina"""
+    last_update = None
+    last_sent = time.monotonic()
+
+    while not await request.is_disconnected():
+        job = await run_blocking(job_registry.get, job_id)
+        if job is None:
+            yield _sse({"id": job_id, "detail": "Job não encontrado"}, event="end")
+            return
+
+        if job["updated_at"] != last_update:
+            last_update = job["updated_at"]
+            last_sent = time.monotonic()
+            yield _sse(job)
+            if job["status"] in FINISHED_STATUSES:
+                yield _sse(job, event="end")
+                return
+        elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def _all_job_events(request: Request, kind: Optional[str]):
+    """Envia cada job que mudou desde a última leitura, sem encerrar"""
+    seen = {}
+    last_sent = time.monotonic()
+
+    while not await request.is_disconnected():
+        changed = False
+        for job in await run_blocking(job_registry.list, kind=kind):
+            if seen.get(job["id"]) != job["updated_at"]:
+                seen[job["id"]] = job["updated_at"]
+                changed = True
+                yield _sse(job)
+
+        if changed:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+@router.get("", response_model=List[Job])
+def list_jobs(kind: Optional[str] = None, status: Optional[str] = None):
+    """Lista os jobs de todos os serviços ainda mantidos no histórico"""
+    return job_registry.list(kind=kind, status=status)
+
+
+@router.get("/events")
+async def stream_all_jobs(request: Request, kind: Optional[str] = None):
+    """
+    Stream Server-Sent Events com as atualizações de todos os jobs
+    (opcionalmente filtrados por tipo: cyclic, banner, cut, watermark, audio)
+    """
+    return StreamingResponse(
+        _all_job_events(request, kind),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/{job_id}", response_model=Job)
+def get_job(job_id: str):
+    """Retorna status, progresso e estatísticas do ffmpeg (fps, speed, out_time) de um job"""
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"Job não encontrado: {job_id}")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: str, request: Request):
+    """
+    Stream Server-Sent Events com o progresso de um job. Cada mensagem traz o
+    job completo; o evento 'end' é enviado quando o job termina.
+    """
+    if await run_blocking(job_registry.get, job_id) is None:
+        raise HTTPException(
+            status_code=404, detail=f"Job não encontrado: {job_id}")
+
+    return StreamingResponse(
+        _job_events(request, job_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
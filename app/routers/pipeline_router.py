@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
+from app.models.pipeline_models import PipelineRequest
+from app.services.pipeline_service import PipelineService
+
+router = APIRouter(
+    prefix="/pipeline",
+    tags=["Pipeline"],
+    responses={404: {"description": "Arquivo não encontrado"}},
+)
+
+_OPERATION_FIELDS = (
+    "type", "start_time", "end_time", "mode",
+    "image_path", "position", "banner_scale", "padding",
+    "watermark_path", "opacity", "scale",
+    "audio_path", "reduce_original_volume",
+)
+
+
+@router.post("/api/process/run")
+async def run_pipeline(request: PipelineRequest):
+    """
+    Executa cut, banner, watermark e audio em sequência com uma única codificação.
+    Operações que não podem ser fundidas (corte copy/smart) são encadeadas.
+    O progresso pode ser acompanhado em /jobs/{job_id}/events
+    """
+    job = await run_blocking(
+        job_registry.create, "pipeline", video_path=request.input_path, output_path=request.output_path)
+    try:
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            PipelineService.run_pipeline,
+            input_path=request.input_path,
+            output_path=request.output_path,
+            operations=[
+                {name: getattr(operation, name) for name in _OPERATION_FIELDS}
+                for operation in request.operations
+            ],
+            encoding_profile=request.encoding_profile
+        )
+        return {
+            "status": "success",
+            "output_path": result["output_path"],
+            "message": result["message"],
+            "stages": result["stages"],
+            "job_id": job["id"]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
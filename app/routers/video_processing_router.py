@@ -1,12 +1,13 @@
-from fastapi import HTTPException, APIRouter
-from typing import Dict
-from datetime import datetime
+from fastapi import HTTPException, APIRouter, Request
+from typing import List, Optional
+from app.core.jobs import job_manager, job_registry
 from app.services.video_processing_service import VideoProcessor
 from app.models.video_processing import (
     VideoProcessingRequest,
-    VideoProcessingResponse
+    VideoProcessingResponse,
+    VideoProcessingJob,
+    VideoProcessingJobSubmitted
 )
-import uuid
 import os
 
 router = APIRouter(
@@ -15,7 +16,7 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-tasks_history: Dict[str, Dict] = {}
+JOB_KIND = "cyclic"
 
 
 @router.post("/api/process/create-cyclic")
@@ -25,59 +26,79 @@ def process_video_sync(request: VideoProcessingRequest):
     Só retorna quando o processamento estiver completamente finalizado
     """
 
-    task_id = str(uuid.uuid4())
-
     if not os.path.exists(request.video_path):
         raise HTTPException(
             status_code=400, detail=f"Arquivo de vídeo não encontrado: {request.video_path}")
 
-    tasks_history[task_id] = {
-        "id": task_id,
-        "status": "processing",
-        "video_path": request.video_path,
-        "output_path": request.output_path,
-        "start_time": datetime.now().isoformat()
-    }
-
     try:
-        result = VideoProcessor.create_cyclic_video(
+        result = job_manager.run_sync(
+            JOB_KIND,
+            VideoProcessor.create_cyclic_video,
             video_path=request.video_path,
             output_path=request.output_path,
-            progress_callback=lambda msg, prog: update_task_progress(
-                task_id, msg, prog)
+            engine=request.engine,
+            max_parallel_segments=request.max_parallel_segments,
+            encoding_profile=request.encoding_profile,
+            job_fields={
+                "video_path": request.video_path,
+                "output_path": request.output_path
+            }
         )
-
-        tasks_history[task_id].update({
-            "status": "completed" if result["success"] else "failed",
-            "message": result["message"],
-            "output_path": result.get("output_path"),
-            "end_time": datetime.now().isoformat()
-        })
-
-        if result["success"]:
-            return VideoProcessingResponse(
-                success=True,
-                message=result["message"],
-                output_path=result["output_path"]
-            )
-        else:
-            raise HTTPException(status_code=500, detail=result["message"])
-
     except Exception as e:
-        tasks_history[task_id].update({
-            "status": "failed",
-            "message": f"Erro: {str(e)}",
-            "end_time": datetime.now().isoformat()
-        })
         raise HTTPException(status_code=500, detail=str(e))
 
+    if not result["success"]:
+        raise HTTPException(status_code=500, detail=result["message"])
 
-def update_task_progress(task_id: str, message: str, progress: float):
+    return VideoProcessingResponse(
+        success=True,
+        message=result["message"],
+        output_path=result["output_path"]
+    )
+
+
+@router.post("/api/process/create-cyclic-async", status_code=202, response_model=VideoProcessingJobSubmitted)
+def process_video_async(request: VideoProcessingRequest, http_request: Request):
     """
-    Função auxiliar para atualizar o progresso da tarefa no histórico
+    Endpoint para processamento de vídeo em fila.
+    Retorna imediatamente o id do job; o status pode ser consultado em /Video/api/jobs/{job_id}
     """
-    if task_id in tasks_history:
-        tasks_history[task_id].update({
-            "message": message,
-            "progress": progress
-        })
+    if not os.path.exists(request.video_path):
+        raise HTTPException(
+            status_code=400, detail=f"Arquivo de vídeo não encontrado: {request.video_path}")
+
+    job = job_manager.submit(
+        JOB_KIND,
+        VideoProcessor.create_cyclic_video,
+        video_path=request.video_path,
+        output_path=request.output_path,
+        engine=request.engine,
+        max_parallel_segments=request.max_parallel_segments,
+        encoding_profile=request.encoding_profile,
+        job_fields={
+            "video_path": request.video_path,
+            "output_path": request.output_path
+        }
+    )
+
+    return VideoProcessingJobSubmitted(
+        job_id=job["id"],
+        status=job["status"],
+        status_url=str(http_request.url_for("get_job", job_id=job["id"]))
+    )
+
+
+@router.get("/api/jobs", response_model=List[VideoProcessingJob])
+def list_jobs(status: Optional[str] = None):
+    """Lista os jobs de vídeo cíclico ainda mantidos no histórico"""
+    return job_registry.list(kind=JOB_KIND, status=status)
+
+
+@router.get("/api/jobs/{job_id}", response_model=VideoProcessingJob)
+def get_job(job_id: str):
+    """Retorna status e progresso de um job de vídeo cíclico"""
+    job = job_registry.get(job_id)
+    if job is None or job["kind"] != JOB_KIND:
+        raise HTTPException(
+            status_code=404, detail=f"Job não encontrado: {job_id}")
+    return job
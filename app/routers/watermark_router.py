@@ -1,4 +1,7 @@
 from fastapi import APIRouter, HTTPException
+from app.core.blocking import run_blocking
+from app.core.jobs import job_manager, job_registry
+from app.services.result_cache import ResultCache
 from app.services.watermark_service import WatermarkService
 from app.models.watermark_models import AddWatermarkRequest
 
@@ -11,15 +14,36 @@ router = APIRouter(
 
 @router.post("/api/process/add-watermark")
 async def add_watermark(request: AddWatermarkRequest):
-    """Endpoint para adicionar marca d'água ao vídeo"""
+    """Endpoint para adicionar marca d'água ao vídeo. O progresso pode ser acompanhado em /jobs/{job_id}/events"""
+    job = await run_blocking(
+        job_registry.create, "watermark", video_path=request.video_path, output_path=request.output_path)
     try:
-        result = WatermarkService.add_watermark(
+        # Substituir o próprio vídeo não é idempotente: só saídas separadas passam pelo cache
+        if request.output_path and request.output_path != request.video_path:
+            call = [
+                ResultCache.cached_call,
+                "watermark",
+                WatermarkService.CACHE_VERSION,
+                [request.video_path, request.watermark_path],
+                request.output_path,
+                WatermarkService.cache_params(
+                    request.opacity, request.scale, request.encoding_profile),
+                WatermarkService.add_watermark
+            ]
+        else:
+            call = [WatermarkService.add_watermark]
+
+        result = await run_blocking(
+            job_manager.run,
+            job["id"],
+            *call,
             video_path=request.video_path,
             watermark_path=request.watermark_path,
             output_path=request.output_path,
             opacity=request.opacity,
-            scale=request.scale
+            scale=request.scale,
+            encoding_profile=request.encoding_profile
         )
-        return {"status": "success", "output_path": result}
+        return {"status": "success", "output_path": result, "job_id": job["id"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
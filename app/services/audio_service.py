@@ -1,16 +1,22 @@
 import os
 import subprocess
-import tempfile
 import shutil
-from concurrent.futures import ThreadPoolExecutor
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import ProgressCallback, run_ffmpeg, with_thread_args
+from app.core.scheduler import cpu_scheduler
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.probe_service import ProbeService
 
 
 class AudioService:
     _video_extensions = {".mp4", ".mkv", ".avi", ".mov", ".flv", ".wmv"}
-    _executor = ThreadPoolExecutor(max_workers=max(4, os.cpu_count() or 4))
 
     @staticmethod
-    def mix_audio_with_video(video_path: str, audio_path: str, replace_original: bool = True, reduce_original_volume: bool = False):
+    def mix_audio_with_video(video_path: str, audio_path: str, replace_original: bool = True, reduce_original_volume: bool = False, progress_callback: Optional[ProgressCallback] = None, encoding_profile: str = "fast"):
         """
         Mescla um arquivo de áudio MP3 com um vídeo e opcionalmente reduz o volume do áudio original.
         O áudio será cortado para corresponder exatamente à duração do vídeo.
@@ -20,10 +26,14 @@ class AudioService:
             audio_path: Caminho para o arquivo de áudio MP3
             replace_original: Se True, substitui o arquivo original. Se False, cria um novo arquivo.
             reduce_original_volume: Se True, reduz o volume do áudio original do vídeo
+            progress_callback: Recebe (mensagem, progresso, **stats) durante a mixagem
+            encoding_profile: Perfil de codificação; define o bitrate do AAC (o vídeo é copiado)
 
         Returns:
             str: Caminho do arquivo de saída processado
         """
+        audio_args = encoding_profiles.audio_args(encoding_profile)
+
         # Verifica se os arquivos de entrada existem
         if not os.path.exists(video_path):
             raise FileNotFoundError(
@@ -37,78 +47,82 @@ class AudioService:
         final_output_path = video_path if replace_original else AudioService._generate_output_path(
             video_path)
 
-        # Cria um arquivo temporário para o processamento
-        temp_dir = tempfile.gettempdir()
-        temp_filename = f"temp_{os.path.basename(video_path)}"
-        temp_output_path = os.path.join(temp_dir, temp_filename)
+        # Diretório exclusivo do job: requisições simultâneas de arquivos com o
+        # mesmo nome não se sobrescrevem, e o temporário some junto com ele
+        reserve_bytes = WorkspaceManager.estimate(video_path, audio_path)
+        with workspace_manager.workspace("audio", reserve_bytes) as temp_dir:
+            temp_output_path = os.path.join(temp_dir, os.path.basename(video_path))
 
-        try:
-            # Comando FFmpeg baseado no parâmetro reduce_original_volume
-            if reduce_original_volume:
-                # Reduz o volume do áudio original para 0.2 (20%) e adiciona o novo áudio
-                # Usando 'shortest=1' para garantir que o áudio termine quando o vídeo terminar
-                cmd = [
-                    "ffmpeg", "-y", "-i", video_path, "-i", audio_path,
-                    "-filter_complex", "[0:a]volume=0.2[a1];[a1][1:a]amix=inputs=2:duration=shortest[aout]",
-                    "-map", "0:v", "-map", "[aout]",
-                    "-c:v", "copy", "-c:a", "aac", "-strict", "experimental",
-                    "-shortest",  # Adiciona flag shortest para cortar na duração do vídeo
-                    temp_output_path
-                ]
-            else:
-                # Apenas adiciona o novo áudio sem reduzir o volume original
-                # Usando 'shortest=1' para garantir que o áudio termine quando o vídeo terminar
-                cmd = [
-                    "ffmpeg", "-y", "-i", video_path, "-i", audio_path,
-                    "-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[aout]",
-                    "-map", "0:v", "-map", "[aout]",
-                    "-c:v", "copy", "-c:a", "aac", "-strict", "experimental",
-                    "-shortest",  # Adiciona flag shortest para cortar na duração do vídeo
-                    temp_output_path
-                ]
-
-            # Executa o comando FFmpeg
-            print(f"Executando comando: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
-
-            # Se for para substituir o original, copia o arquivo temporário sobre o original
-            if replace_original:
-                print(f"Substituindo arquivo original: {video_path}")
-                # Em alguns sistemas, é necessário remover o arquivo de destino antes
-                if os.path.exists(video_path):
-                    os.remove(video_path)
-                shutil.move(temp_output_path, video_path)
-            else:
-                # Se não for para substituir, move para o caminho de saída final
-                if not os.path.exists(os.path.dirname(final_output_path)):
-                    os.makedirs(os.path.dirname(
-                        final_output_path), exist_ok=True)
-                shutil.move(temp_output_path, final_output_path)
-
-            print(f"Processamento concluído: {final_output_path}")
-            return final_output_path
-
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Erro ao processar vídeo com FFmpeg: {str(e)}"
-            print(error_msg)
-            # Limpar arquivo temporário em caso de erro
-            if os.path.exists(temp_output_path):
-                try:
-                    os.remove(temp_output_path)
-                except:
-                    pass
-            raise RuntimeError(error_msg)
+            try:
+                cmd = AudioService._mix_command(
+                    video_path, audio_path, temp_output_path, reduce_original_volume, audio_args)
 
-        except Exception as e:
-            error_msg = f"Erro durante o processamento: {str(e)}"
-            print(error_msg)
-            # Limpar arquivo temporário em caso de erro
-            if os.path.exists(temp_output_path):
+                # Executa o comando FFmpeg
+                print(f"Executando comando: {' '.join(cmd)}")
                 try:
-                    os.remove(temp_output_path)
-                except:
-                    pass
-            raise RuntimeError(error_msg)
+                    duration = ProbeService.get_duration(video_path)
+                except Exception:
+                    duration = None
+                result = run_ffmpeg(
+                    cmd,
+                    duration=duration,
+                    progress_callback=progress_callback,
+                    stage="Mixando áudio",
+                    end=0.95,
+                    check=False,
+                    cores=1,  # vídeo em cópia, só o áudio é codificado
+                    service="audio",
+                    step="mix"
+                )
+                if result.returncode != 0:
+                    raise subprocess.CalledProcessError(
+                        result.returncode, cmd, stderr=result.stderr)
+
+                # Se for para substituir o original, copia o arquivo temporário sobre o original
+                if replace_original:
+                    print(f"Substituindo arquivo original: {video_path}")
+                    # Em alguns sistemas, é necessário remover o arquivo de destino antes
+                    if os.path.exists(video_path):
+                        os.remove(video_path)
+                    shutil.move(temp_output_path, video_path)
+                else:
+                    # Se não for para substituir, move para o caminho de saída final
+                    if not os.path.exists(os.path.dirname(final_output_path)):
+                        os.makedirs(os.path.dirname(
+                            final_output_path), exist_ok=True)
+                    shutil.move(temp_output_path, final_output_path)
+
+                print(f"Processamento concluído: {final_output_path}")
+                return final_output_path
+
+            except subprocess.CalledProcessError as e:
+                error_msg = f"Erro ao processar vídeo com FFmpeg: {str(e)}"
+                print(error_msg)
+                raise RuntimeError(error_msg)
+
+            except Exception as e:
+                error_msg = f"Erro durante o processamento: {str(e)}"
+                print(error_msg)
+                raise RuntimeError(error_msg)
+
+    @staticmethod
+    def _mix_command(video_path: str, audio_path: str, output_path: str, reduce_original_volume: bool, audio_args: List[str]) -> List[str]:
+        """Comando ffmpeg que mixa o áudio com o do vídeo, copiando o vídeo"""
+        if reduce_original_volume:
+            # Reduz o volume do áudio original para 0.2 (20%) e adiciona o novo áudio
+            filter_complex = "[0:a]volume=0.2[a1];[a1][1:a]amix=inputs=2:duration=shortest[aout]"
+        else:
+            # Apenas adiciona o novo áudio sem reduzir o volume original
+            filter_complex = "[0:a][1:a]amix=inputs=2:duration=shortest[aout]"
+        # 'duration=shortest' e '-shortest' garantem que o áudio termine quando o vídeo terminar
+        return [
+            "ffmpeg", "-y", "-i", video_path, "-i", audio_path,
+            "-filter_complex", filter_complex,
+            "-map", "0:v", "-map", "[aout]",
+            "-c:v", "copy", *audio_args,
+            "-shortest",
+            output_path
+        ]
 
     @staticmethod
     def _generate_output_path(video_path):
@@ -129,25 +143,171 @@ class AudioService:
         return output_path
 
     @staticmethod
-    def mix_audio_with_video_threaded(video_path: str, audio_path: str, replace_original: bool = True, reduce_original_volume: bool = False):
+    def mix_audio_batch(
+        audio_path: str,
+        videos: List[Dict[str, Optional[str]]],
+        replace_original: bool = True,
+        reduce_original_volume: bool = False,
+        progress_callback: Optional[ProgressCallback] = None,
+        encoding_profile: str = "fast"
+    ) -> dict:
         """
-        Versão do mix_audio_with_video que utiliza o thread pool para processamento paralelo.
-        Aguarda a conclusão do processamento antes de retornar.
+        Mixa a mesma trilha em vários vídeos decodificando o áudio uma única vez.
+
+        A trilha é decodificada e reamostrada para a taxa/canais mais comum
+        entre os vídeos em um WAV (PCM float) com a duração do vídeo mais
+        longo. Cada vídeo é então mixado em paralelo no executor do
+        cpu_scheduler a partir desse WAV, sem decodificar o MP3 de novo.
+
+        Args:
+            audio_path: Trilha compartilhada
+            videos: lista de {'video_path', 'output_path'}; sem output_path
+                vale replace_original, como em mix_audio_with_video
+            reduce_original_volume: Se True, reduz o volume do áudio original dos vídeos
+            progress_callback: Recebe (mensagem, progresso, **stats) durante o lote
+            encoding_profile: Perfil de codificação; define o bitrate do AAC
 
         Returns:
-            str: Caminho do arquivo de saída processado
+            dict com um resultado por vídeo (na ordem recebida), o tempo de
+            decodificação da trilha, o tempo total e a estimativa do tempo
+            economizado em relação a uma chamada individual por vídeo
         """
-        future = AudioService._executor.submit(
-            AudioService.mix_audio_with_video,
-            video_path,
-            audio_path,
-            replace_original,
-            reduce_original_volume
+        audio_args = encoding_profiles.audio_args(encoding_profile)
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(
+                f"Arquivo de áudio não encontrado: {audio_path}")
+        if not videos:
+            raise ValueError("Nenhum vídeo informado")
+
+        items = []
+        for video in videos:
+            video_path = video["video_path"]
+            output_path = video.get("output_path") or (
+                video_path if replace_original else AudioService._generate_output_path(video_path))
+            items.append((video_path, output_path))
+        duplicated = [path for path, count in Counter(
+            os.path.abspath(output_path) for _, output_path in items).items() if count > 1]
+        if duplicated:
+            raise ValueError(
+                f"Caminho de saída repetido no lote: {', '.join(duplicated)}")
+
+        started = time.perf_counter()
+        durations = {}
+        formats = Counter()
+        for video_path, _ in items:
+            try:
+                durations[video_path] = ProbeService.get_duration(video_path)
+                stream = ProbeService.get_stream(video_path, "audio")
+            except Exception:
+                continue
+            if stream and stream.get("sample_rate") and stream.get("channels"):
+                formats[(int(stream["sample_rate"]), int(stream["channels"]))] += 1
+        sample_rate, channels = formats.most_common(1)[0][0] if formats else (48000, 2)
+
+        # Só decodifica até onde o vídeo mais longo precisa
+        track_duration = max(durations.values()) if durations else None
+        # PCM float de 4 bytes por amostra; sem duração conhecida, estima pelo MP3
+        reserve_bytes = (int(track_duration * sample_rate * channels * 4) if track_duration
+                         else WorkspaceManager.estimate(audio_path, factor=12))
+        with workspace_manager.workspace("audio_batch", reserve_bytes) as work_dir:
+            track_path = os.path.join(work_dir, "track.wav")
+            decode_cmd = [
+                "ffmpeg", "-y", "-i", audio_path, "-vn",
+                *(["-t", f"{track_duration:.3f}"] if track_duration else []),
+                "-ar", str(sample_rate), "-ac", str(channels),
+                "-c:a", "pcm_f32le", "-rf64", "auto",
+                track_path
+            ]
+            print(f"Decodificando trilha: {' '.join(decode_cmd)}")
+            decode_started = time.perf_counter()
+            result = run_ffmpeg(
+                decode_cmd,
+                duration=track_duration,
+                progress_callback=progress_callback,
+                stage="Decodificando trilha",
+                end=0.1,
+                check=False,
+                cores=1,
+                service="audio",
+                step="decode"
+            )
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Erro ao decodificar a trilha com FFmpeg: {result.stderr}")
+            decode_seconds = time.perf_counter() - decode_started
+
+            futures = [
+                cpu_scheduler.submit(
+                    AudioService._mix_batch_item, video_path, track_path, output_path,
+                    reduce_original_volume, audio_args, durations.get(video_path))
+                for video_path, output_path in items
+            ]
+            results = []
+            for i, future in enumerate(futures):
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(
+                        f"Vídeos mixados: {i + 1}/{len(futures)}", 0.1 + 0.85 * (i + 1) / len(futures))
+
+        elapsed = time.perf_counter() - started
+        # Cada chamada individual decodificaria o MP3 até a duração do seu vídeo
+        decode_rate = decode_seconds / track_duration if track_duration else 0.0
+        individual_seconds = sum(
+            item["seconds"] + decode_rate * min(durations.get(item["video_path"], 0.0), track_duration or 0.0)
+            for item in results
         )
+        succeeded = sum(1 for item in results if item["success"])
+        print(f"Lote de áudio concluído: {succeeded}/{len(results)} vídeos em {elapsed:.2f}s")
+        return {
+            "success": succeeded > 0,
+            "results": results,
+            "decode_seconds": round(decode_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "estimated_individual_seconds": round(individual_seconds, 3),
+            "time_saved_seconds": round(individual_seconds - elapsed, 3),
+        }
 
-        # Aguarda a conclusão e retorna o resultado ou levanta a exceção
+    @staticmethod
+    def _mix_batch_item(video_path: str, track_path: str, output_path: str, reduce_original_volume: bool, audio_args: List[str], duration: Optional[float]) -> dict:
+        """Mixa a trilha já decodificada em um vídeo do lote; falhas viram o erro do item"""
+        seconds = 0.0
+        temp_output_path = None
         try:
-            return future.result()  # Isso vai bloquear até o processamento terminar
+            if not os.path.exists(video_path):
+                raise FileNotFoundError(
+                    f"Arquivo de vídeo não encontrado: {video_path}")
+            output_dir = os.path.dirname(os.path.abspath(output_path))
+            os.makedirs(output_dir, exist_ok=True)
+            # Temporário ao lado da saída: o os.replace final é atômico, inclusive sobre o original
+            temp_output_path = os.path.join(
+                output_dir, f".mix_{uuid.uuid4().hex}{os.path.splitext(output_path)[1] or '.mp4'}")
+
+            cmd = AudioService._mix_command(
+                video_path, track_path, temp_output_path, reduce_original_volume, audio_args)
+            # Reserva feita aqui para medir só o ffmpeg, sem a espera por núcleos
+            with cpu_scheduler.reserve(1) as cores:
+                started = time.perf_counter()
+                result = run_ffmpeg(
+                    with_thread_args(cmd, cores), duration=duration, check=False,
+                    service="audio", step="mix")
+                seconds = time.perf_counter() - started
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Erro ao processar vídeo com FFmpeg: {result.stderr}")
+            os.replace(temp_output_path, output_path)
+            temp_output_path = None
+            error = None
         except Exception as e:
-            # Re-levanta a exceção para ser tratada pelo endpoint
-            raise e
+            error = str(e)
+            print(f"Erro ao mixar {video_path}: {error}")
+        finally:
+            if temp_output_path and os.path.exists(temp_output_path):
+                os.remove(temp_output_path)
+
+        return {
+            "video_path": video_path,
+            "output_path": output_path,
+            "success": error is None,
+            "error": error,
+            "seconds": round(seconds, 3),
+        }
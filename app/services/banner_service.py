@@ -1,15 +1,139 @@
 import os
 import subprocess
-import tempfile
-import shutil
-import ffmpeg
+import time
+import threading
 import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import ContextManager, Dict, Optional
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import ProgressCallback, run_ffmpeg
+from app.core.metrics import track_ffmpeg
+from app.core.scheduler import cpu_scheduler
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.overlay_asset_cache import OverlayAssetCache
+from app.services.probe_service import ProbeService
 
 
 class BannerService:
     _video_extensions = {".mp4", ".mkv", ".avi", ".mov", ".flv", ".wmv"}
-    _executor = ThreadPoolExecutor(max_workers=max(4, os.cpu_count() or 4))
+    # Incrementar quando a saída mudar para os mesmos parâmetros (invalida o ResultCache)
+    CACHE_VERSION = 2
+    # O banner sempre gravou o AAC no padrão do ffmpeg (128k); no perfil
+    # "standard" (o padrão) o bitrate histórico é mantido
+    LEGACY_AUDIO_BITRATE = "128k"
+
+    @staticmethod
+    def cache_params(position: str, banner_scale: float, padding: int, encoding_profile: str) -> dict:
+        """Parâmetros que determinam a saída (a segmentação não altera o resultado)"""
+        return {
+            "position": "bottom" if position == "bottom" else "top",
+            "banner_scale": float(banner_scale),
+            "padding": int(padding),
+            "encoding_profile": encoding_profile,
+        }
+
+    @staticmethod
+    def plan_banner(
+        video_path: str,
+        image_path: str,
+        position: str = "top",
+        banner_scale: float = 1.0,
+        padding: int = 0
+    ) -> dict:
+        """
+        Analisa vídeo e banner uma única vez e calcula a geometria usada por
+        todos os segmentos.
+
+        Returns:
+            dict com duração, dimensões do vídeo, do banner, do quadro final e
+            posições de pad/overlay
+        """
+        probe = ProbeService.probe(video_path)
+        video_stream = next(
+            (stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+        if not video_stream:
+            raise ValueError(
+                "Nenhuma stream de vídeo encontrada no arquivo.")
+
+        video_width = int(video_stream['width'])
+        video_height = int(video_stream['height'])
+
+        # Obter dimensões do banner
+        banner_probe = ProbeService.probe(image_path)
+        banner_stream = next(
+            (stream for stream in banner_probe['streams'] if stream['codec_type'] in ['video', 'image']), None)
+
+        if banner_stream is None:
+            raise ValueError(
+                "Não foi possível ler as dimensões do banner.")
+
+        geometry = BannerService.banner_geometry(
+            video_width,
+            video_height,
+            float(banner_stream.get('width', banner_stream.get('coded_width', video_width))),
+            float(banner_stream.get('height', banner_stream.get('coded_height', video_height))),
+            position,
+            banner_scale,
+            padding
+        )
+        geometry["duration"] = float(probe['format']['duration'])
+        return geometry
+
+    @staticmethod
+    def banner_geometry(
+        video_width: int,
+        video_height: int,
+        image_width: float,
+        image_height: float,
+        position: str = "top",
+        banner_scale: float = 1.0,
+        padding: int = 0
+    ) -> dict:
+        """Dimensões do banner e do quadro final e posições de pad/overlay para um quadro video_width x video_height"""
+        # Calcular dimensões do banner redimensionado
+        banner_width = int(video_width * banner_scale)
+        banner_height = int(image_height * (banner_width / image_width))
+
+        return {
+            "video_width": video_width,
+            "video_height": video_height,
+            "banner_width": banner_width,
+            "banner_height": banner_height,
+            # Calcular nova altura total do vídeo
+            "new_height": video_height + banner_height + (padding * 2),
+            "video_y": 0 if position == "bottom" else banner_height + padding,
+            "banner_y": video_height + padding if position == "bottom" else padding,
+        }
+
+    @staticmethod
+    def banner_strip_filters(plan: dict) -> str:
+        """
+        Cadeia de filtros que transforma o banner numa faixa RGBA da largura do
+        vídeo (banner redimensionado e centralizado, laterais transparentes),
+        pronta para ser sobreposta em x=0 por todos os segmentos.
+        """
+        video_width = plan["video_width"]
+        banner_width = plan["banner_width"]
+        banner_height = plan["banner_height"]
+
+        scale = f"scale={banner_width}:{banner_height},format=rgba"
+        if banner_width <= video_width:
+            # Mesmo x que overlay=(main_w-overlay_w)/2 usa em yuv420p (alinhado a 2)
+            x = ((video_width - banner_width) // 2) & ~1
+            fit = f"pad={video_width}:{banner_height}:{x}:0:color=black@0"
+        else:
+            fit = f"crop={video_width}:{banner_height}:(iw-ow)/2:0"
+        return f"{scale},{fit}"
+
+    @staticmethod
+    def render_banner_strip(image_path: str, plan: dict) -> ContextManager[str]:
+        """
+        Faixa do banner pré-renderizada para a resolução do plano, servida pelo
+        OverlayAssetCache: o mesmo banner na mesma largura de vídeo é
+        renderizado uma única vez entre requisições. Use como context manager;
+        a faixa não é descartada do cache enquanto o bloco estiver ativo.
+        """
+        return OverlayAssetCache.use(image_path, BannerService.banner_strip_filters(plan))
 
     @staticmethod
     def add_banner(
@@ -20,11 +144,17 @@ class BannerService:
         banner_scale: float = 1.0,
         padding: int = 0,
         num_threads: int = None,  # Agora opcional
-        segment_duration: int = None  # Agora opcional
+        segment_duration: int = None,  # Agora opcional
+        timings: Optional[Dict[str, float]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        encoding_profile: str = "standard"
     ) -> str:
         """
         Adiciona um banner a um vídeo criando uma área estendida para o banner usando processamento paralelo.
 
+        Vídeo e banner são analisados uma única vez e o banner é redimensionado
+        uma única vez; os segmentos só aplicam pad + overlay da faixa pronta.
+
         Args:
             video_path (str): Caminho do vídeo de entrada
             image_path (str): Caminho da imagem do banner
@@ -32,62 +162,58 @@ class BannerService:
             position (str): Posição do banner ('top', 'bottom')
             banner_scale (float): Fator de escala do banner (1.0 = 100% da largura do vídeo)
             padding (int): Padding em pixels do banner em relação à borda
-            num_threads (int, optional): Número de threads para processamento paralelo. Se None, usa o executor compartilhado
+            num_threads (int, optional): Número de threads para processamento paralelo. Se None, usa o executor do cpu_scheduler
             segment_duration (int, optional): Duração em segundos de cada segmento. Se None, calcula com base na duração do vídeo
+            timings (dict, optional): Se informado, recebe o tempo (s) de cada etapa
+            progress_callback (callable, optional): Recebe (mensagem, progresso, **stats)
+                com o andamento somado de todos os segmentos
+            encoding_profile (str): Perfil de codificação dos segmentos (draft, fast, standard, archive)
 
         Returns:
             str: Caminho do vídeo de saída
         """
-        def get_video_duration(video_path):
-            """Obtém a duração do vídeo em segundos."""
-            try:
-                probe = ffmpeg.probe(video_path)
-                duration = float(probe['format']['duration'])
-                return duration
-            except Exception as e:
-                raise RuntimeError(f"Erro ao obter duração do vídeo: {str(e)}")
+        # ffmpeg-python só monta as linhas de comando: importado no primeiro banner
+        import ffmpeg
+
+        if timings is None:
+            timings = {}
+
+        def timed(step, started):
+            timings[step] = round(time.perf_counter() - started, 3)
+
+        def report(message, progress, **stats):
+            if progress_callback:
+                progress_callback(message, progress, **stats)
+
+        # Tempo de saída já codificado por segmento, somado para o progresso total
+        segment_out_time: Dict[int, float] = {}
+        progress_lock = threading.Lock()
 
         def process_video_segment(args):
             """Processa um segmento de vídeo."""
-            segment_path, image_path, output_path, position, banner_scale, padding, start_time, duration = args
+            index, segment_path, strip_path, output_path, plan, start_time, duration, cores = args
+
+            def segment_progress(message, progress, fps=None, speed=None, out_time=0.0):
+                with progress_lock:
+                    segment_out_time[index] = max(
+                        segment_out_time.get(index, 0.0),
+                        min(duration, max(out_time or 0.0, progress * duration))
+                    )
+                    done = sum(segment_out_time.values())
+                    fraction = min(1.0, done / plan["duration"]) if plan["duration"] else 0.0
+                    report(
+                        f"Aplicando banner: {fraction * 100:.0f}%",
+                        0.1 + 0.8 * fraction,
+                        fps=fps,
+                        speed=speed,
+                        out_time=round(done, 3)
+                    )
 
             try:
-                # Obter dimensões do vídeo original
-                probe = ffmpeg.probe(segment_path)
-                video_stream = next(
-                    (stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
-                if not video_stream:
-                    raise ValueError(
-                        "Nenhuma stream de vídeo encontrada no arquivo.")
-
-                video_width = int(video_stream['width'])
-                video_height = int(video_stream['height'])
-
-                # Obter dimensões do banner
-                banner_probe = ffmpeg.probe(image_path)
-                banner_stream = next(
-                    (stream for stream in banner_probe['streams'] if stream['codec_type'] in ['video', 'image']), None)
-
-                if banner_stream is None:
-                    raise ValueError(
-                        "Não foi possível ler as dimensões do banner.")
-
-                # Calcular dimensões do banner redimensionado
-                banner_width = int(video_width * banner_scale)
-                original_banner_width = float(banner_stream.get(
-                    'width', banner_stream.get('coded_width', video_width)))
-                original_banner_height = float(banner_stream.get(
-                    'height', banner_stream.get('coded_height', video_height)))
-                banner_height = int(original_banner_height *
-                                    (banner_width / original_banner_width))
-
-                # Calcular nova altura total do vídeo
-                new_height = video_height + banner_height + (padding * 2)
-
                 # Input streams
                 input_video = ffmpeg.input(
                     segment_path, ss=start_time, t=duration)
-                input_banner = ffmpeg.input(image_path)
+                input_banner = ffmpeg.input(strip_path)
 
                 # Extrair áudio do vídeo original
                 audio = input_video.audio
@@ -96,31 +222,19 @@ class BannerService:
                 padded_video = ffmpeg.filter(
                     input_video,
                     'pad',
-                    width=video_width,
-                    height=new_height,
+                    width=plan["video_width"],
+                    height=plan["new_height"],
                     x='(out_w-in_w)/2',
-                    y='0' if position == "bottom" else str(
-                        banner_height + padding),
+                    y=str(plan["video_y"]),
                     color='black'
                 )
 
-                # Redimensionar o banner
-                scaled_banner = ffmpeg.filter(
-                    input_banner,
-                    'scale',
-                    w=banner_width,
-                    h=banner_height
-                )
-
-                # Calcular posição do banner
-                banner_y = video_height + padding if position == "bottom" else padding
-
-                # Aplicar overlay do banner
+                # Aplicar overlay da faixa do banner já redimensionada
                 final = ffmpeg.filter(
-                    [padded_video, scaled_banner],
+                    [padded_video, input_banner],
                     'overlay',
-                    x=f'(main_w-overlay_w)/2',
-                    y=str(banner_y)
+                    x='0',
+                    y=str(plan["banner_y"])
                 )
 
                 # Criar vídeo final com áudio original
@@ -128,43 +242,57 @@ class BannerService:
                     final,
                     audio,
                     output_path,
-                    vcodec='libx264',
-                    acodec='aac',
-                    pix_fmt='yuv420p',
-                    preset='medium',
-                    crf=23
+                    **encoding_profiles.output_kwargs(
+                        encoding_profile,
+                        audio_bitrate=BannerService.LEGACY_AUDIO_BITRATE
+                        if encoding_profile == encoding_profiles.DEFAULT_PROFILE else None)
                 )
 
                 # Executar o comando para criar o vídeo final
                 cmd = ffmpeg.compile(stream, overwrite_output=True)
-                process = subprocess.Popen(
-                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = process.communicate()
-
-                if process.returncode != 0:
-                    raise RuntimeError(
-                        f"Erro ao processar segmento: {stderr.decode('utf-8', errors='ignore')}")
+                run_ffmpeg(cmd, duration=duration,
+                           progress_callback=segment_progress, cores=cores,
+                           service="banner", step="segment")
 
                 return True
             except Exception as e:
                 raise RuntimeError(f"Erro ao processar segmento: {str(e)}")
 
+        stack = ExitStack()
+        total_started = time.perf_counter()
+
         try:
             # Validar arquivos de entrada
             if not os.path.exists(video_path):
                 raise FileNotFoundError(f"Vídeo não encontrado: {video_path}")
             if not os.path.exists(image_path):
                 raise FileNotFoundError(f"Imagem não encontrada: {image_path}")
+            encoding_profiles.get_profile(encoding_profile)
 
-            # Criar diretório temporário para armazenar segmentos
-            temp_dir = tempfile.mkdtemp()
+            # Diretório de trabalho para os segmentos: os originais cortados e os
+            # processados ficam lado a lado até a concatenação (~2x o vídeo)
+            temp_dir = stack.enter_context(workspace_manager.workspace(
+                "banner", WorkspaceManager.estimate(video_path, factor=2)))
+
+            # Planejamento: uma análise do vídeo e do banner por requisição
+            started = time.perf_counter()
+            try:
+                plan = BannerService.plan_banner(
+                    video_path, image_path, position, banner_scale, padding)
+            except Exception as e:
+                raise RuntimeError(f"Erro ao analisar vídeo e banner: {str(e)}")
+            total_duration = plan["duration"]
+            timed("probe", started)
+            report("Vídeo e banner analisados", 0.05)
 
-            # Obter a duração total do vídeo
-            total_duration = get_video_duration(video_path)
+            started = time.perf_counter()
+            strip_path = stack.enter_context(
+                BannerService.render_banner_strip(image_path, plan))
+            timed("banner_render", started)
 
             # Usar executor compartilhado se num_threads não for especificado
             if num_threads is None:
-                executor = BannerService._executor
+                executor = cpu_scheduler.executor
             else:
                 executor = concurrent.futures.ThreadPoolExecutor(
                     max_workers=num_threads)
@@ -173,7 +301,7 @@ class BannerService:
             if segment_duration is None:
                 # Ajuste dinâmico baseado na duração total do vídeo
                 # Idealmente queremos entre 8-16 segmentos para paralelização eficiente
-                target_segments = min(16, max(8, os.cpu_count() * 2))
+                target_segments = min(16, max(8, cpu_scheduler.total_cores * 2))
                 segment_duration = max(
                     30, int(total_duration / target_segments))
                 # Garantir que segment_duration não seja muito pequeno ou muito grande
@@ -184,6 +312,7 @@ class BannerService:
                                (1 if total_duration % segment_duration > 0 else 0))
             segment_files = []
 
+            started = time.perf_counter()
             for i in range(num_segments):
                 start_time = i * segment_duration
                 current_duration = min(
@@ -197,27 +326,35 @@ class BannerService:
                 cmd = ffmpeg.input(video_path, ss=start_time, t=current_duration).output(
                     segment_output, c='copy').global_args('-loglevel', 'error', '-y').compile()
 
-                process = subprocess.Popen(
-                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                process.communicate()
+                with track_ffmpeg("banner", "split") as run:
+                    process = subprocess.Popen(
+                        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    process.communicate()
+                    run.ok = process.returncode == 0
+            timed("split", started)
 
-            # Processar cada segmento em paralelo
+            # Processar cada segmento em paralelo, dividindo os núcleos entre os
+            # segmentos que rodam ao mesmo tempo
             processed_segments = []
             tasks = []
+            segment_cores = max(
+                1, cpu_scheduler.total_cores // min(num_segments, cpu_scheduler.total_cores))
 
             for i, (segment_path, start_time, duration) in enumerate(segment_files):
                 output_segment = os.path.join(
                     temp_dir, f"processed_{i:03d}.mp4")
                 processed_segments.append(output_segment)
 
-                task = (segment_path, image_path, output_segment,
-                        position, banner_scale, padding, 0, duration)
+                task = (i, segment_path, strip_path, output_segment,
+                        plan, 0, duration, segment_cores)
                 tasks.append(task)
 
             success_count = 0
             # Usar o executor definido anteriormente
+            started = time.perf_counter()
             results = list(executor.map(process_video_segment, tasks))
             success_count = sum(1 for r in results if r)
+            timed("segments", started)
 
             # Limpar o executor criado localmente se necessário
             if num_threads is not None:
@@ -239,22 +376,25 @@ class BannerService:
                 '-i', list_file, '-c', 'copy', output_path
             ]
 
-            process = subprocess.Popen(
-                concat_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = process.communicate()
+            report("Concatenando segmentos", 0.9)
+            started = time.perf_counter()
+            with track_ffmpeg("banner", "concat") as run:
+                process = subprocess.Popen(
+                    concat_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                stdout, stderr = process.communicate()
+                run.ok = process.returncode == 0
+            timed("concat", started)
 
             if process.returncode != 0:
                 raise RuntimeError(
                     f"Erro ao concatenar segmentos: {stderr.decode('utf-8', errors='ignore')}")
 
+            timed("total", total_started)
+            print(f"Banner adicionado em {output_path} - tempos (s): {timings}")
             return output_path
 
         except Exception as e:
             raise RuntimeError(f"Erro durante o processamento: {str(e)}")
         finally:
-            # Limpar arquivos temporários
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            except Exception as e:
-                print(
-                    f"Aviso: Não foi possível excluir o diretório temporário: {str(e)}")
+            # Libera os overlays e remove o diretório de trabalho com os segmentos
+            stack.close()
@@ -1,44 +1,414 @@
 import os
-import subprocess
-from typing import Optional, Callable
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import ProgressCallback, parse_time, run_ffmpeg
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.probe_service import ProbeService
 
 
 class CutService:
+    MODE_COPY = "copy"          # Cópia de streams: rápido, mas o início encaixa no keyframe anterior
+    MODE_SMART = "smart"        # Recodifica só os GOPs parciais das bordas e copia o meio
+    MODE_REENCODE = "reencode"  # Recodifica o trecho inteiro
+    MODES = (MODE_COPY, MODE_SMART, MODE_REENCODE)
+
+    # Encoders usados nas bordas do smart cut, por codec de origem
+    SMART_CUT_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+    # As bordas são curtas: qualidade alta para não destoar do trecho copiado
+    BOUNDARY_CRF = 18
+    # Incrementar quando a saída mudar para os mesmos parâmetros (invalida o ResultCache)
+    CACHE_VERSION = 1
+
+    @staticmethod
+    def cache_params(start_time: str, end_time: str, mode: str, encoding_profile: str) -> dict:
+        """
+        Parâmetros que determinam a saída: tempos em segundos ('00:01:05' e
+        '65' são o mesmo corte) e o perfil só quando há recodificação.
+        """
+        return {
+            "start": round(parse_time(start_time), 6),
+            "end": round(parse_time(end_time), 6),
+            "mode": mode,
+            "encoding_profile": None if mode == CutService.MODE_COPY else encoding_profile,
+        }
+
     @staticmethod
     def cut_video(
         input_path: str,
         output_path: str,
         start_time: str,
         end_time: str,
-        progress_callback: Optional[Callable[[str, float], None]] = None
+        progress_callback: Optional[ProgressCallback] = None,
+        mode: str = MODE_COPY,
+        encoding_profile: str = "fast"
     ) -> str:
-        """Corta vídeo entre os tempos especificados"""
+        """
+        Corta vídeo entre os tempos especificados.
+
+        Args:
+            mode: 'copy' (cópia de streams, início no keyframe anterior),
+                'smart' (preciso no quadro: recodifica só os GOPs parciais das
+                bordas e copia os GOPs inteiros) ou 'reencode' (recodifica tudo)
+            encoding_profile: Perfil usado no modo reencode e no áudio do smart cut.
+                As bordas do smart cut seguem o codec da origem (BOUNDARY_CRF).
+        """
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Arquivo não encontrado: {input_path}")
+        if mode not in CutService.MODES:
+            raise ValueError(
+                f"Modo de corte inválido: {mode}. Use um de {', '.join(CutService.MODES)}")
+        encoding_profiles.get_profile(encoding_profile)
+
+        start = parse_time(start_time)
+        end = parse_time(end_time)
+        if end <= start:
+            raise ValueError(
+                f"Tempo final ({end_time}) deve ser maior que o inicial ({start_time})")
 
         if progress_callback:
             progress_callback(
-                f"Cortando vídeo de {start_time} até {end_time}...", 0.3)
+                f"Cortando vídeo de {start_time} até {end_time} ({mode})...", 0.05)
 
         os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
 
+        if mode == CutService.MODE_SMART:
+            CutService._cut_smart(
+                input_path, output_path, start, end, progress_callback, encoding_profile)
+        elif mode == CutService.MODE_REENCODE:
+            CutService._cut_reencode(
+                input_path, output_path, start, end, progress_callback, encoding_profile)
+        else:
+            CutService._cut_copy(
+                input_path, output_path, start, end, progress_callback)
+
+        if progress_callback:
+            progress_callback(
+                f"Vídeo cortado salvo em: {output_path}", 1.0)
+
+        return output_path
+
+    @staticmethod
+    def cut_video_batch(
+        input_path: str,
+        ranges: List[Dict[str, str]],
+        mode: str = MODE_COPY,
+        progress_callback: Optional[ProgressCallback] = None,
+        encoding_profile: str = "fast"
+    ) -> List[dict]:
+        """
+        Gera vários cortes do mesmo vídeo em um único ffmpeg.
+
+        Cada trecho é uma entrada própria com busca no índice (-ss/-t antes
+        do -i) mapeada para a sua saída, então o processo só lê e decodifica
+        os intervalos pedidos, mesmo com trechos distantes. Em 'copy' cada
+        saída começa no keyframe anterior ao início, como no corte avulso; em
+        'reencode' o corte é preciso. 'smart' corta cada trecho separadamente.
+
+        Args:
+            ranges: lista de {'start_time', 'end_time', 'output_path'}
+
+        Returns:
+            Um resultado por trecho, na ordem recebida
+
+        Raises:
+            ValueError: modo inválido, trecho vazio ou output_path repetido no lote
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {input_path}")
+        if mode not in CutService.MODES:
+            raise ValueError(
+                f"Modo de corte inválido: {mode}. Use um de {', '.join(CutService.MODES)}")
+        if not ranges:
+            raise ValueError("Nenhum trecho informado")
+        encoding_profiles.get_profile(encoding_profile)
+
+        # Duas saídas no mesmo caminho se sobrescreveriam no meio do ffmpeg
+        duplicated = [path for path, count in Counter(
+            os.path.abspath(item["output_path"]) for item in ranges).items() if count > 1]
+        if duplicated:
+            raise ValueError(
+                f"Caminho de saída repetido no lote: {', '.join(duplicated)}")
+
+        parsed = []
+        for item in ranges:
+            start, end = parse_time(item["start_time"]), parse_time(item["end_time"])
+            if end <= start:
+                raise ValueError(
+                    f"Tempo final ({item['end_time']}) deve ser maior que o inicial ({item['start_time']})")
+            os.makedirs(os.path.dirname(item["output_path"]) or ".", exist_ok=True)
+            parsed.append((start, end, item["output_path"]))
+
+        if mode == CutService.MODE_SMART:
+            results = []
+            for i, (start, end, output_path) in enumerate(parsed):
+                try:
+                    CutService._cut_smart(
+                        input_path, output_path, start, end, encoding_profile=encoding_profile)
+                    results.append(CutService._range_result(
+                        ranges[i], output_path))
+                except Exception as e:
+                    results.append(CutService._range_result(
+                        ranges[i], output_path, error=str(e)))
+                if progress_callback:
+                    progress_callback(
+                        f"Trechos cortados: {i + 1}/{len(parsed)}", 0.05 + 0.9 * (i + 1) / len(parsed))
+            return results
+
+        # Uma entrada por trecho: o intervalo entre trechos nunca é lido
+        cmd = ["ffmpeg", "-y"]
+        for start, end, _ in parsed:
+            cmd.extend(["-ss", str(start), "-t", str(end - start), "-i", input_path])
+        for index, (_, _, output_path) in enumerate(parsed):
+            cmd.extend(["-map", f"{index}:v:0?", "-map", f"{index}:a:0?"])
+            if mode == CutService.MODE_REENCODE:
+                cmd.extend(encoding_profiles.video_args(encoding_profile))
+                cmd.extend(encoding_profiles.audio_args(encoding_profile))
+                cmd.extend(["-movflags", "+faststart"])
+            else:
+                cmd.extend([
+                    "-c:v", "copy", "-c:a", "copy",
+                    "-avoid_negative_ts", "make_zero",
+                ])
+            cmd.append(output_path)
+
+        result = run_ffmpeg(
+            cmd,
+            duration=max(end - start for start, end, _ in parsed),
+            progress_callback=progress_callback,
+            stage=f"Cortando {len(parsed)} trechos",
+            start=0.05,
+            end=0.95,
+            check=False,
+            cores=encoding_profiles.profile_cores(encoding_profile) if mode == CutService.MODE_REENCODE else 1,
+            service="cut",
+            step="batch"
+        )
+
+        error = f"Erro ao cortar o vídeo: {result.stderr[-2000:]}" if result.returncode != 0 else None
+        results = [
+            CutService._range_result(item, output_path, error=error)
+            for item, (_, _, output_path) in zip(ranges, parsed)
+        ]
+
+        if progress_callback:
+            ok = sum(1 for item in results if item["success"])
+            progress_callback(f"Trechos cortados: {ok}/{len(results)}", 1.0)
+
+        return results
+
+    @staticmethod
+    def _range_result(item: Dict[str, str], output_path: str, error: Optional[str] = None) -> dict:
+        success = error is None and os.path.exists(
+            output_path) and os.path.getsize(output_path) > 0
+        if error is None and not success:
+            error = f"O arquivo de saída não foi criado: {output_path}"
+        return {
+            "start_time": item["start_time"],
+            "end_time": item["end_time"],
+            "output_path": output_path,
+            "success": success,
+            "error": error,
+        }
+
+    @staticmethod
+    def _cut_copy(input_path: str, output_path: str, start: float, end: float, progress_callback=None) -> None:
+        # -ss antes do -i: busca direta no índice em vez de ler desde o início do
+        # arquivo. Com -c copy a saída começa no keyframe anterior a start
         cmd = [
-            "ffmpeg", "-i", input_path,
-            "-ss", start_time, "-to", end_time,
+            "ffmpeg", "-y",
+            "-ss", str(start), "-i", input_path,
+            "-t", str(end - start),
+            "-map", "0:v:0?", "-map", "0:a:0?",
             "-c:v", "copy", "-c:a", "copy",
-            "-y", output_path
+            "-avoid_negative_ts", "make_zero",
+            output_path
         ]
+        result = run_ffmpeg(
+            cmd,
+            duration=end - start,
+            progress_callback=progress_callback,
+            stage="Processando corte de vídeo",
+            start=0.1,
+            end=0.95,
+            check=False,
+            cores=1,
+            service="cut",
+            step="copy"
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Erro ao cortar o vídeo: {result.stderr}")
+
+    @staticmethod
+    def _cut_reencode(input_path: str, output_path: str, start: float, end: float, progress_callback=None, encoding_profile: str = "fast") -> None:
+        cmd = [
+            "ffmpeg", "-y",
+            "-ss", str(start), "-i", input_path,
+            "-t", str(end - start),
+            "-map", "0:v:0?", "-map", "0:a:0?",
+            *encoding_profiles.video_args(encoding_profile),
+            *encoding_profiles.audio_args(encoding_profile),
+            "-movflags", "+faststart",
+            output_path
+        ]
+        result = run_ffmpeg(
+            cmd,
+            duration=end - start,
+            progress_callback=progress_callback,
+            stage="Recodificando corte",
+            start=0.1,
+            end=0.95,
+            check=False,
+            cores=encoding_profiles.profile_cores(encoding_profile),
+            service="cut",
+            step="reencode"
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Erro ao cortar o vídeo: {result.stderr}")
+
+    @staticmethod
+    def plan_smart_cut(packets: List[Tuple[float, bool]], start: float, end: float) -> List[dict]:
+        """
+        Divide [start, end) em partes recodificadas (GOPs parciais das bordas)
+        e copiadas (GOPs inteiros), a partir dos pacotes (pts, keyframe).
 
-        try:
-            if progress_callback:
-                progress_callback("Processando corte de vídeo...", 0.5)
+        Cada parte traz o pts do primeiro quadro, a quantidade de quadros e a
+        duração até a parte seguinte.
+        """
+        frames = [(pts, key) for pts, key in packets if start <= pts < end]
+        if not frames:
+            return []
 
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
+        keyframe_indexes = [i for i, (_, key) in enumerate(frames) if key]
+        boundaries = []
+        if keyframe_indexes:
+            first_key, last_key = keyframe_indexes[0], keyframe_indexes[-1]
+            # GOPs inteiros: do primeiro keyframe dentro do trecho até o último
+            if first_key > 0:
+                boundaries.append(("encode", 0, first_key))
+            if last_key > first_key:
+                boundaries.append(("copy", first_key, last_key))
+            boundaries.append(("encode", last_key, len(frames)))
+        else:
+            boundaries.append(("encode", 0, len(frames)))
 
-            if progress_callback:
-                progress_callback(
-                    f"Vídeo cortado salvo em: {output_path}", 1.0)
+        frame_duration = (frames[-1][0] - frames[0][0]) / (len(frames) - 1) if len(frames) > 1 else end - start
+        parts = []
+        for kind, first, last in boundaries:
+            next_pts = frames[last][0] if last < len(frames) else frames[-1][0] + frame_duration
+            parts.append({
+                "type": kind,
+                "start": frames[first][0],
+                "frames": last - first,
+                "duration": next_pts - frames[first][0],
+            })
+        return parts
+
+    @staticmethod
+    def _cut_smart(input_path: str, output_path: str, start: float, end: float, progress_callback=None, encoding_profile: str = "fast") -> None:
+        """
+        Corte preciso no quadro com custo próximo da cópia: recodifica só os
+        GOPs parciais de cada borda, copia os GOPs inteiros e codifica o áudio
+        uma única vez para o trecho todo.
+        """
+        video_stream = ProbeService.get_stream(input_path, 'video')
+        encoder = CutService.SMART_CUT_ENCODERS.get(
+            (video_stream or {}).get('codec_name'))
+        if encoder is None:
+            print(f"Aviso: smart cut indisponível para {input_path}; recodificando o trecho")
+            CutService._cut_reencode(
+                input_path, output_path, start, end, progress_callback, encoding_profile)
+            return
+
+        packets = ProbeService.get_video_packets(input_path, start, end)
+        parts = CutService.plan_smart_cut(packets, start, end)
+        if not any(part["type"] == "copy" for part in parts):
+            # Sem GOP inteiro no trecho, recodificar tudo é equivalente e mais simples
+            CutService._cut_reencode(
+                input_path, output_path, start, end, progress_callback, encoding_profile)
+            return
+
+        has_audio = ProbeService.get_stream(input_path, 'audio') is not None
+        pix_fmt = video_stream.get('pix_fmt') or 'yuv420p'
+        # As partes somam o trecho copiado: reserva a fração do arquivo que ele ocupa
+        fraction = (end - start) / max(ProbeService.get_duration(input_path), end - start)
+        reserve_bytes = WorkspaceManager.estimate(input_path, factor=fraction)
+
+        with workspace_manager.workspace("smart_cut", reserve_bytes) as temp_dir:
+            list_file = os.path.join(temp_dir, "parts.txt")
+            with open(list_file, 'w') as f:
+                for i, part in enumerate(parts):
+                    part_file = os.path.join(temp_dir, f"part_{i:02d}.ts")
+                    CutService._render_smart_part(
+                        input_path, part, part_file, encoder, pix_fmt)
+                    f.write(f"file '{part_file}'\nduration {part['duration']:.6f}\n")
+
+                    if progress_callback:
+                        progress_callback(
+                            f"Partes do corte: {i + 1}/{len(parts)} ({part['type']})",
+                            0.1 + 0.6 * (i + 1) / len(parts))
+
+            # Junta as partes (cópia) e codifica o áudio do trecho inteiro de uma vez
+            cmd = [
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0", "-i", list_file,
+            ]
+            if has_audio:
+                cmd.extend([
+                    "-ss", str(parts[0]["start"]), "-t", str(end - parts[0]["start"]),
+                    "-i", input_path,
+                    "-map", "0:v:0", "-map", "1:a:0",
+                    *encoding_profiles.audio_args(encoding_profile),
+                ])
+            else:
+                cmd.extend(["-map", "0:v:0"])
+            cmd.extend([
+                "-c:v", "copy",
+                "-movflags", "+faststart",
+                output_path
+            ])
+
+            result = run_ffmpeg(
+                cmd,
+                duration=end - start,
+                progress_callback=progress_callback,
+                stage="Montando corte",
+                start=0.7,
+                end=0.95,
+                check=False,
+                cores=1,
+                service="cut",
+                step="mux"
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"Erro ao montar o corte: {result.stderr}")
+
+    @staticmethod
+    def _render_smart_part(input_path: str, part: dict, part_file: str, encoder: str, pix_fmt: str) -> None:
+        """
+        Gera uma parte de vídeo em MPEG-TS (parâmetros do codec em banda, o que
+        permite juntar partes copiadas e recodificadas). -frames:v fixa a
+        quantidade exata de quadros de cada parte.
+        """
+        cmd = [
+            "ffmpeg", "-y",
+            "-ss", f"{part['start']:.6f}", "-i", input_path,
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-frames:v", str(part["frames"]),
+        ]
+        if part["type"] == "copy":
+            cmd.extend(["-c:v", "copy"])
+            cores = 1
+        else:
+            cmd.extend([
+                "-c:v", encoder, "-preset", "fast",
+                "-crf", str(CutService.BOUNDARY_CRF),
+                "-pix_fmt", pix_fmt,
+            ])
+            cores = 0
+        cmd.extend(["-f", "mpegts", part_file])
 
-            return output_path
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Erro ao cortar o vídeo: {e.stderr}")
+        result = run_ffmpeg(cmd, check=False, cores=cores, service="cut", step="segment")
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Erro ao gerar parte do corte ({part['type']}): {result.stderr[-2000:]}")
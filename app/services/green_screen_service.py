@@ -1,15 +1,158 @@
+import os
+import subprocess
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import cv2
 import numpy as np
-from typing import Tuple
+from typing import Callable, List, Optional, Tuple
+from app.core.ffmpeg_runner import ProgressCallback, with_thread_args
+from app.core.metrics import track_ffmpeg
+from app.core.scheduler import cpu_scheduler
+from app.services.probe_service import ProbeService
+
+
+def _key_batch(
+    frames: bytes,
+    width: int,
+    height: int,
+    lower_bound: Tuple[int, int, int],
+    upper_bound: Tuple[int, int, int],
+    engine: str = "hard"
+) -> bytes:
+    """Aplica o chroma key a um lote de quadros BGR24 e devolve os quadros BGRA (roda no pool de processos)"""
+    batch = np.frombuffer(frames, dtype=np.uint8).reshape(-1, height, width, 3)
+    output = np.empty((batch.shape[0], height, width, 4), dtype=np.uint8)
+    # Um keyer por lote: LUTs e buffers são reaproveitados entre os quadros
+    key = GreenScreenService.make_keyer(lower_bound, upper_bound, engine)
+    for image, transparent_image in zip(batch, output):
+        key(image, transparent_image)
+    return output.tobytes()
+
+
+def _key_image_to_png(
+    image_path: str,
+    lower_bound: Tuple[int, int, int],
+    upper_bound: Tuple[int, int, int],
+    engine: str = "hard"
+) -> bytes:
+    """Remove o fundo verde de uma imagem e devolve o PNG em memória (roda no pool de processos)"""
+    return GreenScreenService.encode_png(GreenScreenService.remove_green_screen(
+        image_path, lower_bound, upper_bound, engine))
+
+
+class SoftKeyer:
+    """
+    Keyer com alpha suave e supressão de spill verde.
+
+    Cada canal HSV passa por uma LUT pré-calculada que vale 255 dentro dos
+    limites e cai linearmente até 0 numa rampa de largura `hue_softness` /
+    `sv_softness` fora deles; a intensidade do key é o mínimo das três LUTs.
+    O spill é suprimido limitando G a max(R, B). Todos os buffers são
+    alocados uma vez por tamanho de quadro e reaproveitados, de modo que
+    cada pixel é lido/escrito um número pequeno e fixo de vezes.
+
+    Não é thread-safe: use uma instância por thread/processo.
+    """
+
+    def __init__(
+        self,
+        lower_bound: Tuple[int, int, int] = (40, 100, 20),
+        upper_bound: Tuple[int, int, int] = (80, 255, 255),
+        hue_softness: int = 8,
+        sv_softness: int = 40,
+        spill_suppression: bool = True
+    ):
+        self.spill_suppression = spill_suppression
+        self.lut = np.dstack([
+            SoftKeyer._ramp_lut(lower_bound[0], upper_bound[0], hue_softness),
+            SoftKeyer._ramp_lut(lower_bound[1], upper_bound[1], sv_softness),
+            SoftKeyer._ramp_lut(lower_bound[2], upper_bound[2], sv_softness),
+        ])
+        self._shape = None
+
+    @staticmethod
+    def _ramp_lut(low: int, high: int, softness: int) -> np.ndarray:
+        """LUT de 256 entradas: 255 em [low, high], rampa linear até 0 em `softness` unidades"""
+        values = np.arange(256, dtype=np.float32)
+        distance = np.maximum(low - values, values - high).clip(min=0)
+        ramp = 1.0 - distance / max(softness, 1)
+        return (ramp.clip(0.0, 1.0) * 255).round().astype(np.uint8)
+
+    def _allocate(self, height: int, width: int) -> None:
+        self._shape = (height, width)
+        self._hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self._strength = np.empty((height, width, 3), dtype=np.uint8)
+        # Planos separados: h, s, v (intensidades), b, g, r e alpha
+        self._planes = [np.empty((height, width), dtype=np.uint8) for _ in range(7)]
+
+    def apply(self, image: np.ndarray, transparent_image: Optional[np.ndarray] = None) -> np.ndarray:
+        """Aplica o key a um quadro BGR; grava em transparent_image (BGRA) se informado"""
+        height, width = image.shape[:2]
+        if self._shape != (height, width):
+            self._allocate(height, width)
+        if transparent_image is None:
+            transparent_image = np.empty((height, width, 4), dtype=np.uint8)
+
+        cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        cv2.LUT(self._hsv, self.lut, dst=self._strength)
+
+        # Canais intercalados viram planos contíguos: as operações abaixo
+        # são vetorizadas pelo OpenCV sem acesso com stride
+        hue, sat, val, blue, green, red, alpha = self._planes
+        cv2.mixChannels([self._strength, image], [hue, sat, val, blue, green, red],
+                        [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+
+        cv2.min(hue, sat, dst=alpha)
+        cv2.min(alpha, val, dst=alpha)
+        cv2.bitwise_not(alpha, dst=alpha)
+
+        if self.spill_suppression:
+            cv2.max(blue, red, dst=hue)
+            cv2.min(green, hue, dst=green)
+
+        cv2.mixChannels([blue, green, red, alpha], [transparent_image],
+                        [0, 0, 1, 1, 2, 2, 3, 3])
+        return transparent_image
+
+    __call__ = apply
 
 
 class GreenScreenService:
+    ENGINE_HARD = "hard"    # Máscara binária com cv2.inRange
+    ENGINE_SOFT = "soft"    # SoftKeyer: alpha suave por LUT e supressão de spill
+    ENGINES = (ENGINE_HARD, ENGINE_SOFT)
+
+    VIDEO_FORMATS = {
+        # formato: (argumentos de vídeo, argumentos de áudio ou None)
+        "prores": (
+            ['-c:v', 'prores_ks', '-profile:v', '4444',
+                '-pix_fmt', 'yuva444p10le', '-vendor', 'apl0'],
+            ['-c:a', 'pcm_s16le']
+        ),
+        "vp9": (
+            ['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p',
+                '-b:v', '0', '-crf', '30', '-row-mt', '1'],
+            ['-c:a', 'libopus', '-b:a', '128k']
+        ),
+        "png": (
+            ['-c:v', 'png', '-pix_fmt', 'rgba', '-f', 'image2'],
+            None
+        ),
+    }
+    DEFAULT_BATCH_FRAMES = 16
+    _process_pool: Optional[ProcessPoolExecutor] = None
+    _process_workers = int(os.getenv("GREEN_SCREEN_WORKERS", "0")) or cpu_scheduler.total_cores
+    _process_pool_lock = threading.Lock()
 
     @staticmethod
     def remove_green_screen(
         image_path: str,
         lower_bound: Tuple[int, int, int] = (40, 100, 20),
-        upper_bound: Tuple[int, int, int] = (80, 255, 255)
+        upper_bound: Tuple[int, int, int] = (80, 255, 255),
+        engine: str = ENGINE_HARD
     ) -> np.ndarray:
         """
         Remove fundo verde criando transparência
@@ -18,6 +161,7 @@ class GreenScreenService:
             image_path: Caminho da imagem
             lower_bound: Limite inferior para detecção de verde (HSV)
             upper_bound: Limite superior para detecção de verde (HSV)
+            engine: 'hard' (máscara binária) ou 'soft' (alpha suave + supressão de spill)
 
         Returns:
             Imagem numpy array com canal alpha
@@ -31,15 +175,48 @@ class GreenScreenService:
         if len(image.shape) == 3 and image.shape[2] == 4:
             return image
 
+        return GreenScreenService.make_keyer(lower_bound, upper_bound, engine)(image)
+
+    @staticmethod
+    def validate_engine(engine: str) -> None:
+        if engine not in GreenScreenService.ENGINES:
+            raise ValueError(
+                f"Engine inválido: {engine}. Use um de {', '.join(GreenScreenService.ENGINES)}")
+
+    @staticmethod
+    def make_keyer(
+        lower_bound: Tuple[int, int, int],
+        upper_bound: Tuple[int, int, int],
+        engine: str = ENGINE_HARD
+    ) -> Callable[..., np.ndarray]:
+        """Função key(imagem_bgr, destino_bgra=None) -> BGRA para o engine escolhido"""
+        GreenScreenService.validate_engine(engine)
+        if engine == GreenScreenService.ENGINE_SOFT:
+            return SoftKeyer(lower_bound, upper_bound)
+
+        def key(image: np.ndarray, transparent_image: Optional[np.ndarray] = None) -> np.ndarray:
+            return GreenScreenService._apply_key(
+                image, lower_bound, upper_bound, transparent_image)
+        return key
+
+    @staticmethod
+    def _apply_key(
+        image: np.ndarray,
+        lower_bound: Tuple[int, int, int],
+        upper_bound: Tuple[int, int, int],
+        transparent_image: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Chroma key HSV (inRange) de um quadro BGR; grava em transparent_image se informado"""
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
         mask = cv2.inRange(hsv, lower_bound, upper_bound)
 
         inverted_mask = cv2.bitwise_not(mask)
 
-        transparent_image = np.zeros(
-            (image.shape[0], image.shape[1], 4), dtype=np.uint8
-        )
+        if transparent_image is None:
+            transparent_image = np.zeros(
+                (image.shape[0], image.shape[1], 4), dtype=np.uint8
+            )
 
         transparent_image[:, :, :3] = image
 
@@ -47,6 +224,35 @@ class GreenScreenService:
 
         return transparent_image
 
+    @staticmethod
+    def encode_png(image: np.ndarray) -> bytes:
+        """Codifica a imagem (BGRA) em PNG na memória, sem passar pelo disco"""
+        ok, buffer = cv2.imencode(".png", image)
+        if not ok:
+            raise RuntimeError("Não foi possível codificar a imagem em PNG")
+        return buffer.tobytes()
+
+    @staticmethod
+    def submit_batch(
+        image_paths: List[str],
+        lower_bound: Tuple[int, int, int] = (40, 100, 20),
+        upper_bound: Tuple[int, int, int] = (80, 255, 255),
+        engine: str = ENGINE_HARD
+    ) -> List[Future]:
+        """
+        Agenda a remoção de fundo de várias imagens no pool de processos.
+
+        Returns:
+            Um Future por imagem (na ordem recebida) cujo resultado é o PNG em bytes
+        """
+        GreenScreenService.validate_engine(engine)
+        pool = GreenScreenService._get_process_pool()
+        return [
+            pool.submit(_key_image_to_png, image_path,
+                        tuple(lower_bound), tuple(upper_bound), engine)
+            for image_path in image_paths
+        ]
+
     @staticmethod
     def save_transparent_image(image: np.ndarray, output_path: str) -> None:
         """
@@ -67,7 +273,8 @@ class GreenScreenService:
         image_path: str,
         hue_range: int = 20,
         saturation_min: int = 100,
-        value_min: int = 20
+        value_min: int = 20,
+        engine: str = ENGINE_HARD
     ) -> np.ndarray:
         """
         Versão mais flexível para ajustar a detecção de verde
@@ -77,6 +284,8 @@ class GreenScreenService:
             hue_range: Variação de matiz para verde (padrão: 20)
             saturation_min: Saturação mínima (padrão: 100)
             value_min: Valor mínimo (padrão: 20)
+            engine: 'hard' ou 'soft'; no soft os mesmos limites definem onde
+                o alpha é 0 e a borda ganha uma rampa suave em vez de um corte seco
 
         Returns:
             Imagem numpy array com canal alpha
@@ -87,5 +296,171 @@ class GreenScreenService:
         upper_bound = (green_hue + hue_range, 255, 255)
 
         return GreenScreenService.remove_green_screen(
-            image_path, lower_bound, upper_bound
+            image_path, lower_bound, upper_bound, engine
         )
+
+    @staticmethod
+    def remove_green_screen_video(
+        video_path: str,
+        output_path: str,
+        lower_bound: Tuple[int, int, int] = (40, 100, 20),
+        upper_bound: Tuple[int, int, int] = (80, 255, 255),
+        output_format: str = "prores",
+        batch_frames: int = DEFAULT_BATCH_FRAMES,
+        progress_callback: Optional[ProgressCallback] = None,
+        engine: str = ENGINE_HARD
+    ) -> str:
+        """
+        Remove fundo verde de um vídeo quadro a quadro, sem carregar o clipe na memória.
+
+        Os quadros são decodificados por um pipe rawvideo do ffmpeg, processados
+        em lotes no pool de processos (mesmo keyer das imagens) e enviados
+        na ordem para um segundo ffmpeg que codifica com canal alpha. Só alguns
+        lotes ficam em memória ao mesmo tempo, qualquer que seja a duração.
+
+        Args:
+            video_path: Caminho do vídeo
+            output_path: Arquivo de saída (.mov para prores, .webm para vp9) ou,
+                para png, diretório onde a sequência frame_000001.png... é gravada
+            output_format: 'prores' (ProRes 4444), 'vp9' (VP9 com alpha) ou 'png'
+            batch_frames: Quadros por lote enviado ao pool
+            engine: 'hard' (máscara binária) ou 'soft' (alpha suave + supressão de spill)
+
+        Returns:
+            Caminho da saída
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Vídeo não encontrado: {video_path}")
+        GreenScreenService.validate_engine(engine)
+        if output_format not in GreenScreenService.VIDEO_FORMATS:
+            raise ValueError(
+                f"Formato inválido: {output_format}. Use um de {', '.join(GreenScreenService.VIDEO_FORMATS)}")
+
+        video_stream = ProbeService.get_stream(video_path, 'video')
+        if video_stream is None:
+            raise ValueError("Nenhuma stream de vídeo encontrada no arquivo.")
+        width, height = int(video_stream['width']), int(video_stream['height'])
+        framerate = video_stream.get('r_frame_rate', '30/1')
+        has_audio = ProbeService.get_stream(video_path, 'audio') is not None
+        try:
+            total_frames = int(ProbeService.get_duration(video_path) *
+                               ProbeService.get_frame_rate(video_stream)) or None
+        except (KeyError, ValueError):
+            total_frames = None
+
+        video_args, audio_args = GreenScreenService.VIDEO_FORMATS[output_format]
+        if output_format == "png":
+            os.makedirs(output_path, exist_ok=True)
+            target = os.path.join(output_path, "frame_%06d.png")
+        else:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            target = output_path
+
+        frame_size = width * height * 3
+        batch_frames = max(1, batch_frames)
+
+        with cpu_scheduler.reserve() as cores:
+            decode_cmd = [
+                'ffmpeg', '-v', 'error', '-i', video_path,
+                '-map', '0:v:0', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1'
+            ]
+            encode_cmd = [
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'bgra',
+                '-s', f'{width}x{height}', '-r', framerate, '-i', 'pipe:0',
+            ]
+            if has_audio and audio_args:
+                encode_cmd.extend(['-i', video_path, '-map', '0:v', '-map', '1:a:0'] + audio_args)
+            encode_cmd = with_thread_args(encode_cmd + video_args + [target], cores)
+
+            # Os dois processos rodam durante todo o vídeo: cada um conta como uma etapa
+            with track_ffmpeg("green_screen", "decode") as decode_run, \
+                    track_ffmpeg("green_screen", "encode") as encode_run:
+                decoder = subprocess.Popen(
+                    decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                encoder = subprocess.Popen(
+                    encode_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+                decoder_errors = GreenScreenService._drain(decoder.stderr)
+                encoder_errors = GreenScreenService._drain(encoder.stderr)
+
+                pool = GreenScreenService._get_process_pool()
+                # Lotes em execução limitados ao orçamento de núcleos (+1 aguardando escrita)
+                max_in_flight = min(cores, GreenScreenService._process_workers) + 1
+                in_flight = deque()
+                frames_done = 0
+
+                def write_oldest():
+                    nonlocal frames_done
+                    future, count = in_flight.popleft()
+                    encoder.stdin.write(future.result())
+                    frames_done += count
+                    if progress_callback and total_frames:
+                        progress_callback(
+                            f"Chroma key: {frames_done}/{total_frames} quadros",
+                            min(0.99, frames_done / total_frames))
+
+                try:
+                    while True:
+                        data = decoder.stdout.read(frame_size * batch_frames)
+                        if not data:
+                            break
+                        count = len(data) // frame_size
+                        data = data[:count * frame_size]
+                        in_flight.append((pool.submit(
+                            _key_batch, data, width, height,
+                            tuple(lower_bound), tuple(upper_bound), engine), count))
+                        if len(in_flight) >= max_in_flight:
+                            write_oldest()
+                    while in_flight:
+                        write_oldest()
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    # O encoder terminou antes (erro reportado abaixo)
+                    decoder.kill()
+                except Exception as e:
+                    decoder.kill()
+                    encoder.kill()
+                    if isinstance(e, BrokenProcessPool):
+                        # Um worker morreu: o próximo vídeo recria o pool
+                        with GreenScreenService._process_pool_lock:
+                            GreenScreenService._process_pool = None
+                    raise
+                finally:
+                    for future, _ in in_flight:
+                        future.cancel()
+                    decoder.wait()
+                    encoder.wait()
+                decode_run.ok = decoder.returncode == 0
+                encode_run.ok = encoder.returncode == 0
+
+            if decoder.returncode != 0:
+                raise RuntimeError(
+                    f"Erro ao decodificar o vídeo: {''.join(decoder_errors)}")
+            if encoder.returncode != 0:
+                raise RuntimeError(
+                    f"Erro ao codificar o vídeo com alpha: {''.join(encoder_errors)}")
+
+        print(f"Chroma key concluído: {frames_done} quadros em {output_path}")
+        return output_path
+
+    @staticmethod
+    def _get_process_pool() -> ProcessPoolExecutor:
+        """Pool de processos compartilhado, criado no primeiro uso (spawn: seguro com threads)"""
+        with GreenScreenService._process_pool_lock:
+            if GreenScreenService._process_pool is None:
+                GreenScreenService._process_pool = ProcessPoolExecutor(
+                    max_workers=GreenScreenService._process_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return GreenScreenService._process_pool
+
+    @staticmethod
+    def _drain(stream) -> deque:
+        """Lê stderr em segundo plano, guardando só o final, para o pipe não travar o ffmpeg"""
+        tail = deque(maxlen=50)
+        threading.Thread(
+            target=lambda: tail.extend(
+                line.decode('utf-8', errors='ignore') for line in stream),
+            daemon=True
+        ).start()
+        return tail
@@ -0,0 +1,240 @@
+import fcntl
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.core.metrics import track_ffmpeg
+
+
+class OverlayAssetCache:
+    """
+    Cache em disco de imagens de overlay já pré-processadas (marca d'água,
+    faixa de banner): redimensionadas, com opacidade aplicada e em RGBA.
+
+    A chave é o hash do conteúdo da imagem de origem mais a cadeia de
+    filtros, então o mesmo logo enviado com outro nome reaproveita o asset e
+    um arquivo alterado no mesmo caminho gera um asset novo. Os arquivos são
+    descartados do menos usado para o mais usado (mtime) quando o total passa
+    de OVERLAY_CACHE_MAX_BYTES.
+
+    O diretório é compartilhado pelos workers uvicorn: cada uso segura um
+    flock compartilhado no asset e o descarte só remove arquivos em que
+    consegue o flock exclusivo, então assets em uso por um ffmpeg de qualquer
+    processo nunca são removidos. O total é sempre medido no próprio
+    diretório, que também recebe os assets gerados pelos outros workers.
+    """
+    _dir = os.getenv(
+        "OVERLAY_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "bonett_overlay_cache")
+    )
+    _max_bytes = int(os.getenv("OVERLAY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    _in_use: Dict[str, int] = {}  # usos ativos neste processo, só para as estatísticas
+    _render_locks: Dict[str, threading.Lock] = {}
+    _content_hashes: Dict[str, Tuple[int, int, str]] = {}
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    @contextmanager
+    def use(image_path: str, filters: str) -> Iterator[str]:
+        """
+        Caminho do asset (PNG RGBA) gerado aplicando `filters` à imagem,
+        protegido contra remoção enquanto o bloco estiver ativo.
+
+        Raises:
+            FileNotFoundError: se a imagem não existir
+            RuntimeError: se o ffmpeg não conseguir gerar o asset
+        """
+        key = OverlayAssetCache._asset_key(image_path, filters)
+        path, fd = OverlayAssetCache._acquire(key, image_path, filters)
+        try:
+            yield path
+        finally:
+            os.close(fd)
+            with OverlayAssetCache._lock:
+                OverlayAssetCache._in_use[key] -= 1
+                if not OverlayAssetCache._in_use[key]:
+                    del OverlayAssetCache._in_use[key]
+            OverlayAssetCache._evict()
+
+    @staticmethod
+    def content_hash(path: str) -> str:
+        """sha256 do conteúdo, recalculado só quando tamanho ou mtime mudam"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Imagem não encontrada: {path}")
+
+        cached = OverlayAssetCache._content_hashes.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        value = digest.hexdigest()
+        with OverlayAssetCache._lock:
+            OverlayAssetCache._content_hashes[path] = (stat.st_size, stat.st_mtime_ns, value)
+        return value
+
+    @staticmethod
+    def stats() -> dict:
+        assets = OverlayAssetCache._scan()
+        with OverlayAssetCache._lock:
+            stats = dict(OverlayAssetCache._stats)
+            stats["in_use"] = len(OverlayAssetCache._in_use)
+        stats["entries"] = len(assets)
+        stats["bytes"] = sum(size for _, _, size in assets)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_bytes"] = OverlayAssetCache._max_bytes
+        stats["dir"] = OverlayAssetCache._dir
+        return stats
+
+    @staticmethod
+    def clear() -> None:
+        """Remove todos os assets que nenhum processo está usando"""
+        for _, key, _ in OverlayAssetCache._scan():
+            OverlayAssetCache._remove_unused(key)
+
+    @staticmethod
+    def _asset_key(image_path: str, filters: str) -> str:
+        content = OverlayAssetCache.content_hash(image_path)
+        return hashlib.sha256(f"{content}|{filters}".encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _path(key: str) -> str:
+        return os.path.join(OverlayAssetCache._dir, f"{key}.png")
+
+    @staticmethod
+    def _acquire(key: str, image_path: str, filters: str) -> Tuple[str, int]:
+        """(caminho, descritor com flock compartilhado) do asset, gerando-o se preciso"""
+        path = OverlayAssetCache._path(key)
+        with OverlayAssetCache._lock:
+            render_lock = OverlayAssetCache._render_locks.setdefault(key, threading.Lock())
+
+        # Um único ffmpeg por asset neste processo: requisições simultâneas aguardam o primeiro
+        with render_lock:
+            fd = OverlayAssetCache._open_shared(path)
+            hit = fd is not None
+            if hit:
+                # mtime marca o último uso para a ordem de descarte
+                os.utime(path)
+            else:
+                OverlayAssetCache._render(image_path, filters, path)
+                fd = OverlayAssetCache._open_shared(path)
+                if fd is None:
+                    raise RuntimeError(f"Overlay removido logo após ser gerado: {path}")
+
+            with OverlayAssetCache._lock:
+                OverlayAssetCache._in_use[key] = OverlayAssetCache._in_use.get(key, 0) + 1
+                OverlayAssetCache._stats["hits" if hit else "misses"] += 1
+                OverlayAssetCache._render_locks.pop(key, None)
+
+        if not hit:
+            OverlayAssetCache._evict()
+        return path, fd
+
+    @staticmethod
+    def _open_shared(path: str) -> Optional[int]:
+        """
+        Abre o asset com flock compartilhado, ou None se ele não existe. Se
+        outro processo o removeu entre o open e o flock, o descritor aponta
+        para um arquivo sem nome e também conta como ausente.
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+        return None
+
+    @staticmethod
+    def _render(image_path: str, filters: str, path: str) -> None:
+        os.makedirs(OverlayAssetCache._dir, exist_ok=True)
+        # Grava em arquivo temporário e renomeia: leitores nunca veem um PNG parcial
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-i', image_path,
+            '-vf', f"{filters},format=rgba",
+            '-frames:v', '1',
+            partial
+        ]
+        with track_ffmpeg("overlay_cache", "render") as run:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            run.ok = result.returncode == 0
+        if result.returncode != 0:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise RuntimeError(f"Erro ao pré-processar overlay: {result.stderr}")
+        os.replace(partial, path)
+
+    @staticmethod
+    def _scan() -> List[Tuple[float, str, int]]:
+        """(mtime, chave, bytes) de cada asset no diretório, menos usados primeiro"""
+        try:
+            names = os.listdir(OverlayAssetCache._dir)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            if not name.endswith(".png") or name.endswith(".tmp.png"):
+                continue
+            try:
+                stat = os.stat(os.path.join(OverlayAssetCache._dir, name))
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, name[:-4], stat.st_size))
+        return sorted(found)
+
+    @staticmethod
+    def _evict() -> None:
+        """Relê o diretório e remove os menos usados, fora os em uso, até caber no limite"""
+        assets = OverlayAssetCache._scan()
+        total = sum(size for _, _, size in assets)
+        for _, key, size in assets:
+            if total <= OverlayAssetCache._max_bytes:
+                break
+            if OverlayAssetCache._remove_unused(key):
+                total -= size
+                with OverlayAssetCache._lock:
+                    OverlayAssetCache._stats["evictions"] += 1
+
+    @staticmethod
+    def _remove_unused(key: str) -> bool:
+        """Remove o asset se nenhum processo segura o flock dele; retorna se removeu"""
+        path = OverlayAssetCache._path(key)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        try:
+            # Só remove se o nome ainda é deste arquivo (pode ter sido regerado)
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                return False
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        finally:
+            os.close(fd)
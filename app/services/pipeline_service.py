@@ -0,0 +1,346 @@
+import os
+import shutil
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Tuple
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import ProgressCallback, parse_time, run_ffmpeg
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.audio_service import AudioService
+from app.services.banner_service import BannerService
+from app.services.cut_service import CutService
+from app.services.overlay_asset_cache import OverlayAssetCache
+from app.services.probe_service import ProbeService
+from app.services.watermark_service import WatermarkService
+
+
+class PipelineService:
+    """
+    Executa uma lista ordenada de operações (cut, banner, watermark, audio)
+    sobre um vídeo com uma única decodificação e uma única codificação.
+
+    As operações consecutivas que podem ser fundidas viram um só filtergraph:
+    cortes se tornam a busca na entrada (-ss/-t), banner vira pad + overlay
+    da faixa pré-renderizada, marca d'água um overlay do asset em cache e o
+    áudio um amix. Operações que não se fundem (corte em modo copy/smart) são
+    executadas pelo próprio serviço, encadeadas por arquivos temporários; se
+    o ffmpeg do grafo fundido falhar, as operações daquele trecho também são
+    encadeadas uma a uma.
+    """
+    OPERATIONS = ("cut", "banner", "watermark", "audio")
+
+    # Valores padrão iguais aos dos endpoints de cada serviço
+    _DEFAULTS = {
+        "cut": {"mode": CutService.MODE_REENCODE},
+        "banner": {"position": "top", "banner_scale": 1.0, "padding": 0},
+        "watermark": {"opacity": 0.5, "scale": 0.5},
+        "audio": {"reduce_original_volume": False},
+    }
+    _REQUIRED = {
+        "cut": ("start_time", "end_time"),
+        "banner": ("image_path",),
+        "watermark": ("watermark_path",),
+        "audio": ("audio_path",),
+    }
+
+    @staticmethod
+    def run_pipeline(
+        input_path: str,
+        output_path: str,
+        operations: List[Dict[str, Any]],
+        encoding_profile: str = "standard",
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> dict:
+        """
+        Args:
+            input_path: Vídeo de entrada
+            output_path: Vídeo final
+            operations: Lista ordenada de {'type': ..., **parâmetros da operação}
+            encoding_profile: Perfil de codificação de todas as etapas
+
+        Returns:
+            dict com output_path, as etapas executadas (fundidas ou encadeadas)
+            e a quantidade de codificações
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {input_path}")
+        if not operations:
+            raise ValueError("Nenhuma operação informada")
+        encoding_profiles.get_profile(encoding_profile)
+
+        operations = [PipelineService.normalize_operation(op) for op in operations]
+        stages = PipelineService.plan_stages(operations)
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+        # Um único estágio fundido grava direto na saída; os demais guardam
+        # estágios intermediários e saídas encadeadas (~2x o vídeo)
+        single_fused = len(stages) == 1 and stages[0][0] == "fused"
+        reserve_bytes = 0 if single_fused else WorkspaceManager.estimate(input_path, factor=2)
+        executed = []
+        with workspace_manager.workspace("pipeline", reserve_bytes) as temp_dir:
+            current = input_path
+            for i, (mode, stage_ops) in enumerate(stages):
+                target = output_path if i == len(stages) - 1 else os.path.join(
+                    temp_dir, f"stage_{i:02d}.mp4")
+                report = PipelineService._stage_progress(
+                    progress_callback, i, len(stages))
+
+                if mode == "fused":
+                    try:
+                        PipelineService._run_fused(
+                            current, target, stage_ops, encoding_profile, report)
+                    except RuntimeError as e:
+                        print(f"Grafo fundido falhou, encadeando as operações: {str(e)}")
+                        mode = "chained"
+
+                if mode == "chained":
+                    PipelineService._run_chained(
+                        current, target, stage_ops, encoding_profile, temp_dir, report)
+
+                executed.append({
+                    "mode": mode,
+                    "operations": [op["type"] for op in stage_ops],
+                    "encodes": 1 if mode == "fused" else sum(
+                        PipelineService._chained_encodes(op) for op in stage_ops),
+                })
+                current = target
+
+        if progress_callback:
+            progress_callback("Pipeline concluído", 1.0)
+
+        return {
+            "success": True,
+            "message": f"{len(operations)} operações, {sum(s['encodes'] for s in executed)} codificação(ões) de vídeo",
+            "output_path": output_path,
+            "stages": executed,
+        }
+
+    @staticmethod
+    def normalize_operation(operation: Dict[str, Any]) -> Dict[str, Any]:
+        op_type = operation.get("type")
+        if op_type not in PipelineService.OPERATIONS:
+            raise ValueError(
+                f"Operação inválida: {op_type}. Use uma de {', '.join(PipelineService.OPERATIONS)}")
+        missing = [name for name in PipelineService._REQUIRED[op_type] if operation.get(name) in (None, "")]
+        if missing:
+            raise ValueError(f"Operação {op_type} sem {', '.join(missing)}")
+
+        normalized = dict(PipelineService._DEFAULTS[op_type])
+        normalized.update({k: v for k, v in operation.items() if v is not None})
+
+        if op_type == "cut":
+            if normalized["mode"] not in CutService.MODES:
+                raise ValueError(
+                    f"Modo de corte inválido: {normalized['mode']}. Use um de {', '.join(CutService.MODES)}")
+            normalized["start"] = parse_time(normalized["start_time"])
+            normalized["end"] = parse_time(normalized["end_time"])
+            if normalized["end"] <= normalized["start"]:
+                raise ValueError(
+                    f"Tempo final ({normalized['end_time']}) deve ser maior que o inicial ({normalized['start_time']})")
+        for name in ("image_path", "watermark_path", "audio_path"):
+            if name in normalized and not os.path.exists(normalized[name]):
+                raise FileNotFoundError(f"Arquivo não encontrado: {normalized[name]}")
+        return normalized
+
+    @staticmethod
+    def is_fusable(operation: Dict[str, Any]) -> bool:
+        # copy/smart preservam o vídeo original; só o corte recodificado equivale à busca no grafo
+        return operation["type"] != "cut" or operation["mode"] == CutService.MODE_REENCODE
+
+    @staticmethod
+    def _chained_encodes(operation: Dict[str, Any]) -> int:
+        """Codificações de vídeo de uma operação executada pelo seu serviço"""
+        if operation["type"] == "audio":
+            return 0  # vídeo copiado
+        if operation["type"] == "cut" and operation["mode"] == CutService.MODE_COPY:
+            return 0
+        return 1
+
+    @staticmethod
+    def plan_stages(operations: List[Dict[str, Any]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Agrupa operações consecutivas fundíveis em uma etapa; as demais viram etapas encadeadas"""
+        stages = []
+        for op in operations:
+            if PipelineService.is_fusable(op):
+                if stages and stages[-1][0] == "fused":
+                    stages[-1][1].append(op)
+                else:
+                    stages.append(("fused", [op]))
+            else:
+                stages.append(("chained", [op]))
+        # Só mixagem de áudio: o serviço copia o vídeo, mais barato que recodificar no grafo
+        return [
+            ("chained" if all(op["type"] == "audio" for op in ops) else mode, ops)
+            for mode, ops in stages
+        ]
+
+    @staticmethod
+    def build_fused_command(
+        input_path: str,
+        output_path: str,
+        operations: List[Dict[str, Any]],
+        encoding_profile: str,
+        stack: ExitStack
+    ) -> Tuple[List[str], float]:
+        """
+        Compila as operações em um único comando ffmpeg.
+
+        Os assets de overlay ficam reservados em `stack` até o fim da execução.
+
+        Returns:
+            (comando, duração da saída em segundos)
+        """
+        video_stream = ProbeService.get_stream(input_path, 'video')
+        if video_stream is None:
+            raise ValueError("Nenhuma stream de vídeo encontrada no arquivo.")
+        has_audio = ProbeService.get_stream(input_path, 'audio') is not None
+        source_duration = ProbeService.get_duration(input_path)
+
+        # Cortes em sequência se compõem em um único intervalo da origem; a
+        # música de um passo de áudio começa no início da linha do tempo
+        # daquele ponto, então cortes posteriores a deslocam
+        trim_start, trim_end = 0.0, source_duration
+        audio_starts = []
+        for op in operations:
+            if op["type"] == "cut":
+                trim_start, trim_end = trim_start + op["start"], min(trim_start + op["end"], trim_end)
+                if trim_end <= trim_start:
+                    raise ValueError("Os cortes combinados resultam em um trecho vazio")
+            elif op["type"] == "audio":
+                audio_starts.append(trim_start)
+        duration = trim_end - trim_start
+
+        main_input = ['-i', input_path]
+        if trim_start > 0 or trim_end < source_duration:
+            main_input = ['-ss', f"{trim_start:.6f}", '-t', f"{duration:.6f}"] + main_input
+        inputs = [main_input]
+
+        width, height = int(video_stream['width']), int(video_stream['height'])
+        video, audio = "[0:v]", "[0:a]" if has_audio else None
+        filters = []
+        shortest = False
+
+        for n, op in enumerate(operations):
+            if op["type"] == "banner":
+                image_stream = ProbeService.get_stream(op["image_path"], 'video') or {}
+                geometry = BannerService.banner_geometry(
+                    width, height,
+                    float(image_stream.get('width', width)),
+                    float(image_stream.get('height', height)),
+                    op["position"], op["banner_scale"], op["padding"]
+                )
+                strip = stack.enter_context(OverlayAssetCache.use(
+                    op["image_path"], BannerService.banner_strip_filters(geometry)))
+                inputs.append(['-i', strip])
+                k = len(inputs) - 1
+                filters.append(
+                    f"{video}pad={width}:{geometry['new_height']}:(ow-iw)/2:{geometry['video_y']}:color=black[p{n}]")
+                filters.append(f"[p{n}][{k}:v]overlay=0:{geometry['banner_y']}[v{n}]")
+                video, height = f"[v{n}]", geometry["new_height"]
+
+            elif op["type"] == "watermark":
+                asset = stack.enter_context(OverlayAssetCache.use(
+                    op["watermark_path"], WatermarkService.watermark_filters(op["opacity"], op["scale"])))
+                inputs.append(['-i', asset])
+                k = len(inputs) - 1
+                filters.append(
+                    f"{video}[{k}:v]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:format=auto[v{n}]")
+                video = f"[v{n}]"
+
+            elif op["type"] == "audio":
+                offset = trim_start - audio_starts.pop(0)
+                inputs.append((['-ss', f"{offset:.6f}"] if offset > 0 else []) + ['-i', op["audio_path"]])
+                k = len(inputs) - 1
+                if audio is None:
+                    # Sem áudio na origem: a música sozinha, cortada na duração do vídeo
+                    audio = f"[{k}:a]"
+                else:
+                    if op["reduce_original_volume"]:
+                        filters.append(f"{audio}volume=0.2[o{n}]")
+                        audio = f"[o{n}]"
+                    filters.append(f"{audio}[{k}:a]amix=inputs=2:duration=shortest[a{n}]")
+                    audio = f"[a{n}]"
+                shortest = True
+
+        cmd = ['ffmpeg', '-y']
+        for args in inputs:
+            cmd.extend(args)
+        if filters:
+            cmd.extend(['-filter_complex', ";".join(filters)])
+
+        # Rótulos do grafo vão entre colchetes; streams das entradas, como "0:v:0"
+        cmd.extend(['-map', video if video != "[0:v]" else '0:v:0'])
+        if audio is not None:
+            cmd.extend(['-map', audio if not audio.endswith(":a]") else audio[1:-1] + ':0'])
+        cmd.extend(encoding_profiles.video_args(encoding_profile))
+        if audio is not None:
+            cmd.extend(encoding_profiles.audio_args(encoding_profile))
+        if shortest:
+            cmd.append('-shortest')
+        cmd.extend(['-movflags', '+faststart', output_path])
+        return cmd, duration
+
+    @staticmethod
+    def _run_fused(input_path: str, output_path: str, operations: List[Dict[str, Any]], encoding_profile: str, progress_callback=None) -> None:
+        with ExitStack() as stack:
+            cmd, duration = PipelineService.build_fused_command(
+                input_path, output_path, operations, encoding_profile, stack)
+            print(f"Executando pipeline fundido: {' '.join(cmd)}")
+            result = run_ffmpeg(
+                cmd,
+                duration=duration,
+                progress_callback=progress_callback,
+                stage=f"Pipeline ({', '.join(op['type'] for op in operations)})",
+                check=False,
+                cores=encoding_profiles.profile_cores(encoding_profile),
+                service="pipeline",
+                step="encode"
+            )
+        if result.returncode != 0:
+            raise RuntimeError(f"Erro no pipeline fundido: {result.stderr[-2000:]}")
+
+    @staticmethod
+    def _run_chained(input_path: str, output_path: str, operations: List[Dict[str, Any]], encoding_profile: str, temp_dir: str, progress_callback=None) -> None:
+        """Executa cada operação pelo seu serviço, uma codificação por operação"""
+        current = input_path
+        for i, op in enumerate(operations):
+            target = output_path if i == len(operations) - 1 else os.path.join(
+                temp_dir, f"chained_{id(op)}_{i}.mp4")
+            report = PipelineService._stage_progress(progress_callback, i, len(operations))
+
+            if op["type"] == "cut":
+                CutService.cut_video(
+                    current, target, op["start_time"], op["end_time"],
+                    progress_callback=report, mode=op["mode"], encoding_profile=encoding_profile)
+            elif op["type"] == "banner":
+                BannerService.add_banner(
+                    current, op["image_path"], target,
+                    position=op["position"], banner_scale=op["banner_scale"], padding=op["padding"],
+                    progress_callback=report, encoding_profile=encoding_profile)
+            elif op["type"] == "watermark":
+                WatermarkService.add_watermark(
+                    current, op["watermark_path"], target,
+                    opacity=op["opacity"], scale=op["scale"],
+                    progress_callback=report, encoding_profile=encoding_profile)
+            elif op["type"] == "audio":
+                # A mixagem substitui o arquivo recebido: trabalha sobre um link da entrada
+                work = os.path.join(temp_dir, f"audio_{id(op)}_{i}.mp4")
+                try:
+                    os.link(current, work)
+                except OSError:
+                    shutil.copy2(current, work)
+                AudioService.mix_audio_with_video(
+                    work, op["audio_path"], replace_original=True,
+                    reduce_original_volume=op["reduce_original_volume"],
+                    progress_callback=report, encoding_profile=encoding_profile)
+                shutil.move(work, target)
+            current = target
+
+    @staticmethod
+    def _stage_progress(progress_callback: Optional[ProgressCallback], index: int, total: int) -> Optional[ProgressCallback]:
+        """Mapeia o progresso (0-1) de uma etapa para a sua fatia do pipeline"""
+        if progress_callback is None:
+            return None
+
+        def report(message, progress, **stats):
+            progress_callback(message, (index + min(max(progress, 0.0), 1.0)) / total, **stats)
+        return report
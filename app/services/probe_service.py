@@ -0,0 +1,265 @@
+import copy
+import os
+import json
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from app.core.metrics import track_ffmpeg
+
+
+class ProbeService:
+    """
+    Metadados de mídia (ffprobe) com cache em memória (LRU) e em SQLite.
+
+    As entradas são indexadas pelo caminho absoluto e validadas por
+    (tamanho, mtime): se o arquivo mudar, a entrada antiga é descartada e o
+    arquivo é analisado novamente. O SQLite guarda no máximo
+    PROBE_CACHE_DB_MAX_ENTRIES arquivos, descartando os menos usados, e
+    entradas sem uso há mais de PROBE_CACHE_DB_MAX_AGE_DAYS. Cada chamada
+    recebe a sua própria cópia do JSON: alterá-la não afeta o cache.
+    """
+    _max_entries = int(os.getenv("PROBE_CACHE_SIZE", "256"))
+    _db_path = os.getenv(
+        "PROBE_CACHE_DB",
+        os.path.join(tempfile.gettempdir(), "bonett_probe_cache.sqlite3")
+    )
+    _db_max_entries = int(os.getenv("PROBE_CACHE_DB_MAX_ENTRIES", "10000"))
+    _db_max_age = float(os.getenv("PROBE_CACHE_DB_MAX_AGE_DAYS", "30")) * 86400
+    # Leitura além do fim pedido em get_video_packets: cobre um GOP típico e,
+    # com folga, a reordenação dos B-frames
+    PACKET_READ_MARGIN = 10.0
+    _memory: "OrderedDict[str, Tuple[int, int, dict]]" = OrderedDict()
+    _lock = threading.Lock()
+    _db_ready = False
+    _stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0, "disk_evictions": 0}
+
+    @staticmethod
+    def probe(path: str) -> dict:
+        """
+        Retorna o JSON do ffprobe (-show_format -show_streams) do arquivo,
+        em uma cópia que o chamador pode alterar.
+
+        Raises:
+            FileNotFoundError: se o arquivo não existir
+            RuntimeError: se o ffprobe falhar
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+
+        with ProbeService._lock:
+            cached = ProbeService._memory.get(path)
+            if cached is not None:
+                if cached[0] == size and cached[1] == mtime_ns:
+                    ProbeService._memory.move_to_end(path)
+                    ProbeService._stats["memory_hits"] += 1
+                    return copy.deepcopy(cached[2])
+                ProbeService._memory.pop(path, None)
+                ProbeService._stats["invalidations"] += 1
+
+        data = ProbeService._load_from_disk(path, size, mtime_ns)
+        if data is not None:
+            with ProbeService._lock:
+                ProbeService._stats["disk_hits"] += 1
+        else:
+            data = ProbeService._run_ffprobe(path)
+            with ProbeService._lock:
+                ProbeService._stats["misses"] += 1
+            ProbeService._save_to_disk(path, size, mtime_ns, data)
+
+        with ProbeService._lock:
+            ProbeService._memory[path] = (size, mtime_ns, data)
+            ProbeService._memory.move_to_end(path)
+            while len(ProbeService._memory) > ProbeService._max_entries:
+                ProbeService._memory.popitem(last=False)
+
+        return copy.deepcopy(data)
+
+    @staticmethod
+    def get_stream(path: str, codec_type: str = "video") -> Optional[dict]:
+        """Primeira stream do tipo informado ('video', 'audio') ou None"""
+        return next(
+            (stream for stream in ProbeService.probe(path)['streams']
+             if stream.get('codec_type') == codec_type),
+            None
+        )
+
+    @staticmethod
+    def get_duration(path: str) -> float:
+        return float(ProbeService.probe(path)['format']['duration'])
+
+    @staticmethod
+    def get_frame_rate(stream: dict, default: float = 30.0) -> float:
+        """Converte r_frame_rate ('30000/1001') em float"""
+        fps_str = stream.get('r_frame_rate', f'{default}')
+        if '/' in fps_str:
+            num, den = map(int, fps_str.split('/'))
+            return num / den if den != 0 else default
+        return float(fps_str)
+
+    @staticmethod
+    def get_video_packets(path: str, start: float = 0.0, end: Optional[float] = None) -> List[Tuple[float, bool]]:
+        """
+        (pts em segundos, é keyframe) de cada pacote de vídeo entre start e end,
+        em ordem de apresentação.
+
+        Lê apenas os pacotes do intervalo (-read_intervals) sem decodificar,
+        então o custo acompanha o tamanho do trecho e não o do arquivo. Não
+        passa pelo cache: o resultado depende do intervalo pedido.
+
+        O -read_intervals para na ordem de decodificação: com B-frames, o
+        primeiro P-frame depois de end encerra a leitura antes dos B-frames
+        que o antecedem na apresentação. Por isso a leitura vai
+        PACKET_READ_MARGIN segundos além de end e o recorte é feito pelo pts.
+        """
+        if end is not None:
+            interval = f"{start}%+{end - start + ProbeService.PACKET_READ_MARGIN}"
+        else:
+            interval = f"{start}%"
+        cmd = [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-read_intervals", interval,
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0", path
+        ]
+        with track_ffmpeg("probe", "packets") as run:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=120)
+            run.ok = result.returncode == 0
+        if result.returncode != 0:
+            raise RuntimeError(f"Erro ao ler pacotes de vídeo: {path}")
+
+        packets = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.strip().partition(',')
+            if pts_time in ('', 'N/A'):
+                continue
+            pts = float(pts_time)
+            if pts >= start and (end is None or pts <= end):
+                packets.append((pts, flags.startswith('K')))
+        return sorted(packets)
+
+    @staticmethod
+    def get_keyframes(path: str, start: float = 0.0, end: Optional[float] = None) -> List[float]:
+        """Tempos (s) dos keyframes de vídeo entre start e end"""
+        return [pts for pts, key in ProbeService.get_video_packets(path, start, end) if key]
+
+    @staticmethod
+    def stats() -> dict:
+        with ProbeService._lock:
+            stats = dict(ProbeService._stats)
+            stats["memory_entries"] = len(ProbeService._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round(
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["db_path"] = ProbeService._db_path or None
+        stats["db_max_entries"] = ProbeService._db_max_entries
+        return stats
+
+    @staticmethod
+    def clear(memory_only: bool = False) -> None:
+        with ProbeService._lock:
+            ProbeService._memory.clear()
+        if not memory_only and ProbeService._db_path:
+            with ProbeService._connect() as conn:
+                conn.execute("DELETE FROM probe_cache")
+
+    @staticmethod
+    def _run_ffprobe(path: str) -> dict:
+        cmd = [
+            "ffprobe", "-v", "quiet", "-print_format", "json",
+            "-show_format", "-show_streams", path
+        ]
+        with track_ffmpeg("probe", "probe") as run:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=30)
+            run.ok = result.returncode == 0
+        if result.returncode != 0:
+            raise RuntimeError(f"Erro ao analisar arquivo: {path}")
+        return json.loads(result.stdout)
+
+    @staticmethod
+    @contextmanager
+    def _connect() -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(ProbeService._db_path, timeout=10)
+        try:
+            if not ProbeService._db_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS probe_cache ("
+                    " path TEXT PRIMARY KEY,"
+                    " size INTEGER NOT NULL,"
+                    " mtime_ns INTEGER NOT NULL,"
+                    " data TEXT NOT NULL,"
+                    " updated_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS probe_cache_updated_at ON probe_cache (updated_at)")
+                ProbeService._db_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _load_from_disk(path: str, size: int, mtime_ns: int) -> Optional[dict]:
+        if not ProbeService._db_path:
+            return None
+        try:
+            with ProbeService._connect() as conn:
+                row = conn.execute(
+                    "SELECT size, mtime_ns, data FROM probe_cache WHERE path = ?", (path,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[0] != size or row[1] != mtime_ns:
+                    conn.execute(
+                        "DELETE FROM probe_cache WHERE path = ?", (path,))
+                    with ProbeService._lock:
+                        ProbeService._stats["invalidations"] += 1
+                    return None
+                # updated_at é o último uso: a ordem de descarte do LRU
+                conn.execute(
+                    "UPDATE probe_cache SET updated_at = ? WHERE path = ?", (time.time(), path))
+                return json.loads(row[2])
+        except sqlite3.Error as e:
+            print(f"Aviso: cache de probe indisponível: {e}")
+            return None
+
+    @staticmethod
+    def _save_to_disk(path: str, size: int, mtime_ns: int, data: dict) -> None:
+        if not ProbeService._db_path:
+            return
+        try:
+            with ProbeService._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO probe_cache (path, size, mtime_ns, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, size, mtime_ns, json.dumps(data), time.time())
+                )
+                ProbeService._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Aviso: cache de probe indisponível: {e}")
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection) -> None:
+        """Remove entradas sem uso há mais de _db_max_age e, acima de _db_max_entries, as menos usadas"""
+        removed = conn.execute(
+            "DELETE FROM probe_cache WHERE updated_at < ?",
+            (time.time() - ProbeService._db_max_age,)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM probe_cache").fetchone()[0] - ProbeService._db_max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM probe_cache WHERE path IN "
+                "(SELECT path FROM probe_cache ORDER BY updated_at LIMIT ?)", (excess,)).rowcount
+        if removed:
+            with ProbeService._lock:
+                ProbeService._stats["disk_evictions"] += removed
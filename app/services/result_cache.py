@@ -0,0 +1,385 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Cache de resultados endereçado por conteúdo para requisições idempotentes.
+
+    A chave combina o serviço, a versão do serviço (CACHE_VERSION de cada
+    classe), as impressões digitais dos arquivos de entrada e os parâmetros
+    normalizados da requisição. Em um acerto, a saída já gerada é ligada
+    (hard link, ou cópia entre sistemas de arquivos) no caminho pedido e o
+    ffmpeg não roda. As saídas ficam em RESULT_CACHE_DIR, indexadas em SQLite
+    e descartadas da menos usada para a mais usada acima de
+    RESULT_CACHE_MAX_BYTES ou quando o disco do cache fica com menos de
+    RESULT_CACHE_MIN_FREE_BYTES livres. RESULT_CACHE_DIR vazio desativa o cache.
+
+    Só entram no cache saídas que podem ser ligadas por hard link no
+    RESULT_CACHE_DIR: enquanto o arquivo pedido existir, a entrada não ocupa
+    espaço extra. Saídas em outro sistema de arquivos (ex.: um bind mount)
+    não são copiadas para o cache.
+    """
+    _dir = os.getenv(
+        "RESULT_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "bonett_result_cache")
+    )
+    _max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(20 * 1024 * 1024 * 1024)))
+    # Acima do limite de admissão (ADMISSION_MIN_FREE_BYTES, 512 MB): o cache
+    # libera espaço antes de a API começar a recusar trabalho
+    _min_free_bytes = int(os.getenv("RESULT_CACHE_MIN_FREE_BYTES", str(1024 * 1024 * 1024)))
+    # Arquivos até este tamanho entram inteiros no hash; acima, só amostras
+    _full_hash_limit = 64 * 1024 * 1024
+    _sample_size = 1024 * 1024
+    _sample_count = 16
+
+    _fingerprints: Dict[str, Tuple[int, int, str]] = {}
+    _key_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+    _lock = threading.Lock()
+    _db_ready = False
+    _stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+              "invalidations": 0, "skipped_stores": 0, "seconds_saved": 0.0}
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(ResultCache._dir)
+
+    @staticmethod
+    def cached_call(
+        service: str,
+        version: int,
+        input_paths: List[str],
+        output_path: str,
+        params: Dict[str, Any],
+        func: Callable[..., Any],
+        /,
+        *args,
+        progress_callback: Optional[Callable[..., None]] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Executa func(*args, progress_callback=..., **kwargs) ou reaproveita
+        uma saída idêntica já produzida. Os parâmetros do cache são só
+        posicionais: os nomeados (inclusive output_path) vão para func.
+
+        Args:
+            service: Nome do serviço (parte da chave)
+            version: Versão da saída do serviço; incrementar invalida o cache
+            input_paths: Arquivos cujo conteúdo determina a saída
+            output_path: Onde a saída deve ficar
+            params: Parâmetros que afetam a saída, já normalizados; a
+                extensão de output_path entra na chave automaticamente
+
+        Returns:
+            O retorno de func ou, em um acerto, output_path
+        """
+        if not ResultCache.enabled():
+            return func(*args, progress_callback=progress_callback, **kwargs)
+
+        # O contêiner da saída (.mp4, .mov, .webm...) muda o arquivo gerado
+        # mesmo com os mesmos parâmetros
+        params = dict(params, output_format=os.path.splitext(output_path)[1].lower())
+        key = ResultCache.cache_key(service, version, input_paths, params)
+        with ResultCache._key_lock(key):
+            if ResultCache._serve(key, output_path):
+                if progress_callback:
+                    progress_callback("Resultado reaproveitado do cache", 1.0)
+                return output_path
+
+            ResultCache._detach(output_path)
+            started = time.perf_counter()
+            result = func(*args, progress_callback=progress_callback, **kwargs)
+            elapsed = time.perf_counter() - started
+
+            produced = result if isinstance(result, str) else output_path
+            with ResultCache._lock:
+                ResultCache._stats["misses"] += 1
+            ResultCache._store(key, service, produced, elapsed)
+            return result
+
+    @staticmethod
+    def cache_key(service: str, version: int, input_paths: List[str], params: Dict[str, Any]) -> str:
+        payload = {
+            "service": service,
+            "version": version,
+            "inputs": [ResultCache.fingerprint(path) for path in input_paths],
+            "params": params,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def fingerprint(path: str) -> str:
+        """
+        Impressão digital do conteúdo: sha256 do arquivo inteiro ou, acima de
+        64 MB, do tamanho mais amostras de 1 MB espalhadas pelo arquivo.
+        Memorizada por (caminho, tamanho, mtime).
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+
+        cached = ResultCache._fingerprints.get(path)
+        if cached and cached[0] == size and cached[1] == mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256(str(size).encode())
+        with open(path, "rb") as f:
+            if size <= ResultCache._full_hash_limit:
+                for chunk in iter(lambda: f.read(ResultCache._sample_size), b""):
+                    digest.update(chunk)
+            else:
+                step = (size - ResultCache._sample_size) / (ResultCache._sample_count - 1)
+                for i in range(ResultCache._sample_count):
+                    f.seek(int(i * step))
+                    digest.update(f.read(ResultCache._sample_size))
+        value = digest.hexdigest()
+
+        with ResultCache._lock:
+            ResultCache._fingerprints[path] = (size, mtime_ns, value)
+        return value
+
+    @staticmethod
+    def stats() -> dict:
+        with ResultCache._lock:
+            stats = dict(ResultCache._stats)
+        stats["seconds_saved"] = round(stats["seconds_saved"], 3)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"], stats["bytes"], stats["exclusive_bytes"] = 0, 0, 0
+        if ResultCache.enabled():
+            try:
+                with ResultCache._connect() as conn:
+                    rows = conn.execute("SELECT file, size FROM result_cache").fetchall()
+                stats["entries"] = len(rows)
+                stats["bytes"] = sum(size for _, size in rows)
+                stats["exclusive_bytes"] = sum(
+                    size for file_name, size in rows if ResultCache._exclusive(file_name))
+            except sqlite3.Error as e:
+                print(f"Aviso: cache de resultados indisponível: {e}")
+        stats["max_bytes"] = ResultCache._max_bytes
+        stats["min_free_bytes"] = ResultCache._min_free_bytes
+        stats["dir"] = ResultCache._dir or None
+        return stats
+
+    @staticmethod
+    def clear() -> None:
+        if not ResultCache.enabled():
+            return
+        with ResultCache._connect() as conn:
+            for (file_name,) in conn.execute("SELECT file FROM result_cache").fetchall():
+                ResultCache._remove_file(file_name)
+            conn.execute("DELETE FROM result_cache")
+
+    @staticmethod
+    def trim() -> None:
+        """Aplica os limites de tamanho e de espaço livre sem esperar um novo resultado"""
+        if not ResultCache.enabled():
+            return
+        try:
+            with ResultCache._connect() as conn:
+                ResultCache._evict(conn)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Aviso: cache de resultados indisponível: {e}")
+
+    @staticmethod
+    @contextmanager
+    def _key_lock(key: str) -> Iterator[None]:
+        """Requisições iguais simultâneas (retentativas) esperam a primeira em vez de repetir o ffmpeg"""
+        with ResultCache._lock:
+            lock, users = ResultCache._key_locks.get(key, (threading.Lock(), 0))
+            ResultCache._key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with ResultCache._lock:
+                lock, users = ResultCache._key_locks[key]
+                if users == 1:
+                    del ResultCache._key_locks[key]
+                else:
+                    ResultCache._key_locks[key] = (lock, users - 1)
+
+    @staticmethod
+    @contextmanager
+    def _connect() -> Iterator[sqlite3.Connection]:
+        os.makedirs(ResultCache._dir, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(ResultCache._dir, "index.sqlite3"), timeout=10)
+        try:
+            if not ResultCache._db_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS result_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " service TEXT NOT NULL,"
+                    " file TEXT NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " mtime_ns INTEGER NOT NULL,"
+                    " elapsed REAL NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " last_used REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS result_cache_last_used ON result_cache (last_used)")
+                ResultCache._db_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _serve(key: str, output_path: str) -> bool:
+        try:
+            with ResultCache._connect() as conn:
+                row = conn.execute(
+                    "SELECT file, size, mtime_ns, elapsed FROM result_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return False
+                file_name, size, mtime_ns, elapsed = row
+                cached_path = os.path.join(ResultCache._dir, file_name)
+                try:
+                    stat = os.stat(cached_path)
+                    valid = stat.st_size == size and stat.st_mtime_ns == mtime_ns
+                except FileNotFoundError:
+                    valid = False
+                if not valid:
+                    # Alterado ou removido por fora (ex.: sobrescrito pelo hard link)
+                    conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                    ResultCache._remove_file(file_name)
+                    with ResultCache._lock:
+                        ResultCache._stats["invalidations"] += 1
+                    return False
+
+                if os.path.abspath(output_path) != os.path.abspath(cached_path):
+                    ResultCache._link(cached_path, output_path)
+                conn.execute(
+                    "UPDATE result_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        except (sqlite3.Error, OSError) as e:
+            print(f"Aviso: cache de resultados indisponível: {e}")
+            return False
+
+        with ResultCache._lock:
+            ResultCache._stats["hits"] += 1
+            ResultCache._stats["seconds_saved"] += elapsed
+        print(f"Resultado reaproveitado do cache: {output_path}")
+        return True
+
+    @staticmethod
+    def _store(key: str, service: str, output_path: str, elapsed: float) -> None:
+        if not output_path or not os.path.isfile(output_path):
+            return
+        file_name = key + os.path.splitext(output_path)[1]
+        cached_path = os.path.join(ResultCache._dir, file_name)
+        try:
+            os.makedirs(ResultCache._dir, exist_ok=True)
+            try:
+                ResultCache._link(output_path, cached_path, allow_copy=False)
+            except OSError:
+                # Sem hard link possível, guardar seria uma cópia inteira da saída
+                with ResultCache._lock:
+                    ResultCache._stats["skipped_stores"] += 1
+                return
+            stat = os.stat(cached_path)
+            now = time.time()
+            with ResultCache._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO result_cache "
+                    "(key, service, file, size, mtime_ns, elapsed, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, service, file_name, stat.st_size, stat.st_mtime_ns, elapsed, now, now)
+                )
+                ResultCache._evict(conn)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Aviso: não foi possível guardar o resultado no cache: {e}")
+            return
+
+        with ResultCache._lock:
+            ResultCache._stats["stores"] += 1
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection) -> None:
+        """
+        Descarta as entradas menos usadas até o total caber em
+        RESULT_CACHE_MAX_BYTES e o disco ter RESULT_CACHE_MIN_FREE_BYTES
+        livres. Para o disco só contam as entradas que o cache mantém sozinho
+        (o arquivo pedido já foi apagado); as demais não liberam espaço.
+        """
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()[0]
+        shortage = ResultCache._min_free_bytes - shutil.disk_usage(ResultCache._dir).free
+        if total <= ResultCache._max_bytes and shortage <= 0:
+            return
+        rows = conn.execute(
+            "SELECT key, file, size FROM result_cache ORDER BY last_used").fetchall()
+        for key, file_name, size in rows:
+            if total <= ResultCache._max_bytes and shortage <= 0:
+                break
+            exclusive = ResultCache._exclusive(file_name)
+            if total <= ResultCache._max_bytes and not exclusive:
+                continue
+            conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            ResultCache._remove_file(file_name)
+            total -= size
+            if exclusive:
+                shortage -= size
+            with ResultCache._lock:
+                ResultCache._stats["evictions"] += 1
+
+    @staticmethod
+    def _exclusive(file_name: str) -> bool:
+        """A entrada é o único nome do arquivo: removê-la libera espaço em disco"""
+        try:
+            return os.stat(os.path.join(ResultCache._dir, file_name)).st_nlink == 1
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _link(source: str, target: str, allow_copy: bool = True) -> None:
+        """
+        Hard link de source em target (substituindo target); cópia se estiverem
+        em discos diferentes, ou OSError com allow_copy=False.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        if os.path.exists(target) and os.path.samefile(source, target):
+            # Já é o mesmo arquivo; rename entre links do mesmo inode não faria nada
+            return
+        partial = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(source, partial)
+        except OSError:
+            if not allow_copy:
+                raise
+            shutil.copy2(source, partial)
+        os.replace(partial, target)
+
+    @staticmethod
+    def _detach(output_path: str) -> None:
+        """
+        Remove o nome de saída se ele for um hard link (de um acerto anterior):
+        o ffmpeg -y trunca o arquivo existente e estragaria a cópia do cache.
+        """
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _remove_file(file_name: str) -> None:
+        try:
+            os.remove(os.path.join(ResultCache._dir, file_name))
+        except FileNotFoundError:
+            pass
@@ -1,34 +1,62 @@
 import os
 import subprocess
-import tempfile
-import json
-import shutil
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Callable
+from concurrent.futures import wait, FIRST_COMPLETED
+from contextlib import ExitStack
+from typing import Optional, Callable, List, Tuple
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import run_ffmpeg
+from app.core.metrics import track_ffmpeg
+from app.core.scheduler import cpu_scheduler
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.probe_service import ProbeService
 
 
 class VideoProcessor:
     _video_extensions = {".mp4", ".mkv", ".avi", ".mov", ".flv", ".wmv"}
-    _executor = ThreadPoolExecutor(max_workers=max(4, os.cpu_count() or 4))
+
+    FAST_DURATION = 25      # Duração de cada seção acelerada em segundos
+    NORMAL_DURATION = 12    # Duração de cada seção normal em segundos
+    FAST_SPEED = 4          # Aceleração (4x mais rápido)
+    CYCLE_DURATION = FAST_DURATION + NORMAL_DURATION  # 37s por ciclo
+
+    AUDIO_SAMPLE_RATE = 44100
+
+    ENGINE_FILTERGRAPH = "filtergraph"  # Um único ffmpeg: uma decodificação e uma codificação
+    ENGINE_SEGMENTS = "segments"        # Um ffmpeg por segmento + concat + mixagem (fallback)
+    ENGINES = {ENGINE_FILTERGRAPH, ENGINE_SEGMENTS}
 
     @staticmethod
     def create_cyclic_video(
         video_path: str,
         output_path: str,
-        progress_callback: Optional[Callable[[str, float], None]] = None
+        progress_callback: Optional[Callable[[str, float], None]] = None,
+        engine: str = ENGINE_FILTERGRAPH,
+        max_parallel_segments: Optional[int] = None,
+        encoding_profile: str = "fast"
     ) -> dict:
         """
         Versão corrigida que resolve problemas de áudio e congelamento de vídeo.
-        """
 
-        FAST_DURATION = 25      # Duração de cada seção acelerada em segundos
-        NORMAL_DURATION = 12    # Duração de cada seção normal em segundos
-        FAST_SPEED = 4          # Aceleração (4x mais rápido)
-        CYCLE_DURATION = FAST_DURATION + NORMAL_DURATION  # 37s por ciclo
+        Args:
+            video_path: Caminho do vídeo de entrada
+            output_path: Caminho do vídeo de saída
+            progress_callback: Função chamada com (mensagem, progresso)
+            engine: 'filtergraph' renderiza tudo em um único processo ffmpeg;
+                'segments' usa o caminho antigo com um ffmpeg por segmento.
+                Se o filtergraph falhar, o caminho por segmentos é usado como fallback.
+            max_parallel_segments: Segmentos codificados em paralelo na engine 'segments'.
+                Se None, usa CYCLIC_SEGMENT_WORKERS ou o tamanho do executor.
+            encoding_profile: Perfil de codificação (draft, fast, standard, archive)
+        """
 
-        temp_dir = None
+        stack = ExitStack()
 
         try:
+            if engine not in VideoProcessor.ENGINES:
+                raise ValueError(
+                    f"Engine inválida: {engine}. Use uma de {sorted(VideoProcessor.ENGINES)}")
+            encoding_profiles.get_profile(encoding_profile)
+
             video_path = os.path.abspath(video_path)
             output_path = os.path.abspath(output_path)
 
@@ -45,18 +73,11 @@ class VideoProcessor:
             if progress_callback:
                 progress_callback("Iniciando análise do vídeo...", 0.05)
 
-            cmd_probe = [
-                "ffprobe", "-v", "quiet", "-print_format", "json",
-                "-show_format", "-show_streams", video_path
-            ]
-
-            result = subprocess.run(
-                cmd_probe, capture_output=True, text=True, timeout=30
-            )
-            if result.returncode != 0:
+            try:
+                probe_data = ProbeService.probe(video_path)
+            except RuntimeError:
                 raise RuntimeError("Erro ao analisar vídeo")
 
-            probe_data = json.loads(result.stdout)
             duration = float(probe_data['format']['duration'])
 
             video_stream = None
@@ -68,256 +89,51 @@ class VideoProcessor:
             if not video_stream:
                 raise RuntimeError("Stream de vídeo não encontrado")
 
-            fps_str = video_stream.get('r_frame_rate', '30/1')
-            if '/' in fps_str:
-                num, den = map(int, fps_str.split('/'))
-                fps = num / den if den != 0 else 30
-            else:
-                fps = float(fps_str)
+            has_audio = any(
+                stream['codec_type'] == 'audio' for stream in probe_data['streams'])
+
+            fps = ProbeService.get_frame_rate(video_stream)
 
             if progress_callback:
                 progress_callback(
                     f"Vídeo: {fps:.2f} FPS, {duration:.2f}s", 0.1)
 
-            temp_dir = tempfile.mkdtemp(prefix="cyclic_video_")
-
-            num_cycles = max(1, int(duration // CYCLE_DURATION))
-            total_output_duration = 0
-
-            video_segments = []
-            audio_segments = []
-
-            for cycle in range(num_cycles):
-                cycle_start = cycle * CYCLE_DURATION
-
-                fast_start = cycle_start
-                fast_end = min(cycle_start + FAST_DURATION, duration)
-                fast_duration = fast_end - fast_start
-
-                if fast_duration > 0.5:
-                    output_fast_duration = fast_duration / FAST_SPEED
-                    video_segments.append({
-                        'input_start': fast_start,
-                        'input_duration': fast_duration,
-                        'output_start': total_output_duration,
-                        'output_duration': output_fast_duration,
-                        'speed': FAST_SPEED,
-                        'type': 'fast'
-                    })
-                    total_output_duration += output_fast_duration
-
-                normal_start = cycle_start + FAST_DURATION
-                normal_end = min(cycle_start + CYCLE_DURATION, duration)
-                normal_duration = normal_end - normal_start
-
-                if normal_duration > 0.5:
-                    video_segments.append({
-                        'input_start': normal_start,
-                        'input_duration': normal_duration,
-                        'output_start': total_output_duration,
-                        'output_duration': normal_duration,
-                        'speed': 1.0,
-                        'type': 'normal'
-                    })
-
-                    audio_segments.append({
-                        'input_start': normal_start,
-                        'input_duration': normal_duration,
-                        'output_start': total_output_duration,
-                        'output_duration': normal_duration
-                    })
-
-                    total_output_duration += normal_duration
+            num_cycles, video_segments, audio_segments, total_output_duration = \
+                VideoProcessor._plan_segments(duration)
+
+            # Por segmentos, o scratch guarda os segmentos e a concatenação
+            # (~2x a saída); o filtergraph só grava os scripts de filtro
+            reserve_bytes = 0
+            if engine == VideoProcessor.ENGINE_SEGMENTS and duration > 0:
+                reserve_bytes = WorkspaceManager.estimate(
+                    video_path, factor=2 * total_output_duration / duration)
+            temp_dir = stack.enter_context(
+                workspace_manager.workspace("cyclic_video", reserve_bytes))
 
             if progress_callback:
                 progress_callback(
                     f"Planejados {len(video_segments)} segmentos de vídeo", 0.15)
 
-            segment_files = []
-
-            for i, segment in enumerate(video_segments):
-                segment_file = os.path.join(temp_dir, f"segment_{i:03d}.mp4")
-
-                if segment['type'] == 'fast':
-                    cmd_segment = [
-                        'ffmpeg', '-y',
-                        '-ss', str(segment['input_start']),
-                        '-t', str(segment['input_duration']),
-                        '-i', video_path,
-                        '-vf', f'setpts=PTS/{segment["speed"]}',
-                        '-an',
-                        '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
-                        segment_file
-                    ]
-                else:
-                    cmd_segment = [
-                        'ffmpeg', '-y',
-                        '-ss', str(segment['input_start']),
-                        '-t', str(segment['input_duration']),
-                        '-i', video_path,
-                        '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
-                        '-an',
-                        segment_file
-                    ]
-
-                result = subprocess.run(
-                    cmd_segment, capture_output=True, text=True)
-                if result.returncode != 0:
-                    print(f"Erro no segmento {i}: {result.stderr}")
-                    continue
-
-                if os.path.exists(segment_file):
-                    segment_files.append(segment_file)
-
-                if progress_callback:
-                    progress = 0.15 + 0.4 * ((i + 1) / len(video_segments))
-                    progress_callback(
-                        f"Processando segmento {i+1}/{len(video_segments)}", progress)
-
-            if not segment_files:
-                raise RuntimeError(
-                    "Nenhum segmento de vídeo foi criado com sucesso")
-
-            temp_video = os.path.join(temp_dir, "concatenated_video.mp4")
-            concat_file = os.path.join(temp_dir, 'video_concat.txt')
-
-            with open(concat_file, 'w', encoding='utf-8') as f:
-                for segment_file in segment_files:
-                    abs_path = os.path.abspath(segment_file).replace('\\', '/')
-                    f.write(f"file '{abs_path}'\n")
-
-            cmd_concat = [
-                'ffmpeg', '-y', '-f', 'concat', '-safe', '0',
-                '-i', concat_file,
-                '-c', 'copy',
-                temp_video
-            ]
-
-            result = subprocess.run(cmd_concat, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Erro na concatenação de vídeo: {result.stderr}")
-
-            if progress_callback:
-                progress_callback("Processando áudio...", 0.6)
-
-            temp_audio = os.path.join(temp_dir, "final_audio.wav")
-
-            if audio_segments:
-                cmd_silence = [
-                    'ffmpeg', '-y', '-f', 'lavfi',
-                    '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-                    '-t', str(total_output_duration),
-                    '-c:a', 'pcm_s16le',
-                    temp_audio
-                ]
-
-                result = subprocess.run(
-                    cmd_silence, capture_output=True, text=True)
-                if result.returncode != 0:
-                    raise RuntimeError(
-                        "Erro ao criar base de áudio silencioso")
-
-                audio_files_to_mix = [temp_audio]
-
-                for i, segment in enumerate(audio_segments):
-                    segment_audio = os.path.join(
-                        temp_dir, f"audio_segment_{i}.wav")
-                    positioned_audio = os.path.join(
-                        temp_dir, f"positioned_audio_{i}.wav")
-
-                    cmd_extract = [
-                        'ffmpeg', '-y',
-                        '-ss', str(segment['input_start']),
-                        '-t', str(segment['input_duration']),
-                        '-i', video_path,
-                        '-vn', '-c:a', 'pcm_s16le', '-ar', '44100', '-ac', '2',
-                        segment_audio
-                    ]
-
-                    result = subprocess.run(
-                        cmd_extract, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        continue
-
-                    if segment['output_start'] > 0:
-                        cmd_position = [
-                            'ffmpeg', '-y',
-                            '-f', 'lavfi', '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-                            '-i', segment_audio,
-                            '-filter_complex',
-                            f'[0]atrim=duration={segment["output_start"]}[silence];'
-                            f'[silence][1]concat=n=2:v=0:a=1[positioned]',
-                            '-map', '[positioned]',
-                            '-t', str(total_output_duration),
-                            '-c:a', 'pcm_s16le',
-                            positioned_audio
-                        ]
-                    else:
-                        cmd_position = [
-                            'ffmpeg', '-y',
-                            '-i', segment_audio,
-                            '-af', f'apad=whole_dur={total_output_duration}',
-                            '-c:a', 'pcm_s16le',
-                            positioned_audio
-                        ]
-
-                    result = subprocess.run(
-                        cmd_position, capture_output=True, text=True)
-                    if result.returncode == 0 and os.path.exists(positioned_audio):
-                        audio_files_to_mix.append(positioned_audio)
-
-                    if progress_callback:
-                        progress = 0.6 + 0.2 * ((i + 1) / len(audio_segments))
-                        progress_callback(
-                            f"Processando áudio {i+1}/{len(audio_segments)}", progress)
-
-                if len(audio_files_to_mix) > 1:
-                    mixed_audio = os.path.join(temp_dir, "mixed_audio.wav")
-
-                    input_args = []
-                    for audio_file in audio_files_to_mix:
-                        input_args.extend(['-i', audio_file])
-
-                    cmd_mix = [
-                        'ffmpeg', '-y'
-                    ] + input_args + [
-                        '-filter_complex', f'amix=inputs={len(audio_files_to_mix)}:duration=longest:dropout_transition=0',
-                        '-c:a', 'pcm_s16le',
-                        mixed_audio
-                    ]
-
-                    result = subprocess.run(
-                        cmd_mix, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        temp_audio = mixed_audio
-            else:
-                cmd_silence = [
-                    'ffmpeg', '-y', '-f', 'lavfi',
-                    '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-                    '-t', str(total_output_duration),
-                    '-c:a', 'pcm_s16le',
-                    temp_audio
-                ]
-                subprocess.run(cmd_silence, capture_output=True, text=True)
-
-            if progress_callback:
-                progress_callback("Combinando vídeo e áudio...", 0.9)
-
-            cmd_final = [
-                'ffmpeg', '-y',
-                '-i', temp_video,
-                '-i', temp_audio,
-                '-c:v', 'copy',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-shortest',
-                output_path
-            ]
-
-            result = subprocess.run(cmd_final, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Erro na combinação final: {result.stderr}")
+            rendered = False
+            if engine == VideoProcessor.ENGINE_FILTERGRAPH:
+                try:
+                    VideoProcessor._render_with_filtergraph(
+                        video_path, output_path, temp_dir, video_segments,
+                        audio_segments, total_output_duration, has_audio,
+                        progress_callback, encoding_profile
+                    )
+                    rendered = True
+                except RuntimeError as e:
+                    print(
+                        f"Filtergraph falhou, usando renderização por segmentos: {str(e)}")
+                    engine = VideoProcessor.ENGINE_SEGMENTS
+
+            if not rendered:
+                VideoProcessor._render_with_segments(
+                    video_path, output_path, temp_dir, video_segments,
+                    audio_segments, total_output_duration, has_audio,
+                    progress_callback, max_parallel_segments, encoding_profile
+                )
 
             if not os.path.exists(output_path):
                 raise RuntimeError("Arquivo final não foi criado")
@@ -334,7 +150,9 @@ class VideoProcessor:
                     "final_duration": total_output_duration,
                     "cycles_processed": num_cycles,
                     "video_segments": len(video_segments),
-                    "audio_segments": len(audio_segments)
+                    "audio_segments": len(audio_segments),
+                    "engine": engine,
+                    "encoding_profile": encoding_profile
                 }
             }
 
@@ -349,9 +167,507 @@ class VideoProcessor:
             }
 
         finally:
-            # Limpeza do diretório temporário
-            if temp_dir and os.path.exists(temp_dir):
+            # Remove o diretório de trabalho e libera a reserva de scratch
+            stack.close()
+
+    @staticmethod
+    def _plan_segments(duration: float) -> Tuple[int, List[dict], List[dict], float]:
+        """
+        Planeja os segmentos acelerados/normais do vídeo cíclico.
+
+        Returns:
+            (num_cycles, video_segments, audio_segments, total_output_duration)
+        """
+        FAST_DURATION = VideoProcessor.FAST_DURATION
+        FAST_SPEED = VideoProcessor.FAST_SPEED
+        CYCLE_DURATION = VideoProcessor.CYCLE_DURATION
+
+        num_cycles = max(1, int(duration // CYCLE_DURATION))
+        total_output_duration = 0
+
+        video_segments = []
+        audio_segments = []
+
+        for cycle in range(num_cycles):
+            cycle_start = cycle * CYCLE_DURATION
+
+            fast_start = cycle_start
+            fast_end = min(cycle_start + FAST_DURATION, duration)
+            fast_duration = fast_end - fast_start
+
+            if fast_duration > 0.5:
+                output_fast_duration = fast_duration / FAST_SPEED
+                video_segments.append({
+                    'input_start': fast_start,
+                    'input_duration': fast_duration,
+                    'output_start': total_output_duration,
+                    'output_duration': output_fast_duration,
+                    'speed': FAST_SPEED,
+                    'type': 'fast'
+                })
+                total_output_duration += output_fast_duration
+
+            normal_start = cycle_start + FAST_DURATION
+            normal_end = min(cycle_start + CYCLE_DURATION, duration)
+            normal_duration = normal_end - normal_start
+
+            if normal_duration > 0.5:
+                video_segments.append({
+                    'input_start': normal_start,
+                    'input_duration': normal_duration,
+                    'output_start': total_output_duration,
+                    'output_duration': normal_duration,
+                    'speed': 1.0,
+                    'type': 'normal'
+                })
+
+                audio_segments.append({
+                    'input_start': normal_start,
+                    'input_duration': normal_duration,
+                    'output_start': total_output_duration,
+                    'output_duration': normal_duration
+                })
+
+                total_output_duration += normal_duration
+
+        return num_cycles, video_segments, audio_segments, total_output_duration
+
+    @staticmethod
+    def _legacy_mix_gains(audio_segments: List[dict], total_output_duration: float) -> List[float]:
+        """
+        Ganho que a antiga mixagem (amix de uma base silenciosa + um WAV por
+        trecho) aplicava a cada trecho de áudio.
+
+        O amix divide a soma pelo número de entradas ainda ativas. Como cada WAV
+        posicionado terminava no fim do seu trecho, o ganho crescia ao longo do
+        vídeo. A linha do tempo aplica o mesmo ganho para manter o áudio idêntico.
+        """
+        ends = [
+            total_output_duration if segment['output_start'] <= 0
+            else segment['output_start'] + segment['output_duration']
+            for segment in audio_segments
+        ]
+        return [
+            1.0 / (1 + sum(1 for end in ends if end > segment['output_start']))
+            for segment in audio_segments
+        ]
+
+    @staticmethod
+    def _segment_input_args(video_path: str, segment: dict) -> List[str]:
+        """
+        Argumentos de entrada do ffmpeg para um trecho do vídeo de origem.
+
+        Cada trecho vira uma entrada com -ss/-t, de forma que o ffmpeg só
+        decodifica o intervalo do trecho (busca rápida + descarte preciso).
+        Usado pelo motor de segmentos (um processo por trecho de vídeo) e, nos
+        dois motores, pelas entradas -vn da linha do tempo de áudio, de
+        decodificação barata.
+        """
+        return [
+            '-ss', str(segment['input_start']),
+            '-t', str(segment['input_duration']),
+            '-i', video_path
+        ]
+
+    @staticmethod
+    def _build_audio_timeline_filter(
+        audio_segments: List[dict],
+        slice_labels: List[str],
+        total_output_duration: float,
+        output_label: str
+    ) -> List[str]:
+        """
+        Monta a linha do tempo de áudio: cada trecho é posicionado no seu
+        output_start concatenando-o com intervalos de silêncio, de forma que o
+        custo cresce linearmente com a duração da saída.
+
+        Args:
+            audio_segments: Trechos de áudio planejados
+            slice_labels: Rótulo da entrada de áudio de cada trecho (ex.: '[3:a]').
+                Lista vazia (vídeo sem áudio) gera uma linha do tempo silenciosa.
+            total_output_duration: Duração total da saída em segundos
+            output_label: Rótulo de saída do grafo
+        """
+        rate = VideoProcessor.AUDIO_SAMPLE_RATE
+        silence = f"anullsrc=channel_layout=stereo:sample_rate={rate}"
+        audio_format = f"aresample={rate},aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+        segments = audio_segments if slice_labels else []
+        total_samples = int(round(total_output_duration * rate))
+        gains = VideoProcessor._legacy_mix_gains(
+            segments, total_output_duration)
+
+        filters = []
+        parts = []
+
+        cursor = 0
+        for i, segment in enumerate(segments):
+            start_sample = int(round(segment['output_start'] * rate))
+            if start_sample > cursor:
+                filters.append(
+                    f"{silence},atrim=end_sample={start_sample - cursor}[gap{i}]")
+                parts.append(f"[gap{i}]")
+
+            end_sample = min(
+                total_samples, start_sample + int(round(segment['output_duration'] * rate)))
+            filters.append(
+                f"{slice_labels[i]}{audio_format},volume={gains[i]:.10f},"
+                f"apad,atrim=end_sample={end_sample - start_sample}[aslice{i}]"
+            )
+            parts.append(f"[aslice{i}]")
+            cursor = end_sample
+
+        if total_samples > cursor or not parts:
+            filters.append(
+                f"{silence},atrim=end_sample={max(1, total_samples - cursor)}[gapend]")
+            parts.append("[gapend]")
+
+        filters.append(
+            f"{''.join(parts)}concat=n={len(parts)}:v=0:a=1{output_label}")
+        return filters
+
+    @staticmethod
+    def _render_audio_timeline(
+        video_path: str,
+        output_audio: str,
+        temp_dir: str,
+        audio_segments: List[dict],
+        total_output_duration: float,
+        has_audio: bool
+    ) -> None:
+        """
+        Gera o WAV final da linha do tempo em um único ffmpeg: os trechos são
+        posicionados no seu output_start com intervalos de silêncio entre eles,
+        então disco e processamento crescem só com a duração da saída.
+        """
+        input_args = []
+        slice_labels = []
+        if has_audio:
+            for i, segment in enumerate(audio_segments):
+                input_args.extend(
+                    ['-vn'] + VideoProcessor._segment_input_args(video_path, segment))
+                slice_labels.append(f"[{i}:a]")
+
+        filters = VideoProcessor._build_audio_timeline_filter(
+            audio_segments,
+            slice_labels,
+            total_output_duration,
+            "[aout]"
+        )
+
+        graph_file = os.path.join(temp_dir, "audio_timeline.txt")
+        with open(graph_file, 'w', encoding='utf-8') as f:
+            f.write(";\n".join(filters))
+
+        cmd = [
+            'ffmpeg', '-y'
+        ] + input_args + [
+            '-filter_complex_script', graph_file,
+            '-map', '[aout]',
+            '-c:a', 'pcm_s16le',
+            output_audio
+        ]
+
+        result = run_ffmpeg(cmd, check=False, cores=1, service="cyclic", step="audio")
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Erro ao montar linha do tempo de áudio: {result.stderr[-2000:]}")
+
+    @staticmethod
+    def _render_with_filtergraph(
+        video_path: str,
+        output_path: str,
+        temp_dir: str,
+        video_segments: List[dict],
+        audio_segments: List[dict],
+        total_output_duration: float,
+        has_audio: bool,
+        progress_callback: Optional[Callable[[str, float], None]] = None,
+        encoding_profile: str = "fast"
+    ) -> None:
+        """
+        Renderiza o vídeo cíclico inteiro em um único processo ffmpeg: o vídeo
+        vem de uma única entrada, decodificada uma vez, e um setpts por partes
+        (periódico no ciclo) acelera os trechos rápidos; cada trecho de áudio
+        vem de uma entrada -vn com busca própria, como em
+        _render_audio_timeline. Memória e custo não crescem com segmentos ×
+        duração da origem.
+        """
+        if not video_segments:
+            raise RuntimeError("Nenhum segmento de vídeo planejado")
+
+        pts_expr = VideoProcessor._cyclic_pts_expression(video_segments)
+        last = video_segments[-1]
+        end = last['input_start'] + last['input_duration']
+
+        input_args = ['-i', video_path]
+        filters = [
+            f"[0:v]trim=end={end:.6f},setpts=PTS-STARTPTS,setpts='{pts_expr}'[vout]"
+        ]
+
+        # Cada trecho de áudio vem de uma entrada -vn própria com busca: só o
+        # intervalo do trecho é decodificado, e o custo fica linear na saída
+        slice_labels = []
+        if has_audio:
+            for i, segment in enumerate(audio_segments):
+                input_args.extend(
+                    ['-vn'] + VideoProcessor._segment_input_args(video_path, segment))
+                slice_labels.append(f"[{i + 1}:a]")
+
+        filters.extend(VideoProcessor._build_audio_timeline_filter(
+            audio_segments,
+            slice_labels,
+            total_output_duration,
+            "[aout]"
+        ))
+
+        # O grafo cresce com a duração do vídeo; um arquivo evita limites de linha de comando
+        graph_file = os.path.join(temp_dir, "cyclic_filtergraph.txt")
+        with open(graph_file, 'w', encoding='utf-8') as f:
+            f.write(";\n".join(filters))
+
+        if progress_callback:
+            progress_callback(
+                f"Renderizando {len(video_segments)} segmentos em um único processo...", 0.2)
+
+        cmd = [
+            'ffmpeg', '-y'
+        ] + input_args + [
+            '-filter_complex_script', graph_file,
+            '-map', '[vout]', '-map', '[aout]',
+        ] + encoding_profiles.video_args(encoding_profile, pix_fmt=None) + \
+            encoding_profiles.audio_args(encoding_profile) + [
+            '-shortest',
+            output_path
+        ]
+
+        result = run_ffmpeg(
+            cmd,
+            duration=total_output_duration,
+            progress_callback=progress_callback,
+            stage="Renderizando vídeo cíclico",
+            start=0.2,
+            end=0.9,
+            check=False,
+            cores=encoding_profiles.profile_cores(encoding_profile),
+            service="cyclic",
+            step="encode"
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Erro na renderização por filtergraph: {result.stderr[-2000:]}")
+
+        if progress_callback:
+            progress_callback("Combinando vídeo e áudio...", 0.9)
+
+    @staticmethod
+    def _cyclic_pts_expression(video_segments: List[dict]) -> str:
+        """
+        Expressão do setpts que leva o tempo da origem ao tempo da saída.
+
+        Em cada ciclo, os FAST_DURATION segundos iniciais andam FAST_SPEED
+        vezes mais rápido e o resto em velocidade normal. Assim o mapeamento
+        é periódico e a expressão tem tamanho fixo, qualquer que seja a
+        duração. Se o plano não seguir esse padrão, lança RuntimeError e a
+        engine por segmentos é usada.
+        """
+        fast = VideoProcessor.FAST_DURATION
+        speed = VideoProcessor.FAST_SPEED
+        cycle = VideoProcessor.CYCLE_DURATION
+        period = fast / speed + (cycle - fast)
+
+        def output_time(t: float) -> float:
+            cycles, offset = divmod(t, cycle)
+            local = offset / speed if offset < fast else fast / speed + offset - fast
+            return cycles * period + local
+
+        cursor = 0.0
+        for segment in video_segments:
+            expected_speed = speed if segment['input_start'] % cycle < fast else 1.0
+            if (abs(segment['input_start'] - cursor) > 1e-6
+                    or abs(segment['output_start'] - output_time(segment['input_start'])) > 1e-6
+                    or segment['speed'] != expected_speed):
+                raise RuntimeError("Plano de segmentos não é periódico")
+            cursor = segment['input_start'] + segment['input_duration']
+
+        offset = f"(T-floor(T/{cycle})*{cycle})"
+        return (
+            f"(floor(T/{cycle})*{period}"
+            f"+if(lt({offset},{fast}),{offset}/{speed},{fast / speed}+{offset}-{fast}))/TB"
+        )
+
+    @staticmethod
+    def _segment_parallelism(max_parallel_segments: Optional[int] = None) -> int:
+        """Grau de paralelismo dos segmentos: parâmetro > CYCLIC_SEGMENT_WORKERS > núcleos do cpu_scheduler."""
+        if max_parallel_segments is None:
+            max_parallel_segments = int(os.getenv(
+                "CYCLIC_SEGMENT_WORKERS", cpu_scheduler.total_cores))
+        return max(1, min(max_parallel_segments, cpu_scheduler.total_cores))
+
+    @staticmethod
+    def _render_video_segment(video_path: str, segment: dict, segment_file: str, threads: int, encoding_profile: str = "fast") -> Optional[str]:
+        """Codifica um segmento de vídeo. Retorna o caminho do arquivo ou None em caso de erro."""
+        video_args = encoding_profiles.video_args(encoding_profile, pix_fmt=None)
+        if segment['type'] == 'fast':
+            cmd_segment = [
+                'ffmpeg', '-y',
+                '-ss', str(segment['input_start']),
+                '-t', str(segment['input_duration']),
+                '-i', video_path,
+                '-vf', f'setpts=PTS/{segment["speed"]}',
+                '-an',
+            ] + video_args + [
+                segment_file
+            ]
+        else:
+            cmd_segment = [
+                'ffmpeg', '-y',
+                '-ss', str(segment['input_start']),
+                '-t', str(segment['input_duration']),
+                '-i', video_path,
+            ] + video_args + [
+                '-an',
+                segment_file
+            ]
+
+        # O orçamento de núcleos define -threads/-filter_threads e limita a concorrência global
+        result = run_ffmpeg(
+            cmd_segment, check=False, cores=threads, service="cyclic", step="segment")
+        if result.returncode != 0:
+            print(f"Erro no segmento {segment_file}: {result.stderr}")
+            return None
+
+        return segment_file if os.path.exists(segment_file) else None
+
+    @staticmethod
+    def _render_video_segments(
+        video_path: str,
+        temp_dir: str,
+        video_segments: List[dict],
+        max_parallel_segments: Optional[int] = None,
+        progress_callback: Optional[Callable[[str, float], None]] = None,
+        encoding_profile: str = "fast"
+    ) -> List[str]:
+        """
+        Codifica os segmentos em paralelo no executor do cpu_scheduler, com no máximo
+        `max_parallel_segments` em andamento. Os arquivos são devolvidos na ordem
+        do plano para o concat; o progresso é reportado a cada segmento concluído.
+        """
+        parallelism = VideoProcessor._segment_parallelism(max_parallel_segments)
+        # Divide os núcleos entre os encodes simultâneos em vez de cada um usar todos
+        threads = max(1, cpu_scheduler.total_cores // parallelism)
+
+        total = len(video_segments)
+        results: List[Optional[str]] = [None] * total
+        pending = {}
+        next_index = 0
+        completed = 0
+
+        def submit_next():
+            nonlocal next_index
+            segment_file = os.path.join(
+                temp_dir, f"segment_{next_index:03d}.mp4")
+            future = cpu_scheduler.submit(
+                VideoProcessor._render_video_segment,
+                video_path, video_segments[next_index], segment_file, threads, encoding_profile)
+            pending[future] = next_index
+            next_index += 1
+
+        while next_index < total and len(pending) < parallelism:
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
                 try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                except Exception:
-                    pass
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"Erro no segmento {index}: {str(e)}")
+                completed += 1
+
+                if progress_callback:
+                    progress = 0.15 + 0.4 * (completed / total)
+                    progress_callback(
+                        f"Segmentos concluídos: {completed}/{total}", progress)
+
+                if next_index < total:
+                    submit_next()
+
+        return [segment_file for segment_file in results if segment_file]
+
+    @staticmethod
+    def _render_with_segments(
+        video_path: str,
+        output_path: str,
+        temp_dir: str,
+        video_segments: List[dict],
+        audio_segments: List[dict],
+        total_output_duration: float,
+        has_audio: bool,
+        progress_callback: Optional[Callable[[str, float], None]] = None,
+        max_parallel_segments: Optional[int] = None,
+        encoding_profile: str = "fast"
+    ) -> None:
+        """
+        Caminho por múltiplos processos: um ffmpeg por segmento de vídeo, concat,
+        linha do tempo de áudio em um único ffmpeg e mux final.
+        """
+        segment_files = VideoProcessor._render_video_segments(
+            video_path, temp_dir, video_segments, max_parallel_segments, progress_callback,
+            encoding_profile)
+
+        if not segment_files:
+            raise RuntimeError(
+                "Nenhum segmento de vídeo foi criado com sucesso")
+
+        temp_video = os.path.join(temp_dir, "concatenated_video.mp4")
+        concat_file = os.path.join(temp_dir, 'video_concat.txt')
+
+        with open(concat_file, 'w', encoding='utf-8') as f:
+            for segment_file in segment_files:
+                abs_path = os.path.abspath(segment_file).replace('\\', '/')
+                f.write(f"file '{abs_path}'\n")
+
+        cmd_concat = [
+            'ffmpeg', '-y', '-f', 'concat', '-safe', '0',
+            '-i', concat_file,
+            '-c', 'copy',
+            temp_video
+        ]
+
+        with track_ffmpeg("cyclic", "concat") as run:
+            result = subprocess.run(cmd_concat, capture_output=True, text=True)
+            run.ok = result.returncode == 0
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Erro na concatenação de vídeo: {result.stderr}")
+
+        if progress_callback:
+            progress_callback("Processando áudio...", 0.6)
+
+        temp_audio = os.path.join(temp_dir, "final_audio.wav")
+        VideoProcessor._render_audio_timeline(
+            video_path, temp_audio, temp_dir, audio_segments,
+            total_output_duration, has_audio
+        )
+
+        if progress_callback:
+            progress_callback("Combinando vídeo e áudio...", 0.9)
+
+        cmd_final = [
+            'ffmpeg', '-y',
+            '-i', temp_video,
+            '-i', temp_audio,
+            '-c:v', 'copy',
+        ] + encoding_profiles.audio_args(encoding_profile) + [
+            '-shortest',
+            output_path
+        ]
+
+        with track_ffmpeg("cyclic", "mux") as run:
+            result = subprocess.run(cmd_final, capture_output=True, text=True)
+            run.ok = result.returncode == 0
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Erro na combinação final: {result.stderr}")
@@ -1,29 +1,60 @@
 import os
-import tempfile
-import subprocess
 import shutil
+from contextlib import ExitStack
+from typing import Optional
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import ProgressCallback, run_ffmpeg
+from app.core.workspace import WorkspaceManager, workspace_manager
+from app.services.overlay_asset_cache import OverlayAssetCache
+from app.services.probe_service import ProbeService
 
 
 class WatermarkService:
+    # Incrementar quando a saída mudar para os mesmos parâmetros (invalida o ResultCache)
+    CACHE_VERSION = 1
+
+    @staticmethod
+    def cache_params(opacity: float, scale: float, encoding_profile: str) -> dict:
+        """Parâmetros que determinam a saída, normalizados como entram no filtro (1 casa decimal)"""
+        return {
+            "opacity": float(f"{opacity:.1f}"),
+            "scale": float(f"{scale:.1f}"),
+            "encoding_profile": encoding_profile,
+        }
+
+    @staticmethod
+    def watermark_filters(opacity: float, scale: float) -> str:
+        """Cadeia que aplica a opacidade e redimensiona a marca d'água (pré-processada pelo OverlayAssetCache)"""
+        return (
+            'format=rgba,colorchannelmixer=aa={:.1f},'.format(opacity) +
+            'scale=iw*{:.1f}:ih*{:.1f}'.format(scale, scale)
+        )
+
     @staticmethod
     def add_watermark(
         video_path: str,
         watermark_path: str,
         output_path: str = None,
         opacity: float = 0.5,
-        scale: float = 0.5
+        scale: float = 0.5,
+        progress_callback: Optional[ProgressCallback] = None,
+        encoding_profile: str = "standard"
     ) -> str:
         """
         Adiciona marca d'água ao vídeo usando apenas FFmpeg (mais rápido e confiável)
         Se output_path for None ou igual ao video_path, usa um arquivo temporário e depois substitui o original.
+        O andamento da codificação é repassado a progress_callback (mensagem, progresso, **stats).
+        encoding_profile escolhe preset/CRF/GOP no registro de perfis (draft, fast, standard, archive).
         """
-        temp_dir = None
+        stack = ExitStack()
 
         try:
             same_file = False
             if output_path is None or output_path == video_path:
                 same_file = True
-                temp_dir = tempfile.mkdtemp()
+                # A saída temporária tem o tamanho de um novo encode do vídeo
+                temp_dir = stack.enter_context(workspace_manager.workspace(
+                    "watermark", WorkspaceManager.estimate(video_path)))
                 temp_filename = os.path.basename(video_path)
                 final_output = os.path.join(temp_dir, temp_filename)
                 actual_output_path = video_path
@@ -34,47 +65,37 @@ class WatermarkService:
             os.makedirs(os.path.dirname(final_output), exist_ok=True)
 
             # Obter informações do vídeo original para preservar características
-            probe_cmd = [
-                'ffprobe',
-                '-v', 'error',
-                '-select_streams', 'v:0',
-                '-show_entries', 'stream=width,height,r_frame_rate',
-                '-of', 'csv=p=0',
-                video_path
-            ]
-
             try:
-                probe_result = subprocess.check_output(
-                    probe_cmd, universal_newlines=True).strip().split(',')
-                width, height, framerate = probe_result
+                video_stream = ProbeService.get_stream(video_path, 'video')
+                width, height, framerate = (
+                    video_stream['width'], video_stream['height'], video_stream['r_frame_rate'])
+                duration = ProbeService.get_duration(video_path)
                 print(f"Vídeo original: {width}x{height} a {framerate}fps")
             except Exception as e:
                 print(
                     f"Aviso: Não foi possível obter informações do vídeo: {e}")
-                width, height, framerate = None, None, None
+                width, height, framerate, duration = None, None, None, None
+
+            # Transparência e escala aplicadas uma vez por (logo, opacidade, escala)
+            # e reaproveitadas do cache nas próximas requisições
+            watermark_asset = stack.enter_context(OverlayAssetCache.use(
+                watermark_path, WatermarkService.watermark_filters(opacity, scale)))
 
             cmd = [
                 'ffmpeg',
                 '-y',  # Sobrescrever arquivo de saída se existir
                 '-i', video_path,  # Vídeo original
-                '-i', watermark_path,  # Imagem da marca d'água
+                '-i', watermark_asset,  # Marca d'água pré-processada (RGBA)
                 '-filter_complex',
-                # Aplicar transparência à marca d'água
-                '[1:v]format=rgba,colorchannelmixer=aa={:.1f}[watermark];'.format(opacity) +
-                # Redimensionar marca d'água
-                '[watermark]scale=iw*{:.1f}:ih*{:.1f}[watermarkscaled];'.format(scale, scale) +
                 # Centralizar
-                '[0:v][watermarkscaled]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:format=auto[outv]',
+                '[0:v][1:v]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:format=auto[outv]',
                 '-map', '[outv]',  # Usar o vídeo processado
                 '-map', '0:a?',  # Manter áudio original se existir
-                '-c:v', 'libx264',  # Codec de vídeo
-                '-crf', '23',  # Qualidade de vídeo (menor = melhor qualidade)
-                '-preset', 'medium',  # Balancear velocidade e qualidade
-                '-c:a', 'aac',  # Converter áudio para AAC para melhor compatibilidade
-                '-b:a', '192k',  # Bitrate de áudio
-                '-pix_fmt', 'yuv420p',  # Formato de pixel para máxima compatibilidade
-                '-movflags', '+faststart',
             ]
+            # libx264 + AAC conforme o perfil, yuv420p para máxima compatibilidade
+            cmd.extend(encoding_profiles.video_args(encoding_profile))
+            cmd.extend(encoding_profiles.audio_args(encoding_profile))
+            cmd.extend(['-movflags', '+faststart'])
 
             if framerate:
                 cmd.extend(['-r', framerate])
@@ -83,23 +104,21 @@ class WatermarkService:
 
             print(f"Executando comando FFmpeg: {' '.join(cmd)}")
 
-            process = subprocess.Popen(
+            result = run_ffmpeg(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1
+                duration=duration,
+                progress_callback=progress_callback,
+                stage="Aplicando marca d'água",
+                end=0.95,
+                check=False,
+                cores=encoding_profiles.profile_cores(encoding_profile),
+                service="watermark",
+                step="encode"
             )
-
-            stderr_output = []
-            for line in process.stderr:
-                print(f"FFmpeg: {line.strip()}")
-                stderr_output.append(line)
-
-            return_code = process.wait()
+            return_code = result.returncode
 
             if return_code != 0:
-                error_msg = ''.join(stderr_output)
+                error_msg = result.stderr
                 print(f"Erro FFmpeg (código {return_code}): {error_msg}")
                 raise RuntimeError(
                     f"FFmpeg falhou com código {return_code}: {error_msg}")
@@ -117,16 +136,8 @@ class WatermarkService:
                 print(f"Arquivo original substituído com sucesso")
 
             try:
-                check_cmd = [
-                    'ffprobe',
-                    '-v', 'error',
-                    '-select_streams', 'v:0',
-                    '-show_entries', 'stream=codec_name',
-                    '-of', 'csv=p=0',
-                    actual_output_path
-                ]
-                codec_info = subprocess.check_output(
-                    check_cmd, universal_newlines=True).strip()
+                codec_info = ProbeService.get_stream(
+                    actual_output_path, 'video')['codec_name']
                 print(f"Vídeo processado com sucesso. Codec: {codec_info}")
             except Exception as e:
                 print(f"Aviso: Não foi possível verificar o vídeo final: {e}")
@@ -138,5 +149,4 @@ class WatermarkService:
         except Exception as e:
             raise RuntimeError(f"Erro ao processar vídeo: {str(e)}")
         finally:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            stack.close()
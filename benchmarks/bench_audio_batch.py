@@ -0,0 +1,86 @@
+"""
+Compara N mixagens individuais com a mixagem em lote da mesma trilha.
+
+As chamadas individuais usam AudioService.mix_audio_with_video (cada uma
+decodifica e reamostra o MP3 de novo); o lote usa AudioService.mix_audio_batch,
+que decodifica a trilha uma vez e mixa os vídeos em paralelo. Mostra o tempo
+medido dos dois lados e a economia estimada que o próprio lote reporta.
+
+Uso:
+    python -m benchmarks.bench_audio_batch --videos 20 --duration 120
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from app.services.audio_service import AudioService
+from benchmarks.media import generate_test_audio, generate_test_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=10, help="Quantidade de vídeos no lote")
+    parser.add_argument("--duration", type=float, default=60, help="Duração (s) de cada vídeo")
+    parser.add_argument("--size", default="640x360")
+    parser.add_argument("--reduce-original-volume", action="store_true")
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    video = generate_test_video(
+        os.path.join(args.media_dir, f"audio_{args.size}_{int(args.duration)}s.mp4"),
+        args.duration, size=args.size)
+    music = generate_test_audio(
+        os.path.join(args.media_dir, f"music_{int(args.duration)}s.mp3"), args.duration + 30)
+
+    with tempfile.TemporaryDirectory(prefix="bench_audio_batch_") as work_dir:
+        individual_paths = []
+        for i in range(args.videos):
+            path = os.path.join(work_dir, f"individual_{i}.mp4")
+            shutil.copy(video, path)
+            individual_paths.append(path)
+
+        started = time.perf_counter()
+        for path in individual_paths:
+            AudioService.mix_audio_with_video(
+                path, music, replace_original=True,
+                reduce_original_volume=args.reduce_original_volume)
+        individual_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = AudioService.mix_audio_batch(
+            music,
+            [{"video_path": video, "output_path": os.path.join(work_dir, f"batch_{i}.mp4")}
+             for i in range(args.videos)],
+            reduce_original_volume=args.reduce_original_volume)
+        batch_seconds = time.perf_counter() - started
+
+    failed = [item for item in batch["results"] if not item["success"]]
+    results = {
+        "videos": args.videos,
+        "duration": args.duration,
+        "individual_seconds": round(individual_seconds, 3),
+        "batch_seconds": round(batch_seconds, 3),
+        "speedup": round(individual_seconds / batch_seconds, 2) if batch_seconds else None,
+        "decode_seconds": batch["decode_seconds"],
+        "estimated_individual_seconds": batch["estimated_individual_seconds"],
+        "reported_time_saved_seconds": batch["time_saved_seconds"],
+        "failed": len(failed),
+    }
+    print(f"{args.videos} vídeos de {args.duration:.0f}s")
+    print(f"  individual {individual_seconds:>8.2f}s")
+    print(f"  lote       {batch_seconds:>8.2f}s  ({results['speedup']}x, trilha decodificada em "
+          f"{batch['decode_seconds']:.2f}s)")
+    print(f"  economia reportada pelo lote: {batch['time_saved_seconds']:.2f}s "
+          f"(estimativa individual {batch['estimated_individual_seconds']:.2f}s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
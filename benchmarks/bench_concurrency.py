@@ -0,0 +1,137 @@
+"""
+Verifica que os endpoints async não bloqueiam o event loop.
+
+Sobe a API com uvicorn, dispara N requisições de marca d'água em paralelo e,
+durante o processamento, mede a latência de /health. Com o loop livre, o
+tempo total fica próximo ao da requisição mais longa (e não da soma) e
+/health continua respondendo em milissegundos.
+
+Sai com código 1 se wall_over_longest passar de --max-wall-ratio ou a maior
+latência de /health passar de --max-health-ms, para ser usado como teste.
+
+Uso:
+    python -m benchmarks.bench_concurrency --requests 4 --duration 20
+    python -m benchmarks.bench_concurrency --max-wall-ratio 1.3 --max-health-ms 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.media import generate_test_image, generate_test_video
+
+
+def post_json(url: str, payload: dict, timeout: float = 3600) -> dict:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/health", timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("API não respondeu a tempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20, help="Duração (s) do vídeo sintético")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--max-wall-ratio", type=float, default=1.5,
+                        help="Limite de wall_over_longest (loop bloqueado fica perto de --requests)")
+    parser.add_argument("--max-health-ms", type=float, default=1000,
+                        help="Limite da maior latência de /health durante o processamento")
+    args = parser.parse_args()
+
+    video = generate_test_video(
+        os.path.join(args.media_dir, f"concurrency_{args.size}_{int(args.duration)}s.mp4"),
+        args.duration, size=args.size)
+    watermark = generate_test_image(os.path.join(args.media_dir, "watermark.png"), size="400x100")
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"])
+
+    try:
+        wait_until_ready(base_url)
+        output_dir = tempfile.mkdtemp(prefix="bench_concurrency_")
+        durations = [0.0] * args.requests
+        health_latencies = []
+        done = threading.Event()
+
+        def worker(index):
+            started = time.perf_counter()
+            post_json(f"{base_url}/api/v1/watermark/api/process/add-watermark", {
+                "video_path": video,
+                "watermark_path": watermark,
+                "output_path": os.path.join(output_dir, f"out_{index}.mp4"),
+            })
+            durations[index] = time.perf_counter() - started
+
+        def probe_health():
+            while not done.is_set():
+                started = time.perf_counter()
+                urllib.request.urlopen(f"{base_url}/health", timeout=60).read()
+                health_latencies.append(time.perf_counter() - started)
+                time.sleep(0.2)
+
+        health_thread = threading.Thread(target=probe_health)
+        health_thread.start()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        done.set()
+        health_thread.join()
+
+        result = {
+            "requests": args.requests,
+            "wall_seconds": round(wall, 2),
+            "longest_seconds": round(max(durations), 2),
+            "sum_seconds": round(sum(durations), 2),
+            "wall_over_longest": round(wall / max(durations), 2),
+            "health_max_latency_ms": round(max(health_latencies) * 1000, 1) if health_latencies else None,
+            "cpu_count": os.cpu_count(),
+        }
+        print(json.dumps(result, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+    failures = []
+    if result["wall_over_longest"] > args.max_wall_ratio:
+        failures.append(
+            f"wall_over_longest {result['wall_over_longest']} > {args.max_wall_ratio}: "
+            "as requisições foram atendidas em série")
+    if result["health_max_latency_ms"] is not None and result["health_max_latency_ms"] > args.max_health_ms:
+        failures.append(
+            f"health_max_latency_ms {result['health_max_latency_ms']} > {args.max_health_ms}: "
+            "o event loop ficou bloqueado")
+    for failure in failures:
+        print(f"FALHA: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compara os modos de CutService.cut_video (copy, smart, reencode) em uma entrada sintética.
+
+Para cada modo mede o tempo e confere a precisão do corte: quantidade de
+quadros da saída contra a quantidade de quadros da origem no intervalo.
+A contagem esperada vem de todos os pacotes da origem, sem -read_intervals.
+A entrada tem B-frames por padrão (--bframes), para que o smart cut seja
+conferido com ordem de decodificação diferente da de apresentação. No modo
+copy o início encaixa no keyframe anterior, então sobram quadros.
+
+Uso:
+    python -m benchmarks.bench_cut_modes --duration 1800 --start 600.4 --length 120
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from app.services.cut_service import CutService
+from app.services.probe_service import ProbeService
+from benchmarks.media import generate_test_video
+
+
+def count_video_frames(path: str) -> int:
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets",
+        "-show_entries", "stream=nb_read_packets", "-of", "csv=p=0", path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().rstrip(","))
+
+
+def count_source_frames(path: str, start: float, end: float) -> int:
+    """Quadros da origem com pts em [start, end), lendo o arquivo inteiro"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time", "-of", "csv=p=0", path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    frames = 0
+    for line in result.stdout.splitlines():
+        pts_time = line.strip().rstrip(",")
+        if pts_time not in ("", "N/A") and start <= float(pts_time) < end:
+            frames += 1
+    return frames
+
+
+def run_mode(video_path: str, output_dir: str, mode: str, start: float, end: float) -> dict:
+    output_path = os.path.join(output_dir, f"cut_{mode}.mp4")
+    started = time.perf_counter()
+    CutService.cut_video(video_path, output_path, str(start), str(end), mode=mode)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "frames": count_video_frames(output_path),
+        "output_bytes": os.path.getsize(output_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=1800, help="Duração (s) da entrada sintética")
+    parser.add_argument("--start", type=float, default=600.4)
+    parser.add_argument("--length", type=float, default=120)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--bframes", type=int, default=3, help="B-frames da entrada (0 desliga)")
+    parser.add_argument("--modes", nargs="+", default=list(CutService.MODES), choices=CutService.MODES)
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    video_path = generate_test_video(
+        os.path.join(args.media_dir, f"cut_{args.size}_{int(args.duration)}s_bf{args.bframes}.mp4"),
+        args.duration, size=args.size, fps=args.fps, bframes=args.bframes)
+
+    start, end = args.start, args.start + args.length
+    expected = count_source_frames(video_path, start, end)
+    planned = sum(
+        part["frames"] for part in CutService.plan_smart_cut(
+            ProbeService.get_video_packets(video_path, start, end), start, end))
+    if planned != expected:
+        print(f"AVISO: o smart cut planejou {planned} quadros, a origem tem {expected}")
+    print(f"Quadros esperados em [{start}, {end}): {expected}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_cut_") as output_dir:
+        for mode in args.modes:
+            entry = run_mode(video_path, output_dir, mode, start, end)
+            entry["expected_frames"] = expected
+            entry["frame_accurate"] = entry["frames"] == expected
+            results.append(entry)
+            accuracy = "exato" if entry["frame_accurate"] else f"{entry['frames'] - expected:+d}"
+            print(f"{mode:<9} {entry['seconds']:>8.2f}s  quadros {entry['frames']:>6} ({accuracy})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compara as engines de VideoProcessor.create_cyclic_video em entradas sintéticas.
+
+Uso:
+    python -m benchmarks.bench_cyclic_engines --durations 300 1800 3600 --size 1280x720
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.services.video_processing_service import VideoProcessor
+from benchmarks.media import generate_test_video
+
+
+def run_engine(video_path: str, output_dir: str, engine: str) -> dict:
+    output_path = os.path.join(output_dir, f"cyclic_{engine}.mp4")
+    start = time.perf_counter()
+    result = VideoProcessor.create_cyclic_video(
+        video_path, output_path, engine=engine)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "success": result["success"],
+        "seconds": round(elapsed, 3),
+        "output_bytes": os.path.getsize(output_path) if result["success"] else 0,
+        "stats": result.get("stats"),
+        "message": result["message"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--durations", type=float, nargs="+", default=[300, 1800],
+                        help="Durações (s) das entradas sintéticas")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    results = []
+    for duration in args.durations:
+        video_path = generate_test_video(
+            os.path.join(args.media_dir, f"cyclic_{args.size}_{int(duration)}s.mp4"),
+            duration, size=args.size, fps=args.fps)
+
+        with tempfile.TemporaryDirectory(prefix="bench_cyclic_") as output_dir:
+            for engine in (VideoProcessor.ENGINE_SEGMENTS, VideoProcessor.ENGINE_FILTERGRAPH):
+                entry = run_engine(video_path, output_dir, engine)
+                entry["input_duration"] = duration
+                results.append(entry)
+                print(f"{duration:>7.0f}s  {engine:<12} {entry['seconds']:>9.2f}s  "
+                      f"{'ok' if entry['success'] else 'FALHOU'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compara os perfis de codificação (draft, fast, standard, archive) nos clipes de referência.
+
+Para cada clipe e perfil recodifica o vídeo inteiro com as opções do perfil
+e mede o tempo, a velocidade em relação ao tempo real, o tamanho do arquivo
+e o PSNR médio contra a origem: a troca entre velocidade e tamanho/qualidade.
+
+Sem --inputs, gera um clipe sintético (testsrc2 + seno) como referência.
+
+Uso:
+    python -m benchmarks.bench_encoding_profiles --inputs ref1.mp4 ref2.mp4
+    python -m benchmarks.bench_encoding_profiles --duration 60 --size 1920x1080
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+from app.core import encoding_profiles
+from app.core.ffmpeg_runner import run_ffmpeg
+from app.services.probe_service import ProbeService
+from benchmarks.media import generate_test_video
+
+
+def average_psnr(reference: str, encoded: str) -> float:
+    cmd = [
+        "ffmpeg", "-v", "info", "-nostats", "-i", encoded, "-i", reference,
+        "-lavfi", "[0:v][1:v]psnr", "-f", "null", "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    match = re.search(r"PSNR .*average:(\S+)", result.stderr)
+    if not match or match.group(1) == "inf":
+        return float("inf") if match else float("nan")
+    return float(match.group(1))
+
+
+def run_profile(video_path: str, output_dir: str, profile: str, duration: float) -> dict:
+    output_path = os.path.join(
+        output_dir, f"{os.path.splitext(os.path.basename(video_path))[0]}_{profile}.mp4")
+    cmd = [
+        "ffmpeg", "-y", "-i", video_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        *encoding_profiles.video_args(profile),
+        *encoding_profiles.audio_args(profile),
+        "-movflags", "+faststart",
+        output_path
+    ]
+    started = time.perf_counter()
+    run_ffmpeg(cmd, duration=duration, cores=encoding_profiles.profile_cores(profile))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "input": video_path,
+        "profile": profile,
+        "seconds": round(elapsed, 3),
+        "realtime_factor": round(duration / elapsed, 2) if elapsed else None,
+        "output_bytes": os.path.getsize(output_path),
+        "psnr": round(average_psnr(video_path, output_path), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", nargs="+", help="Clipes de referência (padrão: clipe sintético)")
+    parser.add_argument("--duration", type=float, default=60, help="Duração (s) do clipe sintético")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--profiles", nargs="+", default=list(encoding_profiles.ENCODING_PROFILES),
+                        choices=list(encoding_profiles.ENCODING_PROFILES))
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    inputs = args.inputs or [generate_test_video(
+        os.path.join(args.media_dir, f"profiles_{args.size}_{int(args.duration)}s.mp4"),
+        args.duration, size=args.size, fps=args.fps)]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_profiles_") as output_dir:
+        for video_path in inputs:
+            duration = ProbeService.get_duration(video_path)
+            print(f"{video_path} ({duration:.1f}s)")
+            for profile in args.profiles:
+                entry = run_profile(video_path, output_dir, profile, duration)
+                results.append(entry)
+                print(f"  {profile:<9} {entry['seconds']:>8.2f}s  {entry['realtime_factor']:>6.2f}x  "
+                      f"{entry['output_bytes'] / 1024 / 1024:>8.2f} MB  PSNR {entry['psnr']:.2f} dB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
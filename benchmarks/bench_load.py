@@ -0,0 +1,149 @@
+"""
+Teste de carga com 1, 2, 4... workers uvicorn compartilhando o JOB_STORE_DB.
+
+Para cada quantidade de workers, sobe a API, dispara `--requests`
+requisições de marca d'água com `--concurrency` clientes e, depois de
+cada uma, consulta o job em /api/v1/jobs/{id}. Cada consulta abre uma
+conexão nova e pode cair em qualquer worker: `status_misses` conta os
+jobs que um worker não enxergou (deve ser 0 com o store compartilhado).
+
+O cache de resultados fica desativado e a admissão não limita a fila,
+para que toda requisição rode o ffmpeg. Como o escalonador divide os
+núcleos entre os workers, o ganho vem do trabalho em Python (parsing,
+probe, registro de jobs) rodando em paralelo com os encodes.
+
+Uso:
+    python -m benchmarks.bench_load --workers 1 2 4 --requests 40 --concurrency 8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.media import generate_test_image, generate_test_video
+
+
+def request_json(url: str, payload: dict = None, timeout: float = 600) -> tuple:
+    """(status HTTP, corpo) de um GET ou, com payload, de um POST JSON"""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"},
+        method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def wait_until_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/health/live", timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError("API não respondeu a tempo")
+
+
+def run_load(workers: int, args, video: str, watermark: str) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    db_dir = tempfile.mkdtemp(prefix="bench_load_")
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        JOB_STORE_DB=os.path.join(db_dir, "jobs.sqlite3"),
+        SCRATCH_DIR=os.path.join(db_dir, "scratch"),
+        RESULT_CACHE_DIR="",
+        ADMISSION_MAX_QUEUE=str(args.requests),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL)
+
+    latencies, errors = [], []
+    misses = [0]
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def client():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            status, body = request_json(
+                f"{base_url}/api/v1/watermark/api/process/add-watermark", {
+                    "video_path": video,
+                    "watermark_path": watermark,
+                    "output_path": os.path.join(db_dir, f"out_{index}.mp4"),
+                })
+            elapsed = time.perf_counter() - started
+            job_status, _ = request_json(f"{base_url}/api/v1/jobs/{body.get('job_id')}")
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+                if job_status != 200:
+                    misses[0] += 1
+
+    try:
+        wait_until_ready(base_url)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "requests": args.requests,
+        "completed": len(latencies),
+        "errors": errors,
+        "status_misses": misses[0],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5, help="Duração (s) do vídeo sintético")
+    parser.add_argument("--size", default="640x360")
+    parser.add_argument("--port", type=int, default=8094)
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    args = parser.parse_args()
+
+    video = generate_test_video(
+        os.path.join(args.media_dir, f"load_{args.size}_{int(args.duration)}s.mp4"),
+        args.duration, size=args.size)
+    watermark = generate_test_image(os.path.join(args.media_dir, "watermark.png"), size="400x100")
+
+    results = [run_load(workers, args, video, watermark) for workers in args.workers]
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Tempo de inicialização de um worker (cold start de containers com autoscaling).
+
+Para cada repetição, em processos novos:
+  - importa app.main com `python -X importtime` e soma o tempo de importação,
+    listando os módulos mais caros e se cv2/numpy/ffmpeg foram carregados;
+  - sobe a API com uvicorn e mede o tempo até a primeira resposta de
+    /health/live (time-to-first-response);
+  - com --first-use, mede também a primeira requisição de chroma key, que
+    paga a importação adiada de cv2/numpy.
+
+Uso:
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --repeat 5 --first-use --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.media import generate_test_image
+
+
+HEAVY_MODULES = ("cv2", "numpy", "ffmpeg", "uvicorn")
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure_imports(top: int) -> dict:
+    """Importa app.main em um interpretador novo e agrega a saída de -X importtime"""
+    check = "import sys, app.main; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - started
+
+    modules = []
+    app_cumulative = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        modules.append((name, self_us, cumulative_us, len(indent)))
+        if name == "app.main":
+            app_cumulative = cumulative_us
+
+    # Nível superior (recuo de 1 espaço): a soma é o tempo total de importação
+    total_us = sum(cumulative for _, _, cumulative, depth in modules if depth == 1)
+    heaviest = sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+    return {
+        "process_wall_seconds": round(wall, 4),
+        "import_total_seconds": round(total_us / 1e6, 4),
+        "app_main_seconds": round(app_cumulative / 1e6, 4),
+        "heavy_modules_loaded": [m for m in result.stdout.strip().split(",") if m],
+        "heaviest_self": [{"module": name, "self_ms": round(self_us / 1000, 2)}
+                          for name, self_us, _, _ in heaviest],
+    }
+
+
+def wait_for(url: str, timeout: float) -> float:
+    """Segundos até `url` responder 200"""
+    started = time.perf_counter()
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.01)
+    raise RuntimeError(f"{url} não respondeu em {timeout}s")
+
+
+def measure_first_response(port: int, image: str, first_use: bool) -> dict:
+    """Sobe o uvicorn e mede até a primeira resposta (e a primeira requisição de chroma key)"""
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, RESULT_CACHE_DIR="", PROBE_CACHE_DB="")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env)
+    try:
+        wait_for(f"{base_url}/health/live", timeout=60)
+        result = {"time_to_first_response_seconds": round(time.perf_counter() - started, 4)}
+
+        if first_use:
+            payload = json.dumps({"image_path": image}).encode("utf-8")
+            for label in ("green_screen_first_seconds", "green_screen_warm_seconds"):
+                request = urllib.request.Request(
+                    f"{base_url}/api/v1/green_screen/api/process/remove-green-screen",
+                    data=payload, headers={"Content-Type": "application/json"}, method="POST")
+                request_started = time.perf_counter()
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    response.read()
+                result[label] = round(time.perf_counter() - request_started, 4)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Módulos mais caros listados")
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--first-use", action="store_true",
+                        help="Mede também a primeira requisição de chroma key (importação adiada de cv2/numpy)")
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    image = generate_test_image(os.path.join(args.media_dir, "startup_green.png"), size="640x360", color="green") \
+        if args.first_use else None
+
+    imports, responses = [], []
+    for _ in range(args.repeat):
+        imports.append(measure_imports(args.top))
+        responses.append(measure_first_response(args.port, image, args.first_use))
+
+    def median(rows, key):
+        return round(statistics.median(row[key] for row in rows), 4)
+
+    summary = {
+        "repeat": args.repeat,
+        "import_total_seconds": median(imports, "import_total_seconds"),
+        "app_main_seconds": median(imports, "app_main_seconds"),
+        "process_wall_seconds": median(imports, "process_wall_seconds"),
+        "time_to_first_response_seconds": median(responses, "time_to_first_response_seconds"),
+        "heavy_modules_loaded": imports[-1]["heavy_modules_loaded"],
+        "heaviest_self": imports[-1]["heaviest_self"],
+    }
+    if args.first_use:
+        summary["green_screen_first_seconds"] = median(responses, "green_screen_first_seconds")
+        summary["green_screen_warm_seconds"] = median(responses, "green_screen_warm_seconds")
+
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "imports": imports, "responses": responses}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import subprocess
+from typing import Optional
+
+
+def generate_test_video(
+    output_path: str,
+    duration: float,
+    size: str = "1280x720",
+    fps: int = 30,
+    with_audio: bool = True,
+    overwrite: bool = False,
+    bframes: int = 0
+) -> str:
+    """
+    Gera um vídeo sintético com ffmpeg lavfi (testsrc2 + sine).
+
+    O arquivo é reaproveitado entre execuções se já existir, a menos que
+    overwrite seja True. bframes > 0 liga os B-frames do libx264 (o preset
+    ultrafast os desliga), o que deixa a ordem de decodificação diferente da
+    de apresentação.
+    """
+    if os.path.exists(output_path) and not overwrite:
+        return output_path
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={fps}',
+    ]
+    if with_audio:
+        cmd.extend(['-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000'])
+
+    cmd.extend([
+        '-t', str(duration),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-g', str(fps * 2), '-bf', str(bframes),
+    ])
+    if with_audio:
+        cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
+    cmd.append(output_path)
+
+    subprocess.run(cmd, check=True)
+    return output_path
+
+
+def generate_test_image(output_path: str, size: str = "800x200", color: Optional[str] = None) -> str:
+    """Gera uma imagem PNG sintética (testsrc2 ou cor sólida)."""
+    if os.path.exists(output_path):
+        return output_path
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    source = f'color=c={color}:size={size}' if color else f'testsrc2=size={size}'
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', source,
+        '-frames:v', '1', output_path
+    ], check=True)
+    return output_path
+
+
+def generate_test_audio(output_path: str, duration: float, sample_rate: int = 44100) -> str:
+    """Gera uma trilha MP3 sintética (dois senos), reaproveitada se já existir."""
+    if os.path.exists(output_path):
+        return output_path
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:sample_rate={sample_rate}',
+        '-f', 'lavfi', '-i', f'sine=frequency=330:sample_rate={sample_rate}',
+        '-filter_complex', 'amerge=inputs=2',
+        '-t', str(duration),
+        '-c:a', 'libmp3lame', '-b:a', '192k', output_path
+    ], check=True)
+    return output_path
+
+
+def generate_green_screen_video(
+    output_path: str,
+    duration: float,
+    size: str = "1280x720",
+    fps: int = 30
+) -> str:
+    """
+    Gera um vídeo de chroma key sintético: testsrc2 em meia resolução
+    deslizando sobre um fundo verde puro. Reaproveitado se já existir.
+    """
+    if os.path.exists(output_path):
+        return output_path
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    width, height = (int(value) for value in size.split("x"))
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'color=c=0x00C800:size={size}:rate={fps}',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width // 2}x{height // 2}:rate={fps}',
+        '-filter_complex', "[0:v][1:v]overlay=x='(W-w)/2*(1+sin(t))':y=(H-h)/2:shortest=1",
+        '-t', str(duration),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-g', str(fps * 2),
+        output_path
+    ], check=True)
+    return output_path
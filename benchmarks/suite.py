@@ -0,0 +1,402 @@
+"""
+Suíte de benchmarks dos serviços sobre mídia sintética reproduzível.
+
+Gera os vídeos com ffmpeg lavfi (testsrc2 + seno) nos tamanhos e durações
+pedidos e roda cada serviço nos seus modos principais. Cada caso executa
+em um processo Python novo, com caches de resultado, overlay e probe
+isolados, e registra:
+
+  - wall_seconds: tempo de parede do serviço
+  - child_cpu_seconds: CPU dos processos filhos (ffmpeg, pool do chroma key) via RUSAGE_CHILDREN
+  - self_cpu_seconds: CPU do próprio processo Python
+  - peak_rss_bytes / peak_child_rss_bytes: pico de memória do Python e do maior filho
+  - scratch_peak_bytes: pico de bytes no SCRATCH_DIR durante o caso
+  - output_bytes: tamanho das saídas
+
+Os resultados vão para um JSON que `compare` confronta com outra execução.
+
+Uso:
+    python -m benchmarks.suite run --sizes 720p 1080p --durations 60 600 --output base.json
+    python -m benchmarks.suite run --cases cut_smart banner --sizes 4k --durations 60 --output novo.json
+    python -m benchmarks.suite compare base.json novo.json --threshold 5
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.media import (
+    generate_green_screen_video, generate_test_audio, generate_test_image, generate_test_video)
+
+
+SIZES = {"720p": "1280x720", "1080p": "1920x1080", "4k": "3840x2160"}
+
+METRICS = [
+    "wall_seconds", "child_cpu_seconds", "self_cpu_seconds", "peak_rss_bytes",
+    "peak_child_rss_bytes", "scratch_peak_bytes", "output_bytes",
+]
+
+
+def _banner(media: dict, work_dir: str) -> List[str]:
+    from app.services.banner_service import BannerService
+    output_path = os.path.join(work_dir, "banner.mp4")
+    BannerService.add_banner(media["video"], media["banner"], output_path)
+    return [output_path]
+
+
+def _watermark(media: dict, work_dir: str) -> List[str]:
+    from app.services.watermark_service import WatermarkService
+    output_path = os.path.join(work_dir, "watermark.mp4")
+    WatermarkService.add_watermark(media["video"], media["watermark"], output_path)
+    return [output_path]
+
+
+def _cut(mode: str) -> Callable[[dict, str], List[str]]:
+    def run(media: dict, work_dir: str) -> List[str]:
+        from app.services.cut_service import CutService
+        # Metade central do vídeo, com bordas fora dos keyframes
+        output_path = os.path.join(work_dir, f"cut_{mode}.mp4")
+        duration = media["duration"]
+        CutService.cut_video(
+            media["video"], output_path,
+            f"{duration * 0.25 + 0.4:.3f}", f"{duration * 0.75 + 0.4:.3f}", mode=mode)
+        return [output_path]
+    return run
+
+
+def _audio(reduce_original_volume: bool) -> Callable[[dict, str], List[str]]:
+    def run(media: dict, work_dir: str) -> List[str]:
+        from app.services.audio_service import AudioService
+        output_path = AudioService.mix_audio_with_video(
+            media["video"], media["music"], replace_original=False,
+            reduce_original_volume=reduce_original_volume)
+        # Saída gerada ao lado do vídeo: move para o diretório do caso
+        moved = os.path.join(work_dir, os.path.basename(output_path))
+        shutil.move(output_path, moved)
+        return [moved]
+    return run
+
+
+def _cyclic(engine: str) -> Callable[[dict, str], List[str]]:
+    def run(media: dict, work_dir: str) -> List[str]:
+        from app.services.video_processing_service import VideoProcessor
+        output_path = os.path.join(work_dir, f"cyclic_{engine}.mp4")
+        result = VideoProcessor.create_cyclic_video(media["video"], output_path, engine=engine)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+        return [output_path]
+    return run
+
+
+def _green_screen(engine: str) -> Callable[[dict, str], List[str]]:
+    def run(media: dict, work_dir: str) -> List[str]:
+        from app.services.green_screen_service import GreenScreenService
+        output_path = os.path.join(work_dir, f"green_screen_{engine}.mov")
+        GreenScreenService.remove_green_screen_video(
+            media["green_screen"], output_path, output_format="prores", engine=engine)
+        return [output_path]
+    return run
+
+
+CASES: Dict[str, Callable[[dict, str], List[str]]] = {
+    "banner": _banner,
+    "watermark": _watermark,
+    "cut_copy": _cut("copy"),
+    "cut_smart": _cut("smart"),
+    "cut_reencode": _cut("reencode"),
+    "audio_mix": _audio(False),
+    "audio_mix_reduce": _audio(True),
+    "cyclic_filtergraph": _cyclic("filtergraph"),
+    "cyclic_segments": _cyclic("segments"),
+    "green_screen_hard": _green_screen("hard"),
+    "green_screen_soft": _green_screen("soft"),
+}
+
+
+def prepare_media(media_dir: str, size_name: str, duration: float, fps: int, green_screen: bool) -> dict:
+    """Mídia do tamanho/duração pedidos; arquivos já gerados são reaproveitados"""
+    size = SIZES[size_name]
+    width = int(size.split("x")[0])
+    media = {
+        "size": size_name,
+        "duration": duration,
+        "video": generate_test_video(
+            os.path.join(media_dir, f"suite_{size_name}_{int(duration)}s.mp4"), duration, size=size, fps=fps),
+        "banner": generate_test_image(
+            os.path.join(media_dir, f"suite_banner_{width}.png"), size=f"{width}x{width // 8}"),
+        "watermark": generate_test_image(
+            os.path.join(media_dir, "suite_watermark.png"), size="400x200"),
+        "music": generate_test_audio(
+            os.path.join(media_dir, f"suite_music_{int(duration)}s.mp3"), duration + 30),
+    }
+    if green_screen:
+        media["green_screen"] = generate_green_screen_video(
+            os.path.join(media_dir, f"suite_green_{size_name}_{int(duration)}s.mp4"), duration, size=size, fps=fps)
+    return media
+
+
+def _path_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # arquivo removido durante a varredura
+    return total
+
+
+class _ScratchSampler(threading.Thread):
+    """Amostra o tamanho do SCRATCH_DIR e guarda o pico"""
+
+    def __init__(self, path: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.is_set():
+            self.peak = max(self.peak, _path_bytes(self.path))
+            self._done.wait(self.interval)
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, _path_bytes(self.path))
+        return self.peak
+
+
+def _cpu_seconds(usage: resource.struct_rusage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_bytes(kilobytes: int) -> int:
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return kilobytes if sys.platform == "darwin" else kilobytes * 1024
+
+
+def run_case(spec: dict) -> dict:
+    """Executa um caso no processo atual (chamado pelo subprocesso de cada caso)"""
+    media = spec["media"]
+    work_dir = spec["work_dir"]
+    scratch = _ScratchSampler(os.environ["SCRATCH_DIR"])
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    scratch.start()
+    started = time.perf_counter()
+    error = None
+    outputs: List[str] = []
+    try:
+        outputs = CASES[spec["case"]](media, work_dir)
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - started
+    scratch_peak = scratch.stop()
+
+    # O pool do chroma key só entra em RUSAGE_CHILDREN depois de encerrado
+    from app.services.green_screen_service import GreenScreenService
+    if GreenScreenService._process_pool is not None:
+        GreenScreenService._process_pool.shutdown()
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return {
+        "case": spec["case"],
+        "size": media["size"],
+        "duration": media["duration"],
+        "repeat": spec["repeat"],
+        "success": error is None,
+        "error": error,
+        "wall_seconds": round(wall, 3),
+        "child_cpu_seconds": round(_cpu_seconds(children_after) - _cpu_seconds(children_before), 3),
+        "self_cpu_seconds": round(_cpu_seconds(self_after) - _cpu_seconds(self_before), 3),
+        "peak_rss_bytes": _rss_bytes(self_after.ru_maxrss),
+        "peak_child_rss_bytes": _rss_bytes(children_after.ru_maxrss),
+        "scratch_peak_bytes": scratch_peak,
+        "output_bytes": sum(_path_bytes(path) for path in outputs if os.path.exists(path)),
+    }
+
+
+def _spawn_case(spec: dict, case_dir: str, quiet: bool) -> dict:
+    """Roda o caso em um processo novo com caches e scratch isolados"""
+    spec_path = os.path.join(case_dir, "spec.json")
+    result_path = os.path.join(case_dir, "result.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+
+    env = dict(os.environ)
+    env.update({
+        "SCRATCH_DIR": os.path.join(case_dir, "scratch"),
+        "OVERLAY_CACHE_DIR": os.path.join(case_dir, "overlay_cache"),
+        "RESULT_CACHE_DIR": "",
+        "PROBE_CACHE_DB": "",
+    })
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "_case", spec_path, result_path],
+        env=env,
+        stdout=subprocess.DEVNULL if quiet else None,
+        stderr=subprocess.DEVNULL if quiet else None,
+    )
+    if completed.returncode != 0 or not os.path.exists(result_path):
+        return {
+            "case": spec["case"], "size": spec["media"]["size"], "duration": spec["media"]["duration"],
+            "repeat": spec["repeat"], "success": False,
+            "error": f"Processo do caso terminou com código {completed.returncode}",
+        }
+    with open(result_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _environment() -> dict:
+    ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    from app.core.scheduler import detect_cpu_limit
+    cores, source = detect_cpu_limit()
+    return {
+        "created_at": datetime.now().isoformat(),
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ffmpeg": ffmpeg.stdout.splitlines()[0] if ffmpeg.stdout else None,
+        "cpu_limit": cores,
+        "cpu_limit_source": source,
+    }
+
+
+def _key(entry: dict) -> str:
+    return f"{entry['case']}/{entry['size']}/{int(entry['duration'])}s"
+
+
+def summarize(entries: List[dict]) -> Dict[str, dict]:
+    """Mediana de cada métrica por caso/tamanho/duração, só com as execuções bem-sucedidas"""
+    grouped: Dict[str, List[dict]] = {}
+    for entry in entries:
+        if entry.get("success"):
+            grouped.setdefault(_key(entry), []).append(entry)
+    return {
+        key: {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+        for key, runs in grouped.items()
+    }
+
+
+def command_run(args) -> None:
+    cases = args.cases or list(CASES)
+    needs_green_screen = any(case.startswith("green_screen") for case in cases)
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as suite_dir:
+        for size_name in args.sizes:
+            for duration in args.durations:
+                media = prepare_media(args.media_dir, size_name, duration, args.fps, needs_green_screen)
+                for case in cases:
+                    for repeat in range(args.repeat):
+                        case_dir = os.path.join(suite_dir, f"{case}_{size_name}_{int(duration)}_{repeat}")
+                        work_dir = os.path.join(case_dir, "output")
+                        os.makedirs(work_dir)
+                        spec = {"case": case, "media": media, "work_dir": work_dir, "repeat": repeat}
+                        entry = _spawn_case(spec, case_dir, not args.verbose)
+                        results.append(entry)
+                        if entry["success"]:
+                            print(f"{_key(entry):<36} {entry['wall_seconds']:>9.2f}s  "
+                                  f"cpu filhos {entry['child_cpu_seconds']:>9.2f}s  "
+                                  f"rss {entry['peak_rss_bytes'] / 1024 / 1024:>7.1f} MB  "
+                                  f"scratch {entry['scratch_peak_bytes'] / 1024 / 1024:>8.1f} MB  "
+                                  f"saída {entry['output_bytes'] / 1024 / 1024:>8.1f} MB")
+                        else:
+                            # Só o começo do erro: o stderr do ffmpeg vai inteiro para o JSON
+                            print(f"{_key(entry):<36} FALHOU: {entry['error'].splitlines()[0][:120]}")
+                        shutil.rmtree(case_dir, ignore_errors=True)
+
+    report = {"environment": _environment(), "results": results, "summary": summarize(results)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+
+def command_compare(args) -> None:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    base_summary = base.get("summary") or summarize(base["results"])
+    new_summary = new.get("summary") or summarize(new["results"])
+    print(f"base: {base['environment'].get('commit')}  novo: {new['environment'].get('commit')}")
+
+    regressions = []
+    for key in sorted(set(base_summary) & set(new_summary)):
+        print(key)
+        for metric in METRICS:
+            before, after = base_summary[key][metric], new_summary[key][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            flag = ""
+            if change > args.threshold:
+                flag = "  <- pior"
+                regressions.append((key, metric, change))
+            elif change < -args.threshold:
+                flag = "  <- melhor"
+            print(f"  {metric:<22} {before:>14.3f} {after:>14.3f} {change:>+8.1f}%{flag}")
+
+    for key in sorted(set(base_summary) ^ set(new_summary)):
+        print(f"{key}: só em {'base' if key in base_summary else 'novo'}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Executa a suíte")
+    run.add_argument("--cases", nargs="+", choices=list(CASES), help="Casos (padrão: todos)")
+    run.add_argument("--sizes", nargs="+", default=["720p"], choices=list(SIZES))
+    run.add_argument("--durations", nargs="+", type=float, default=[60], help="Durações (s) dos vídeos, 60 a 3600")
+    run.add_argument("--fps", type=int, default=30)
+    run.add_argument("--repeat", type=int, default=1, help="Execuções por caso (o resumo usa a mediana)")
+    run.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "bonett_bench_media"))
+    run.add_argument("--output", help="Arquivo JSON com os resultados")
+    run.add_argument("--verbose", action="store_true", help="Mostra a saída dos serviços")
+    run.set_defaults(func=command_run)
+
+    compare = commands.add_parser("compare", help="Compara dois JSONs de resultados")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=5.0, help="Variação (%%) destacada")
+    compare.add_argument("--fail-on-regression", action="store_true",
+                         help="Sai com código 1 se alguma métrica piorar além do limite")
+    compare.set_defaults(func=command_compare)
+
+    if len(sys.argv) == 4 and sys.argv[1] == "_case":
+        # Subprocesso de um caso: lê a especificação e grava o resultado
+        with open(sys.argv[2], encoding="utf-8") as f:
+            spec = json.load(f)
+        result = run_case(spec)
+        with open(sys.argv[3], "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()